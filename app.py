@@ -1,388 +1,524 @@
-from flask import Flask, request, jsonify, send_file, render_template
-import requests
-import sqlite3
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, render_template
 from flask_cors import CORS
-from docx import Document
-import mammoth
 from dotenv import load_dotenv
 import os
 import sys
 import logging
 import json
+import gc
 import io
-import PyPDF2
-from pdfrw import PdfReader, PdfWriter, PageMerge
-from PyPDF2 import PdfReader as PyPdfReader, PdfWriter as PyPdfWriter
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
+import importlib
+import random
+import threading
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
-# Import AI models
-from model.bot import get_response
-from model.similarity import get_document
-
 # Load environment variables from .env file
 load_dotenv()
 
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "default-secret-key")
+# Configure logging from the environment: level, format, sampling and payload size
+from logging_config import configure_logging, Payload
+configure_logging()
+logger = logging.getLogger(__name__)
 
-# Configure CORS to allow requests from any origin for development
-CORS(app, resources={r"/api/*": {"origins": "*"}})
+from db import get_db_connection
+from bulk import generate_bulk_zip, parse_answer_sets, BULK_MAX_ROWS
+from catalog import get_catalog, lookup_form, resolve_form_answers, split_form_details, FORM_DETAILS_QUERY, FORMS_QUERY
+from artifacts import artifact_cache, artifact_key
+from documents import FormDocument, content_disposition, falls_back_to_docx, get_parsed_template, iter_chunks, render, render_chunks, DOCX_MIMETYPE, HTML_MIMETYPE, PDF_MIMETYPE
+from jobs import job_queue, JobQueueFull
+from template_store import get_template_store
+import catalog
+import db
 
-# Helper function to get database connection
-def get_db_connection():
-    db_path = 'legal_assistant.db'
-    
-    # Check for the main database file
-    if not os.path.exists(db_path):
-        # Check for the alternate database file
-        alt_path = 'legal_assistant_new.db'
-        if os.path.exists(alt_path):
-            logger.info(f"Using alternative database: {alt_path}")
-            db_path = alt_path
-        else:
-            logger.warning(f"Database file not found: {db_path}. Creating empty database.")
-            
+# The AI models (scikit-learn), python-docx and PyPDF2 are imported on first use,
+# so a worker can answer catalog requests before they are loaded
+
+# Largest number of messages accepted by the batch chat endpoint
+MAX_CHAT_BATCH = int(os.environ.get("MAX_CHAT_BATCH", "1000"))
+
+# Load the heavy subsystems in a background thread as soon as the app is up
+APP_WARMUP = os.environ.get("APP_WARMUP", "1").lower() not in ("0", "false", "no")
+WARMUP_MODULES = ("model.similarity", "model.bot", "docx", "PyPDF2", "requests")
+
+# How long browsers and proxies may reuse catalog responses before revalidating
+CATALOG_MAX_AGE = int(os.environ.get("CATALOG_MAX_AGE", "60"))
+
+bp = Blueprint("legal_assistant", __name__)
+
+# Import the retrieval engine and the document libraries, and load the chat knowledge base and index, off the request path
+def warm_up():
+    for module in WARMUP_MODULES:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.warning("Warm-up of %s failed: %s", module, e)
+    try:
+        from model.similarity import get_knowledge_base
+        get_knowledge_base()
+    except Exception as e:
+        logger.warning("Warm-up of the knowledge base failed: %s", e)
+    logger.info("Warm-up finished")
+
+def preload_shared_state():
+    """
+    Build the read-only state every worker shares, before the server forks
+
+    The catalog, the TF-IDF index, the keyword automaton and the compiled
+    intent matcher are built once here. Forked workers inherit them
+    copy-on-write. Freezing the garbage collector moves these objects out of
+    the collected generations, so collections in the workers do not write to
+    (and so copy) their pages. Per-process resources such as database
+    connections, the template HTTP session, the job pool and the logging
+    thread are reset in each child by os.register_at_fork hooks in their
+    modules.
+    """
+    catalog.reload_catalog()
+    warm_up()
+    gc.collect()
+    gc.freeze()
+
+def create_app(preload=False, warmup=None):
+    """
+    Create the Flask application
+
+    Args:
+        preload (bool): Build the shared state synchronously, for servers that
+            import the app once and then fork workers (see wsgi.py). Otherwise
+            the heavy modules are warmed in a background thread unless
+            APP_WARMUP is off.
+        warmup (bool): Overrides APP_WARMUP, e.g. for servers that warm up themselves
+
+    Returns:
+        Flask: The configured application
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "default-secret-key")
+
+    # Configure CORS to allow requests from any origin for development
+    CORS(app, resources={r"/api/*": {"origins": "*"}})
+
+    # One database connection per request, closed at teardown
+    db.init_app(app)
+
+    app.register_blueprint(bp)
+
+    if preload:
+        preload_shared_state()
+        return app
+
+    # Load the services/forms/questions catalog up front so catalog reads never touch disk
     try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        catalog.reload_catalog()
     except Exception as e:
-        logger.error(f"Database connection error: {str(e)}")
-        raise
+        logger.warning("Catalog not loaded at startup: %s", e)
+
+    if APP_WARMUP if warmup is None else warmup:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    return app
+
+_app = None
+
+def __getattr__(name):
+    # `from app import app` keeps working: the default app is created on first access
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Resolve the question text for every answered field of a form submission
+def get_form_answers(form_details, get_connection=get_db_connection):
+    return resolve_form_answers(form_details, get_connection)
+
+# Look up a form's link and name, from the catalog when possible
+def get_form_record(form_id, get_connection=get_db_connection):
+    form_data = lookup_form(form_id, get_connection)
+    if form_data is None:
+        raise KeyError(f"Unknown form_id: {form_id}")
+    return form_data
+
+# Read-through query for forms of a service missing from the catalog
+def query_forms(service_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(FORMS_QUERY, [service_id])
+    forms = [dict(row) for row in cursor.fetchall()]
+    cursor.close()
+    return forms
+
+# Read-through query for details of a form missing from the catalog
+def query_form_details(form_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    # Form, categories and questions come back together from a single indexed join
+    cursor.execute(FORM_DETAILS_QUERY, [form_id])
+    rows = cursor.fetchall()
+    cursor.close()
+    
+    return split_form_details(rows)
+
+# Serve a catalog payload with ETag / Last-Modified validators, answering 304 when unchanged
+def catalog_response(catalog, key, build):
+    body, etag = catalog.serialized(key, build, lambda data: current_app.json.dumps(data) + "\n")
+    response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.last_modified = catalog.last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = CATALOG_MAX_AGE
+    response.headers["X-Catalog-Version"] = str(catalog.version)
+    return response.make_conditional(request)
 
 # Main route
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('index.html')
 
 # Get all services
-@app.route('/api/services', methods=["GET"])
+@bp.route('/api/services', methods=["GET"])
 def services():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM services')
-        services = [dict(row) for row in cursor.fetchall()]
-        cursor.close()
-        conn.close()
-        logger.debug(f"Retrieved services: {services}")
-        return jsonify(services)
+        catalog = get_catalog()
+        logger.debug("Serving services from catalog v%s", catalog.version)
+        return catalog_response(catalog, ("services",), catalog.get_services)
     except Exception as e:
-        logger.error(f"Error retrieving services: {str(e)}")
+        logger.error("Error retrieving services: %s", e)
         return jsonify({"error": str(e)}), 500
 
 # Get forms of a particular service
-@app.route('/api/forms', methods=["GET"])
+@bp.route('/api/forms', methods=["GET"])
 def get_forms():
     try:
         service_id = request.args.get('service_id')
-        logger.debug(f"Getting forms for service_id: {service_id}")
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT services.service_id, services.service_name, forms.form_id, forms.form_name, forms.form_link 
-            FROM services 
-            INNER JOIN forms ON services.service_id = forms.service_id 
-            WHERE forms.service_id = ?
-        """, [service_id])
+        logger.debug("Getting forms for service_id: %s", service_id)
         
-        forms = [dict(row) for row in cursor.fetchall()]
-        cursor.close()
-        conn.close()
+        catalog = get_catalog()
+        if service_id in catalog.services_by_id:
+            logger.debug("Serving forms for %s from catalog v%s", service_id, catalog.version)
+            return catalog_response(catalog, ("forms", service_id), lambda: catalog.get_forms(service_id))
         
-        logger.debug(f"Retrieved forms: {forms}")
+        forms = query_forms(service_id)
+        logger.debug("Retrieved forms: %s", Payload(forms))
         return jsonify(forms)
     except Exception as e:
-        logger.error(f"Error retrieving forms: {str(e)}")
+        logger.error("Error retrieving forms: %s", e)
         return jsonify({"error": str(e)}), 500
 
 # Get all queries for a form
-@app.route('/api/form-details', methods=["GET"])
+@bp.route('/api/form-details', methods=["GET"])
 def get_form_details():
     try:
         form_id = request.args.get('form_id')
-        logger.debug(f"Getting details for form_id: {form_id}")
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get form details
-        cursor.execute("SELECT * FROM forms WHERE form_id = ?;", [form_id])
-        form_data = [dict(row) for row in cursor.fetchall()]
-        
-        # Get categories
-        cursor.execute("""
-            SELECT * FROM ques_categories 
-            WHERE id IN (
-                SELECT DISTINCT(category_id) 
-                FROM input_ques 
-                WHERE ques_id IN (
-                    SELECT form_query_id 
-                    FROM form_queries 
-                    WHERE form_id = ?
-                )
-            );
-        """, [form_id])
-        categories = [dict(row) for row in cursor.fetchall()]
-        
-        # Get questions
-        cursor.execute("""
-            SELECT * FROM input_ques 
-            WHERE ques_id IN (
-                SELECT form_query_id 
-                FROM form_queries 
-                WHERE form_id = ?
-            );
-        """, [form_id])
-        questions = [dict(row) for row in cursor.fetchall()]
+        logger.debug("Getting details for form_id: %s", form_id)
         
-        cursor.close()
-        conn.close()
+        catalog = get_catalog()
+        if catalog.get_form(form_id) is not None:
+            logger.debug("Serving form details for %s from catalog v%s", form_id, catalog.version)
+            return catalog_response(catalog, ("form-details", form_id), lambda: catalog.get_form_details(form_id))
         
-        # Combine all data
-        result = form_data + categories + questions
-        logger.debug(f"Retrieved form details: {result}")
+        result = query_form_details(form_id)
+        logger.debug("Retrieved form details: %s", Payload(result))
         return jsonify(result)
     except Exception as e:
-        logger.error(f"Error retrieving form details: {str(e)}")
+        logger.error("Error retrieving form details: %s", e)
         return jsonify({"error": str(e)}), 500
 
+# Find or create the generate-once artifact for a form submission; outside a
+# Flask request (the asyncio server) pass get_connection=None to read through on a fresh connection
+def get_artifact(form_details, get_connection=get_db_connection):
+    # The download step names the artifact the preview rendered; the form data sent
+    # alongside it is only used once that artifact has been evicted
+    artifact = artifact_cache.get(form_details.get("artifact_id"))
+    if "form_id" not in form_details:
+        return artifact
+    if artifact is not None and artifact.form_id == form_details["form_id"]:
+        return artifact
+    
+    form_id = form_details["form_id"]
+    catalog = get_catalog()
+    artifact_id = artifact_key(form_id, form_details, catalog.version)
+    artifact = artifact_cache.get(artifact_id)
+    if artifact is not None:
+        return artifact
+    
+    form_data = get_form_record(form_id, get_connection)
+    answers = get_form_answers(form_details, get_connection)
+    # PDF field positions come from the precomputed map, nothing is scanned per request
+    field_fills = catalog.get_field_fills(form_id, form_details)
+    # Every output format is rendered from this one document model
+    document = FormDocument(form_data["form_name"], form_data["form_link"], answers, field_fills)
+    return artifact_cache.get_or_create(artifact_id, form_id, document)
+
+# Stream a rendered document back as a download
+def download_response(content, mimetype, download_name):
+    response = Response(iter_chunks(content), mimetype=mimetype, direct_passthrough=True)
+    response.headers["Content-Disposition"] = content_disposition(download_name)
+    response.headers["Content-Length"] = str(len(content))
+    return response
+
 # Return the contents of final doc
-@app.route('/api/final-content', methods=["POST"])
+@bp.route('/api/final-content', methods=["POST"])
 def final_content():
     try:
         form_details = request.json
         form_id = form_details["form_id"]
-        logger.debug(f"Generating content for form_id: {form_id}")
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT form_link, form_name FROM forms where form_id = ?;", [form_id])
-        form_data = dict(cursor.fetchone())
-        form_link = form_data["form_link"]
-        form_name = form_data["form_name"]
-        cursor.close()
-        conn.close()
-        
-        logger.debug(f"Downloading document from: {form_link}")
+        logger.debug("Generating content for form_id: %s", form_id)
         
-        # Create a simple HTML placeholder for PDF files
-        html_content = f"""
-        <div class="alert alert-info">
-            <h3>PDF Document Preview</h3>
-            <p>The selected document "{form_name}" is a PDF file.</p>
-            <p>In a real-world scenario, we would process this PDF file by:</p>
-            <ol>
-                <li>Converting the PDF to a modifiable format</li>
-                <li>Filling in your provided information:</li>
-            </ol>
-            
-            <div class="card p-3 my-3" style="background-color: #2c3e50; border-radius: 10px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
-                <h4 class="text-white">Form Data Provided:</h4>
-                <ul class="text-white">
-        """
-        
-        # Add the form details to the HTML content
-        for key, value in form_details.items():
-            if key != "form_id" and key.isdigit():
-                # Get the question text for this field
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                # Make sure to properly format the ID
-                key_id = key.zfill(3)  # Ensure it's padded to 3 digits (e.g., "1" -> "001")
-                cursor.execute("SELECT ques_text FROM input_ques WHERE ques_id = ?;", [f"Q{key_id}"])
-                question_data = cursor.fetchone()
-                cursor.close()
-                conn.close()
-                
-                question_text = question_data["ques_text"] if question_data else f"Field {key}"
-                html_content += f"<li><strong>{question_text}:</strong> {value}</li>"
+        artifact = get_artifact(form_details)
         
-        html_content += f"""
-                </ul>
-            </div>
-            
-            <p>The final document would be a completed version of the form with your information inserted in the appropriate places.</p>
-            
-            <div class="d-grid gap-2 d-md-flex justify-content-md-end">
-                <a href="{form_link}" target="_blank" class="btn btn-primary">
-                    <i class="bi bi-file-earmark-pdf"></i> View Original PDF
-                </a>
-            </div>
-        </div>
-        """
+        # ?stream=1 sends the preview markup itself, as it is rendered
+        if request.args.get("stream") and "html" not in artifact.outputs:
+            return Response(stream_html(artifact), mimetype=HTML_MIMETYPE, headers={"X-Artifact-Id": artifact.artifact_id})
         
-        # Create docs directory if it doesn't exist
-        directory = './docs'
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-            
-        # Save a simple .docx file with the form information for download
-        doc = Document()
-        doc.add_heading(f"{form_name}", 0)
+        html_content = artifact_cache.render(
+            artifact, "html", lambda: render(artifact.document, "html").getvalue().decode("utf-8")
+        )
+        if request.args.get("stream"):
+            return Response(iter_chunks(html_content), mimetype=HTML_MIMETYPE, headers={"X-Artifact-Id": artifact.artifact_id})
         
-        doc.add_heading("Form Details", level=1)
-        for key, value in form_details.items():
-            if key != "form_id" and key.isdigit():
-                # Get the question text for this field
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                # Make sure to properly format the ID
-                key_id = key.zfill(3)  # Ensure it's padded to 3 digits (e.g., "1" -> "001")
-                cursor.execute("SELECT ques_text FROM input_ques WHERE ques_id = ?;", [f"Q{key_id}"])
-                question_data = cursor.fetchone()
-                cursor.close()
-                conn.close()
-                
-                question_text = question_data["ques_text"] if question_data else f"Field {key}"
-                doc.add_paragraph(f"{question_text}: {value}")
-                
-        doc.add_paragraph(f"Original Document: {form_link}")
-        
-        # Save the document
-        doc.save("./docs/Output2.docx")
-        
-        return jsonify({'content': html_content})
+        return jsonify({'content': html_content, 'artifact_id': artifact.artifact_id})
     except Exception as e:
-        logger.error(f"Error generating document content: {str(e)}")
+        logger.error("Error generating document content: %s", e)
         return jsonify({"error": str(e)}), 500
 
+# Stream the HTML preview while rendering it, then keep it with the artifact
+def stream_html(artifact):
+    parts = []
+    for chunk in render_chunks(artifact.document, "html"):
+        parts.append(chunk)
+        yield chunk
+    artifact_cache.render(artifact, "html", lambda: b"".join(parts).decode("utf-8"))
+
 # Return the final doc
-@app.route('/api/final-form', methods=["POST"])
+@bp.route('/api/final-form', methods=["POST"])
 def final_form():
     try:
-        # If data is sent as JSON
-        if request.is_json:
-            form_details = request.get_json()
-        # If data is sent as form data (which is the case when using the download button)
-        elif request.form.get('formData'):
-            form_details = json.loads(request.form.get('formData'))
-        else:
+        # Data is sent as JSON, or as form data when using the download button
+        form_details = get_submitted_form()
+        if form_details is None:
             return jsonify({"error": "No form data provided"}), 400
             
         # Debug the data
-        logger.debug(f"Generating final document with data: {form_details}")
+        logger.debug("Generating final document with data: %s", Payload(form_details))
         
-        # Get the form ID and look up the form details
-        form_id = form_details["form_id"]
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT form_link, form_name FROM forms where form_id = ?;", [form_id])
-        form_data = dict(cursor.fetchone())
-        form_link = form_data["form_link"]
-        form_name = form_data["form_name"]
-        cursor.close()
-        conn.close()
+        # Reuse anything already rendered for the same form and answers
+        artifact = get_artifact(form_details)
+        if artifact is None:
+            return jsonify({"error": "Document not found"}), 404
+        form_name = artifact.form_name
+        form_link = artifact.form_link
         
-        # Create docs directory if it doesn't exist
-        directory = './docs'
-        if not os.path.exists(directory):
-            os.makedirs(directory)
+        # Documents are built in memory and streamed back, so concurrent
+        # downloads never share or overwrite files on disk
         
         # Determine the output format based on the form link
         if form_link.lower().endswith('.pdf'):
             try:
-                # Download the PDF from the form link
-                response = requests.get(form_link)
-                if response.status_code != 200:
-                    return jsonify({"error": f"Failed to download the PDF. Status code: {response.status_code}"}), 500
-                
-                # Create an in-memory PDF
-                pdf_bytes = io.BytesIO(response.content)
-                
-                # Create a new PDF with form data
-                output_pdf = io.BytesIO()
-                
-                # Use PyPDF2 to add text to the PDF
-                reader = PyPdfReader(pdf_bytes)
-                writer = PyPdfWriter()
-                
-                # Process each page
-                for page_num in range(len(reader.pages)):
-                    page = reader.pages[page_num]
-                    writer.add_page(page)
-                
-                # Create a metadata page with the form data
-                metadata_pdf = PyPDF2.PdfWriter()
-                metadata_pdf.add_blank_page(width=612, height=792)  # Standard letter size
-                
-                # Create metadata page with form details
-                metadata_text = f"{form_name} - Form Data\n\n"
+                # Read the source PDF from the local template store, downloading it if needed
+                def render_pdf():
+                    content, content_hash = get_template_store().fetch_with_hash(form_link)
+                    template = get_parsed_template(form_link, content, content_hash)
+                    return render(artifact.document, "pdf", template=template).getvalue()
                 
-                for key, value in form_details.items():
-                    if key != "form_id" and key.isdigit():
-                        # Get the question text for this field
-                        conn = get_db_connection()
-                        cursor = conn.cursor()
-                        key_id = key.zfill(3)
-                        cursor.execute("SELECT ques_text FROM input_ques WHERE ques_id = ?;", [f"Q{key_id}"])
-                        question_data = cursor.fetchone()
-                        cursor.close()
-                        conn.close()
-                        
-                        question_text = question_data["ques_text"] if question_data else f"Field {key}"
-                        metadata_text += f"{question_text}: {value}\n"
-                
-                # Add metadata page to the output PDF
-                metadata_temp = io.BytesIO()
-                metadata_pdf.write(metadata_temp)
-                metadata_temp.seek(0)
-                metadata_reader = PyPdfReader(metadata_temp)
-                writer.add_page(metadata_reader.pages[0])
-                
-                # Write the output PDF
-                writer.write(output_pdf)
-                output_pdf.seek(0)
-                
-                # Save the PDF for download
-                output_path = os.path.join(directory, 'filled_form.pdf')
-                with open(output_path, 'wb') as f:
-                    f.write(output_pdf.getvalue())
+                output_pdf = artifact_cache.render(artifact, "pdf", render_pdf)
                 
                 # Return the filled PDF
-                return send_file(output_path, as_attachment=True, download_name=f"{form_name}_filled.pdf")
+                return download_response(output_pdf, PDF_MIMETYPE, f"{form_name}_filled.pdf")
             
             except Exception as e:
-                logger.error(f"Error generating PDF: {str(e)}")
+                if not falls_back_to_docx(e):
+                    return jsonify({"error": str(e)}), 500
+                logger.error("Error generating PDF: %s", e)
                 # Fall back to DOCX if PDF generation fails
                 logger.info("Falling back to DOCX generation")
-                if os.path.exists('./docs/Output2.docx'):
-                    return send_file('./docs/Output2.docx', as_attachment=True)
-                else:
-                    return jsonify({"error": f"Failed to generate document: {str(e)}"}), 500
+        
+        # Build the DOCX with the form information
+        output_docx = artifact_cache.render(artifact, "docx", lambda: render(artifact.document, "docx").getvalue())
+        return download_response(output_docx, DOCX_MIMETYPE, f"{form_name}.docx")
+    except Exception as e:
+        logger.error("Error serving final document: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+# Read the submitted form data from a JSON body or the download button's form post
+def get_submitted_form():
+    if request.is_json:
+        return request.get_json()
+    if request.form.get('formData'):
+        return json.loads(request.form.get('formData'))
+    return None
+
+# Queue the final document for generation on the background worker pool
+@bp.route('/api/final-form/jobs', methods=["POST"])
+def submit_final_form_job():
+    try:
+        form_details = get_submitted_form()
+        if form_details is None:
+            return jsonify({"error": "No form data provided"}), 400
+        
+        artifact = get_artifact(form_details)
+        if artifact is None:
+            return jsonify({"error": "Document not found"}), 404
+        
+        # Reuse a document that was already rendered for the same answers
+        kind = next((kind for kind in ("pdf", "docx") if kind in artifact.outputs), None)
+        if kind is not None:
+            job = job_queue.add_finished(artifact.artifact_id, artifact.form_name, kind, artifact.outputs[kind])
         else:
-            # Return the existing DOCX file
-            if os.path.exists('./docs/Output2.docx'):
-                return send_file('./docs/Output2.docx', as_attachment=True)
-            else:
-                return jsonify({"error": "Document not found"}), 404
+            def store_result(job):
+                artifact_cache.render(artifact, job.kind, lambda: job.content)
+            
+            job = job_queue.submit(artifact.artifact_id, artifact.document, done=store_result)
+        
+        logger.debug("Queued document job %s for artifact %s", job.job_id, artifact.artifact_id)
+        result = job.to_dict()
+        result["status_url"] = f"/api/final-form/jobs/{job.job_id}"
+        result["result_url"] = f"/api/final-form/jobs/{job.job_id}/result"
+        return jsonify(result), 202
+    except JobQueueFull as e:
+        logger.warning("Document job rejected: %s", e)
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    except Exception as e:
+        logger.error("Error queueing document job: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+# Poll the status of a document job
+@bp.route('/api/final-form/jobs/<job_id>', methods=["GET"])
+def final_form_job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+# Download the document produced by a finished job
+@bp.route('/api/final-form/jobs/<job_id>/result', methods=["GET"])
+def final_form_job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job.status == "failed":
+        return jsonify({"error": f"Failed to generate document: {job.error}"}), 500
+    if job.status != "done":
+        return jsonify(job.to_dict()), 409
+    
+    if job.kind == "pdf":
+        return download_response(job.content, PDF_MIMETYPE, f"{job.form_name}_filled.pdf")
+    return download_response(job.content, DOCX_MIMETYPE, f"{job.form_name}.docx")
+
+# Fill one form for many answer sets and stream the documents back as a ZIP
+@bp.route('/api/bulk', methods=["POST"])
+def bulk_documents():
+    try:
+        upload = request.files.get('file')
+        form_id = request.args.get('form_id') or request.form.get('form_id')
+        if not form_id:
+            return jsonify({"error": "form_id is required"}), 400
+        
+        # Answer sets come as an uploaded file or as the raw request body
+        if upload is not None:
+            filename = upload.filename or ''
+            data = upload.read().decode('utf-8-sig')
+        else:
+            filename = ''
+            data = request.get_data(as_text=True)
+        is_jsonl = filename.endswith(('.jsonl', '.ndjson')) or request.mimetype in ('application/x-ndjson', 'application/jsonl')
+        
+        # Parse everything up front so bad input is a 400 rather than a truncated archive
+        answer_sets = list(parse_answer_sets(io.StringIO(data, newline=''), 'jsonl' if is_jsonl else 'csv'))
+        if len(answer_sets) > BULK_MAX_ROWS:
+            return jsonify({"error": f"At most {BULK_MAX_ROWS} answer sets per batch"}), 400
+        logger.debug("Bulk generation of %d documents for form_id: %s", len(answer_sets), form_id)
+        
+        chunks = generate_bulk_zip(form_id, answer_sets)
+        return Response(chunks, mimetype="application/zip", headers={
+            "Content-Disposition": content_disposition(f"{form_id}_documents.zip")
+        })
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        logger.error(f"Error serving final document: {str(e)}")
+        logger.error("Error generating bulk documents: %s", e)
         return jsonify({"error": str(e)}), 500
 
+# Validate the number of ranked chat results requested
+def parse_top_k(value):
+    from model.similarity import MAX_TOP_K
+    try:
+        top_k = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("top_k must be an integer")
+    if not 1 <= top_k <= MAX_TOP_K:
+        raise ValueError(f"top_k must be between 1 and {MAX_TOP_K}")
+    return top_k
+
+# Rank the knowledge base for a chat message and attach each entry's catalog forms, matched and scored like the entry
+def rank_chat_results(user_message, top_k, get_connection=get_db_connection):
+    from model.similarity import rank_documents
+    current = catalog.get_catalog()
+    results = rank_documents(user_message, top_k, get_connection)
+    for result in results:
+        forms = current.get_forms(result['service_id']) if result['service_id'] else []
+        result['forms'] = [dict(form, match=result['match'], score=result['score']) for form in forms]
+    return results
+
+# Answer a chat message; with top_k the ranking is computed once and its first entry is the answer
+def answer_chat(user_message, top_k=None, get_connection=get_db_connection):
+    from model.similarity import default_responses, get_document
+    if top_k is None or not user_message:
+        result = {'aiMessage': get_document(user_message, get_connection)}
+        if top_k is not None:
+            result['results'] = []
+        return result
+    # rank_documents runs the same stages as get_document, so its best entry is the one get_document picks
+    results = rank_chat_results(user_message, top_k, get_connection)
+    response = results[0]['response'] if results else random.choice(default_responses)
+    return {'aiMessage': response, 'results': results}
+
 # Chat API endpoint
-@app.route('/api/chat', methods=['POST'])
+@bp.route('/api/chat', methods=['POST'])
 def chat():
     try:
         user_input = request.json
         user_message = user_input.get('user_chat', '')
-        logger.debug(f"Chat request received: {user_message}")
+        logger.debug("Chat request received: %s", Payload(user_message))
+        
+        # With top_k, also return the ranked documents and their forms so the page can offer several at once
+        top_k = parse_top_k(user_input['top_k']) if user_input.get('top_k') is not None else None
         
         # Get response from AI model
-        response = get_document(user_message)
+        result = answer_chat(user_message, top_k)
+        
+        logger.debug("AI response: %s", Payload(result['aiMessage']))
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Error in chat processing: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+# Batch chat API endpoint for transcript replays and offline evaluation
+@bp.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    try:
+        user_input = request.json or {}
+        user_messages = user_input.get('user_chats')
+        if not isinstance(user_messages, list):
+            return jsonify({"error": "user_chats must be a list of messages"}), 400
+        if len(user_messages) > MAX_CHAT_BATCH:
+            return jsonify({"error": f"At most {MAX_CHAT_BATCH} messages per batch"}), 400
+        logger.debug("Batch chat request received: %d messages", len(user_messages))
+        
+        # Score every message against the knowledge base in one pass
+        from model.similarity import get_documents
+        responses = get_documents([str(message or '') for message in user_messages], get_db_connection)
         
-        logger.debug(f"AI response: {response}")
-        return jsonify({'aiMessage': response})
+        return jsonify({'aiMessages': responses})
     except Exception as e:
-        logger.error(f"Error in chat processing: {str(e)}")
+        logger.error("Error in batch chat processing: %s", e)
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import threading
+
+from model.cache import LRUCache
+
+# Total size of rendered documents kept in memory, and the most artifacts to keep
+ARTIFACT_CACHE_BYTES = int(os.environ.get("ARTIFACT_CACHE_BYTES", str(64 * 1024 * 1024)))
+ARTIFACT_CACHE_SIZE = int(os.environ.get("ARTIFACT_CACHE_SIZE", "256"))
+
+def artifact_key(form_id, form_details, catalog_version=None):
+    """
+    Content address of a form submission
+
+    Only the numeric answer fields take part, in sorted order, so the same
+    answers always produce the same id regardless of how they were posted.
+    The catalog version is included so reseeded question texts are not
+    served from stale artifacts.
+
+    Args:
+        form_id (str): The form being filled
+        form_details (dict): The submitted form data
+        catalog_version (int): Version of the catalog used to render
+
+    Returns:
+        str: Hex artifact id
+    """
+    answers = sorted(
+        (key, str(value)) for key, value in form_details.items()
+        if key != "form_id" and key.isdigit()
+    )
+    payload = json.dumps([form_id, catalog_version, answers], separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+class Artifact:
+    """Rendered outputs (HTML preview, DOCX, PDF) of one form submission"""
+
+    def __init__(self, artifact_id, form_id, document):
+        self.artifact_id = artifact_id
+        self.form_id = form_id
+        # The FormDocument every output is rendered from
+        self.document = document
+        self.outputs = {}
+        self.lock = threading.Lock()
+
+    @property
+    def form_name(self):
+        return self.document.form_name
+
+    @property
+    def form_link(self):
+        return self.document.form_link
+
+    def size(self):
+        return sum(len(output) for output in self.outputs.values())
+
+class ArtifactCache:
+    """
+    Generate-once cache of rendered documents keyed by artifact id.
+
+    Each output format is rendered at most once per artifact; concurrent
+    requests for the same output wait for the first render instead of
+    repeating it. Artifacts are evicted least recently used first once the
+    total size of their outputs exceeds the byte budget.
+    """
+
+    def __init__(self, max_bytes=ARTIFACT_CACHE_BYTES, maxsize=ARTIFACT_CACHE_SIZE):
+        self._cache = LRUCache(maxsize=maxsize, max_weight=max_bytes, weigh=lambda artifact: artifact.size())
+        self._lock = threading.Lock()
+
+    def get(self, artifact_id):
+        """Return a cached artifact, or None"""
+        return self._cache.get(artifact_id)
+
+    def get_or_create(self, artifact_id, form_id, document):
+        """Return the cached artifact for an id, creating an empty one for document if needed"""
+        with self._lock:
+            artifact = self._cache.get(artifact_id)
+            if artifact is None:
+                artifact = Artifact(artifact_id, form_id, document)
+                self._cache.set(artifact_id, artifact)
+            return artifact
+
+    def render(self, artifact, kind, render):
+        """
+        Return one output of an artifact, rendering it on first use
+
+        Args:
+            artifact (Artifact): The artifact to render
+            kind (str): Output name, e.g. 'html', 'docx' or 'pdf'
+            render (callable): Produces the output as str or bytes
+
+        Returns:
+            str or bytes: The rendered output
+        """
+        with artifact.lock:
+            output = artifact.outputs.get(kind)
+            if output is None:
+                output = render()
+                artifact.outputs[kind] = output
+                # Store again so the byte budget accounts for the new output
+                self._cache.set(artifact.artifact_id, artifact)
+            return output
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+artifact_cache = ArtifactCache()
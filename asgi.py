@@ -0,0 +1,373 @@
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+from logging_config import configure_logging, Payload
+configure_logging()
+
+from app import answer_chat, create_app, get_artifact, parse_top_k, warm_up, MAX_CHAT_BATCH
+from artifacts import artifact_cache
+from documents import content_disposition, falls_back_to_docx, get_parsed_template, iter_chunks, render, DOCX_MIMETYPE, HTML_MIMETYPE, PDF_MIMETYPE
+from template_store import close_async_session, get_template_store
+import catalog
+
+logger = logging.getLogger(__name__)
+
+# asyncio serving mode: `uvicorn asgi:app` (or gunicorn with -k uvicorn.workers.UvicornWorker).
+# /api/chat, /api/final-form and /api/final-content are served here on the event loop; blocking
+# work runs on the bounded executors below. Every other route is passed to the Flask app
+# through asgiref, which this mode requires.
+
+# Threads for PDF/DOCX/HTML rendering, similarity scoring, and cache/database reads
+ASYNC_RENDER_THREADS = int(os.environ.get("ASYNC_RENDER_THREADS", "4"))
+ASYNC_SCORE_THREADS = int(os.environ.get("ASYNC_SCORE_THREADS", "4"))
+ASYNC_IO_THREADS = int(os.environ.get("ASYNC_IO_THREADS", "16"))
+
+# Requests of a route handled at once, and how many more may wait before answering 503
+ROUTE_CONCURRENCY = {
+    "/api/chat": int(os.environ.get("ASYNC_CHAT_CONCURRENCY", "64")),
+    "/api/chat/batch": int(os.environ.get("ASYNC_CHAT_BATCH_CONCURRENCY", "4")),
+    "/api/final-content": int(os.environ.get("ASYNC_CONTENT_CONCURRENCY", "32")),
+    "/api/final-form": int(os.environ.get("ASYNC_FORM_CONCURRENCY", "16")),
+}
+ASYNC_MAX_WAITING = int(os.environ.get("ASYNC_MAX_WAITING", "2000"))
+
+# Largest request body accepted, in bytes
+ASYNC_MAX_BODY = int(os.environ.get("ASYNC_MAX_BODY", str(1024 * 1024)))
+
+class Overloaded(Exception):
+    """Raised when a route already has ASYNC_MAX_WAITING requests queued"""
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class RouteLimiter:
+    """
+    Per-route concurrency limit with a bounded waiting line.
+
+    Up to limit requests run at once; further requests wait without holding a
+    thread, and once max_waiting are waiting new ones are rejected straight away.
+    """
+
+    def __init__(self, limit, max_waiting=ASYNC_MAX_WAITING):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self._semaphore = None
+
+    async def __aenter__(self):
+        if self._semaphore is None:
+            # Created inside the running loop
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                raise Overloaded(f"Too many requests waiting ({self.waiting})")
+            self.waiting += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+class Request:
+    """The parts of an HTTP request the async handlers use"""
+
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = {key: values[0] for key, values in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        self.body = body
+
+    @property
+    def mimetype(self):
+        return self.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    def json(self):
+        try:
+            return json.loads(self.body or b"null")
+        except ValueError:
+            raise HttpError(400, "Invalid JSON body")
+
+    def submitted_form(self):
+        """The form data, sent as JSON or by the download button's form post"""
+        if self.mimetype == "application/json":
+            return self.json()
+        if self.mimetype == "application/x-www-form-urlencoded":
+            form_data = parse_qs(self.body.decode("utf-8")).get("formData")
+            if form_data:
+                try:
+                    return json.loads(form_data[0])
+                except ValueError:
+                    raise HttpError(400, "Invalid formData")
+        return None
+
+class Response:
+    def __init__(self, body, status=200, content_type="application/json", headers=None):
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.status = status
+        self.content_type = content_type
+        self.headers = headers or {}
+
+    @classmethod
+    def json(cls, data, status=200, headers=None):
+        return cls(json.dumps(data), status=status, headers=headers)
+
+    @classmethod
+    def download(cls, content, content_type, download_name):
+        return cls(content, content_type=content_type, headers={
+            "Content-Disposition": content_disposition(download_name)
+        })
+
+    async def send(self, send):
+        headers = [
+            (b"content-type", self.content_type.encode("latin-1")),
+            (b"content-length", str(len(self.body)).encode("latin-1")),
+        ]
+        headers.extend((name.lower().encode("latin-1"), str(value).encode("latin-1")) for name, value in self.headers.items())
+        await send({"type": "http.response.start", "status": self.status, "headers": headers})
+        # Large documents go out in chunks so the server can apply flow control
+        chunks = list(iter_chunks(self.body)) or [b""]
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+
+class AsyncApp:
+    """ASGI application serving the chat and document routes without a thread per request"""
+
+    def __init__(self, fallback=None):
+        self.fallback = fallback
+        self.routes = {
+            ("POST", "/api/chat"): self.chat,
+            ("POST", "/api/chat/batch"): self.chat_batch,
+            ("POST", "/api/final-content"): self.final_content,
+            ("POST", "/api/final-form"): self.final_form,
+        }
+        self.limiters = {path: RouteLimiter(limit) for path, limit in ROUTE_CONCURRENCY.items()}
+        self.render_executor = None
+        self.score_executor = None
+        self.io_executor = None
+
+    def start_executors(self):
+        if self.render_executor is None:
+            self.render_executor = ThreadPoolExecutor(ASYNC_RENDER_THREADS, thread_name_prefix="render")
+            self.score_executor = ThreadPoolExecutor(ASYNC_SCORE_THREADS, thread_name_prefix="score")
+            self.io_executor = ThreadPoolExecutor(ASYNC_IO_THREADS, thread_name_prefix="io")
+
+    def shutdown_executors(self):
+        for executor in (self.render_executor, self.score_executor, self.io_executor):
+            if executor is not None:
+                executor.shutdown(wait=False)
+        self.render_executor = self.score_executor = self.io_executor = None
+
+    async def run(self, executor, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        handler = self.routes.get((scope["method"], scope["path"]))
+        if handler is None:
+            allowed = [method for method, path in self.routes if path == scope["path"]]
+            if allowed:
+                response = Response.json({"error": "Method not allowed"}, status=405, headers={"Allow": ", ".join(allowed)})
+                await response.send(send)
+            elif self.fallback is not None:
+                await self.fallback(scope, receive, send)
+            else:
+                await Response.json({"error": "Not found"}, status=404).send(send)
+            return
+
+        self.start_executors()
+        try:
+            async with self.limiters[scope["path"]]:
+                body = await self.read_body(receive)
+                response = await handler(Request(scope, body))
+        except Overloaded as e:
+            logger.warning("Rejected %s: %s", scope["path"], e)
+            response = Response.json({"error": str(e)}, status=503, headers={"Retry-After": "5"})
+        except HttpError as e:
+            response = Response.json({"error": str(e)}, status=e.status)
+        await response.send(send)
+
+    async def read_body(self, receive):
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > ASYNC_MAX_BODY:
+                raise HttpError(413, f"Request body larger than {ASYNC_MAX_BODY} bytes")
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+        return b"".join(chunks)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.start_executors()
+                # Load the catalog, index and document libraries before taking traffic
+                await self.run(self.io_executor, catalog.get_catalog)
+                await self.run(self.io_executor, warm_up)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await close_async_session()
+                self.shutdown_executors()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # Chat API endpoint
+    async def chat(self, request):
+        try:
+            user_input = request.json() or {}
+            user_message = user_input.get('user_chat', '')
+            logger.debug("Chat request received: %s", Payload(user_message))
+
+            top_k = parse_top_k(user_input['top_k']) if user_input.get('top_k') is not None else None
+
+            # Similarity scoring is CPU-bound; keep it off the event loop
+            result = await self.run(self.score_executor, answer_chat, user_message, top_k, None)
+
+            logger.debug("AI response: %s", Payload(result['aiMessage']))
+            return Response.json(result)
+        except HttpError:
+            raise
+        except ValueError as e:
+            return Response.json({"error": str(e)}, status=400)
+        except Exception as e:
+            logger.error("Error in chat processing: %s", e)
+            return Response.json({"error": str(e)}, status=500)
+
+    # Batch chat API endpoint
+    async def chat_batch(self, request):
+        try:
+            user_messages = (request.json() or {}).get('user_chats')
+            if not isinstance(user_messages, list):
+                return Response.json({"error": "user_chats must be a list of messages"}, status=400)
+            if len(user_messages) > MAX_CHAT_BATCH:
+                return Response.json({"error": f"At most {MAX_CHAT_BATCH} messages per batch"}, status=400)
+
+            from model.similarity import get_documents
+            responses = await self.run(self.score_executor, get_documents, [str(message or '') for message in user_messages])
+            return Response.json({'aiMessages': responses})
+        except HttpError:
+            raise
+        except Exception as e:
+            logger.error("Error in batch chat processing: %s", e)
+            return Response.json({"error": str(e)}, status=500)
+
+    # Return the contents of final doc
+    async def final_content(self, request):
+        try:
+            form_details = request.json()
+            logger.debug("Generating content for form_id: %s", form_details["form_id"])
+
+            artifact = await self.run(self.io_executor, get_artifact, form_details, None)
+            html_content = await self.run(
+                self.render_executor, artifact_cache.render, artifact, "html",
+                lambda: render(artifact.document, "html").getvalue().decode("utf-8")
+            )
+            if request.args.get("stream"):
+                return Response(html_content, content_type=HTML_MIMETYPE, headers={"X-Artifact-Id": artifact.artifact_id})
+            return Response.json({'content': html_content, 'artifact_id': artifact.artifact_id})
+        except HttpError:
+            raise
+        except Exception as e:
+            logger.error("Error generating document content: %s", e)
+            return Response.json({"error": str(e)}, status=500)
+
+    # Return the final doc
+    async def final_form(self, request):
+        try:
+            form_details = request.submitted_form()
+            if form_details is None:
+                return Response.json({"error": "No form data provided"}, status=400)
+            logger.debug("Generating final document with data: %s", Payload(form_details))
+
+            artifact = await self.run(self.io_executor, get_artifact, form_details, None)
+            if artifact is None:
+                return Response.json({"error": "Document not found"}, status=404)
+            form_name = artifact.form_name
+            form_link = artifact.form_link
+
+            if form_link.lower().endswith('.pdf'):
+                try:
+                    if "pdf" not in artifact.outputs:
+                        # Downloading the template waits on the network without holding a thread
+                        content, content_hash = await get_template_store().fetch_with_hash_async(
+                            form_link, executor=self.io_executor
+                        )
+
+                    def render_pdf():
+                        template = get_parsed_template(form_link, content, content_hash)
+                        return render(artifact.document, "pdf", template=template).getvalue()
+
+                    output_pdf = await self.run(self.render_executor, artifact_cache.render, artifact, "pdf", render_pdf)
+                    return Response.download(output_pdf, PDF_MIMETYPE, f"{form_name}_filled.pdf")
+                except Exception as e:
+                    if not falls_back_to_docx(e):
+                        return Response.json({"error": str(e)}, status=500)
+                    logger.error("Error generating PDF: %s", e)
+                    logger.info("Falling back to DOCX generation")
+
+            output_docx = await self.run(
+                self.render_executor, artifact_cache.render, artifact, "docx",
+                lambda: render(artifact.document, "docx").getvalue()
+            )
+            return Response.download(output_docx, DOCX_MIMETYPE, f"{form_name}.docx")
+        except HttpError:
+            raise
+        except Exception as e:
+            logger.error("Error serving final document: %s", e)
+            return Response.json({"error": str(e)}, status=500)
+
+def create_asgi_app():
+    """
+    Create the ASGI application
+
+    The remaining routes (catalog, jobs, bulk, static files) are served by the
+    Flask app through asgiref's WSGI adapter.
+
+    Raises:
+        RuntimeError: If asgiref is not installed, rather than serving only part of the API
+    """
+    try:
+        from asgiref.wsgi import WsgiToAsgi
+    except ImportError:
+        raise RuntimeError("asgiref is required to serve the app with asyncio (pip install asgiref)")
+    # The async startup warms the shared modules itself
+    return AsyncApp(fallback=WsgiToAsgi(create_app(warmup=False)))
+
+_app = None
+
+def __getattr__(name):
+    # `uvicorn asgi:app` creates the application on first access, like `from app import app`
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_asgi_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,65 @@
+"""
+Microbenchmark intent matching latency on long, realistic chat messages.
+
+Compares the original loop of re.search calls (with the re module cache
+purged between messages, as happens when a process churns through other
+regexes, and with it warm) against the loop over patterns compiled once.
+
+Usage:
+    python benchmarks/bench_bot.py [--iterations N]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.bot import patterns, match_pattern
+
+MESSAGES = [
+    "My partner and I have been living apart for about two years now and we share a house "
+    "that we bought together in 2015. I am not sure what documents I need to file so that the "
+    "property is split fairly and I would like to understand the process before talking to anyone.",
+    "We are three friends who want to open a small bakery downstairs from our apartment and we "
+    "have no idea how to register it properly, what paperwork the city will ask for, or whether we "
+    "should be a partnership or something else entirely.",
+    "My father is getting older and has started forgetting things, so the family wants someone to "
+    "be able to handle his bank accounts and medical decisions if he cannot do that himself anymore.",
+    "I received a letter saying I owe money from last year and I do not understand why, I filed "
+    "everything on time and my employer sent all the forms, what should I do next?",
+    "Nothing in particular, I was just browsing around to see what kinds of documents you support "
+    "and whether any of them would be useful for me at some point in the future.",
+]
+
+def loop_match(message):
+    """The original approach: one re.search per pattern, in priority order"""
+    for item in patterns:
+        if re.search(item['pattern'], message):
+            return item
+    return None
+
+def measure(label, match, iterations, purge):
+    start = time.perf_counter()
+    for i in range(iterations):
+        if purge:
+            re.purge()
+        match(MESSAGES[i % len(MESSAGES)])
+    elapsed = time.perf_counter() - start
+    print(f"{label:<26} {elapsed / iterations * 1e6:10.1f} us/message")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=5000)
+    args = parser.parse_args()
+
+    for message in MESSAGES:
+        assert loop_match(message) is match_pattern(message)
+
+    measure("re.search loop (cold)", loop_match, args.iterations, purge=True)
+    measure("re.search loop (cached)", loop_match, args.iterations, purge=False)
+    measure("precompiled loop", match_pattern, args.iterations, purge=True)
+
+if __name__ == '__main__':
+    main()
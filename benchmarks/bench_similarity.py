@@ -0,0 +1,67 @@
+"""
+Benchmark chat retrieval throughput: per-request TF-IDF refit vs the prebuilt index,
+and per-query vs batched scoring.
+
+Usage:
+    python benchmarks/bench_similarity.py [--iterations N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from model.similarity import knowledge_base, preprocess_text, get_index
+
+# Queries that miss the keyword stage so every call reaches the similarity step
+QUERIES = [
+    "I want to protect my creative works and brand",
+    "my landlord is threatening me over the apartment",
+    "need paperwork for healthcare decisions for my mother",
+    "how do I start a new company with two partners",
+    "questions about veterans pension and disability payments",
+    "looking for help with an inheritance dispute",
+]
+
+def refit_similarities(processed_query):
+    """The original per-request approach: refit the vectorizer on corpus + query"""
+    corpus = [' '.join(item['keywords']) for item in knowledge_base]
+    corpus.append(processed_query)
+    tfidf_matrix = TfidfVectorizer().fit_transform(corpus)
+    return cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1]).flatten()
+
+def measure(label, score, iterations):
+    processed = [preprocess_text(q) for q in QUERIES]
+    start = time.perf_counter()
+    for i in range(iterations):
+        score(processed[i % len(processed)])
+    elapsed = time.perf_counter() - start
+    qps = iterations / elapsed
+    print(f"{label:<16} {iterations:>7} queries  {elapsed:8.3f}s  {qps:10.1f} queries/s")
+    return qps
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    index = get_index()
+    refit_qps = measure("refit", refit_similarities, args.iterations)
+    index_qps = measure("prebuilt index", index.similarities, args.iterations)
+    print(f"speedup: {index_qps / refit_qps:.1f}x")
+
+    # Score the same number of queries as one batch through a single matrix product
+    batch = [preprocess_text(QUERIES[i % len(QUERIES)]) for i in range(args.iterations)]
+    start = time.perf_counter()
+    index.similarity_matrix(batch).argmax(axis=1)
+    elapsed = time.perf_counter() - start
+    batch_qps = args.iterations / elapsed
+    print(f"{'batched index':<16} {args.iterations:>7} queries  {elapsed:8.3f}s  {batch_qps:10.1f} queries/s")
+    print(f"batch speedup over prebuilt index: {batch_qps / index_qps:.1f}x")
+
+if __name__ == '__main__':
+    main()
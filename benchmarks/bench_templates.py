@@ -0,0 +1,74 @@
+"""
+Benchmark filled-PDF downloads per second with and without the parsed template cache.
+
+A synthetic multi-page template with text on every page stands in for a
+court form, so no network access is needed.
+
+Usage:
+    python benchmarks/bench_templates.py [--pages N] [--iterations N]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from documents import build_pdf, get_parsed_template
+
+ANSWERS = [("Full Name", "Jane Doe"), ("Address", "1 Main Street"), ("Business Name", "Acme LLC")]
+
+def make_template(pages):
+    """Build a PDF with a line of text on each of its pages"""
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    font_ref = writer._add_object(font)
+    for number in range(pages):
+        page = writer.add_blank_page(width=612, height=792)
+        lines = "".join(f"BT /F1 10 Tf 72 {720 - 14 * i} Td (Page {number + 1} line {i} of the form) Tj ET\n" for i in range(40))
+        content = DecodedStreamObject()
+        content.set_data(lines.encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font_ref})
+        })
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+def measure(label, render, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render()
+    elapsed = time.perf_counter() - start
+    rate = iterations / elapsed
+    print(f"{label:<14} {iterations:>5} downloads  {elapsed:8.3f}s  {rate:8.1f} downloads/s")
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    content = make_template(args.pages)
+    print(f"template: {args.pages} pages, {len(content)} bytes")
+
+    uncached = measure("parse each", lambda: build_pdf(content, "Form", ANSWERS), args.iterations)
+    cached = measure(
+        "parsed cache",
+        lambda: build_pdf(get_parsed_template("bench://template.pdf", content), "Form", ANSWERS),
+        args.iterations,
+    )
+    print(f"speedup: {cached / uncached:.1f}x")
+
+if __name__ == '__main__':
+    main()
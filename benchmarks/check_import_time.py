@@ -0,0 +1,88 @@
+"""
+Check how long `import app` takes, and that heavy libraries stay off the import path.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter with the
+background warm-up disabled, prints the slowest imports, and fails when the
+total goes over the budget or when any of the lazily loaded libraries
+(scikit-learn, PyPDF2, python-docx, requests, ...) gets imported eagerly.
+
+Usage:
+    python benchmarks/check_import_time.py [--budget-ms N] [--module app] [--top N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must only be imported on first use or by the warm-up thread
+LAZY_MODULES = ("sklearn", "scipy", "numpy", "PyPDF2", "docx", "requests", "pdfrw", "mammoth", "model.similarity")
+
+# Most milliseconds `import app` may take
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "500"))
+
+def measure(module):
+    """
+    Import module in a fresh interpreter
+
+    Returns:
+        list: (cumulative microseconds, module name) for every import
+    """
+    env = dict(os.environ, APP_WARMUP="0", PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), name.strip()))
+    return imports
+
+def total_ms(imports, module):
+    """Milliseconds the import of module took, including everything it imported"""
+    return next(cumulative for cumulative, name in imports if name == module) / 1000
+
+def eager_imports(imports):
+    """Return the LAZY_MODULES found among imports"""
+    names = {name for _, name in imports}
+    return [
+        lazy for lazy in LAZY_MODULES
+        if any(name == lazy or name.startswith(lazy + ".") for name in names)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if importing the app is too slow or loads heavy libraries")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    imports = measure(args.module)
+    total = total_ms(imports, args.module)
+    eager = eager_imports(imports)
+
+    print(f"import {args.module}: {total:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print("slowest top-level imports:")
+    top_level = [(cumulative, name) for cumulative, name in imports if "." not in name and name != args.module]
+    for cumulative, name in sorted(top_level, reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if total > args.budget_ms:
+        print(f"FAIL: import took {total:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+        failed = True
+    if not failed:
+        print("ok")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+"""
+Check that the catalog read-through queries stay on indexes as the catalog grows.
+
+Builds a scratch database from schema.sql, fills it with a synthetic catalog
+of many forms, then runs EXPLAIN QUERY PLAN on every query the request path
+uses. Any full table scan fails the check, so a missing or dropped index
+shows up here instead of in production latency.
+
+Usage:
+    python benchmarks/check_query_plans.py [--forms N] [--questions-per-form N]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from catalog import FORM_DETAILS_QUERY, FORM_QUERY, FORMS_QUERY, QUESTION_TEXTS_QUERY
+
+# (name, query, parameters) of every catalog query on the request path
+CHECKS = [
+    ("forms by service", FORMS_QUERY, ["BSV00001"]),
+    ("form details", FORM_DETAILS_QUERY, ["BFRM000042"]),
+    ("question texts", QUESTION_TEXTS_QUERY.format(placeholders="?, ?, ?"), ["BQ00001", "BQ00002", "BQ00003"]),
+    ("form lookup", FORM_QUERY, ["BFRM000042"]),
+]
+
+def build_database(path, forms, questions_per_form):
+    """Create the schema and add a synthetic catalog on top of the sample data"""
+    conn = sqlite3.connect(path)
+    with open(os.path.join(ROOT, "schema.sql")) as f:
+        conn.executescript(f.read())
+
+    services = max(1, forms // 100)
+    question_count = max(questions_per_form * 10, 200)
+    conn.executemany(
+        "INSERT INTO services (service_id, service_name, service_description) VALUES (?, ?, ?)",
+        [(f"BSV{i:05d}", f"Service {i}", "Synthetic service") for i in range(services)]
+    )
+    conn.executemany(
+        "INSERT INTO ques_categories (id, name, description) VALUES (?, ?, ?)",
+        [(f"BCAT{i:03d}", f"Category {i}", "Synthetic category") for i in range(50)]
+    )
+    conn.executemany(
+        "INSERT INTO input_ques (ques_id, ques_text, placeholder, category_id) VALUES (?, ?, ?, ?)",
+        [(f"BQ{i:05d}", f"Question {i}", "", f"BCAT{i % 50:03d}") for i in range(question_count)]
+    )
+    conn.executemany(
+        "INSERT INTO forms (form_id, form_name, form_description, form_link, service_id) VALUES (?, ?, ?, ?, ?)",
+        [(f"BFRM{i:06d}", f"Form {i}", "Synthetic form", f"https://example.org/{i}.pdf", f"BSV{i % services:05d}")
+         for i in range(forms)]
+    )
+    conn.executemany(
+        "INSERT INTO form_queries (form_id, form_query_id) VALUES (?, ?)",
+        [(f"BFRM{i:06d}", f"BQ{(i * 7 + j) % question_count:05d}")
+         for i in range(forms) for j in range(questions_per_form)]
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    return conn
+
+def full_scans(conn, query, params):
+    """Return the plan lines of query that read a whole table"""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    return [row[3] for row in plan if row[3].startswith("SCAN ") and "CONSTANT ROW" not in row[3]], plan
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if a catalog query plan contains a full table scan")
+    parser.add_argument("--forms", type=int, default=20000)
+    parser.add_argument("--questions-per-form", type=int, default=12)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = build_database(os.path.join(tmp, "plans.db"), args.forms, args.questions_per_form)
+        print(f"catalog: {args.forms} forms, {args.forms * args.questions_per_form} form questions")
+        failed = False
+        for name, query, params in CHECKS:
+            scans, plan = full_scans(conn, query, params)
+            start = time.perf_counter()
+            conn.execute(query, params).fetchall()
+            elapsed = (time.perf_counter() - start) * 1000
+            status = "FAIL" if scans else "ok"
+            print(f"{status:<5} {name:<18} {elapsed:8.3f} ms")
+            for row in plan:
+                print(f"        {row[3]}")
+            failed = failed or bool(scans)
+        conn.close()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,239 @@
+import argparse
+import csv
+import io
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog import answer_question_ids, get_catalog, load_question_texts, lookup_form, resolve_form_answers
+from documents import FormDocument, ParsedTemplate, render
+from template_store import get_template_store
+
+logger = logging.getLogger(__name__)
+
+# Worker processes used to render a batch
+BULK_WORKERS = int(os.environ.get("BULK_WORKERS", str(os.cpu_count() or 2)))
+
+# Largest number of answer sets accepted in one batch
+BULK_MAX_ROWS = int(os.environ.get("BULK_MAX_ROWS", "5000"))
+
+# Column that, when present, names each generated file
+FILENAME_COLUMN = "filename"
+
+def parse_answer_sets(stream, fmt):
+    """
+    Read answer sets from a CSV or JSONL text stream
+
+    CSV headers and JSON keys are question ids, written either as the form
+    fields name them ("001") or as stored ("Q001").
+
+    Args:
+        stream (io.TextIOBase): The uploaded data
+        fmt (str): 'csv' or 'jsonl'
+
+    Yields:
+        dict: One answer set per row
+    """
+    if fmt == "csv":
+        rows = csv.DictReader(stream)
+    elif fmt == "jsonl":
+        rows = _read_jsonl(stream)
+    else:
+        raise ValueError(f"Unsupported answer format: {fmt}")
+
+    for row in rows:
+        answers = {}
+        for key, value in row.items():
+            if key is None:
+                continue
+            key = key.strip()
+            if key == FILENAME_COLUMN:
+                answers[key] = value
+                continue
+            if key[:1] in ("Q", "q"):
+                key = key[1:]
+            answers[key] = "" if value is None else str(value)
+        yield answers
+
+def _read_jsonl(stream):
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        if not isinstance(row, dict):
+            raise ValueError(f"Line {line_number}: expected a JSON object of answers, got {type(row).__name__}")
+        yield row
+
+def _safe_filename(name):
+    return re.sub(r'[^\w.-]+', '_', name).strip('._') or "document"
+
+def _unique_filename(name, used):
+    # Repeated names get a numeric suffix so every document keeps its own archive entry
+    candidate = name
+    suffix = 2
+    while candidate in used:
+        candidate = f"{name}_{suffix}"
+        suffix += 1
+    used.add(candidate)
+    return candidate
+
+# Shared per worker process, set once by _init_worker
+_worker_template = None
+
+def _init_worker(template):
+    global _worker_template
+    # Parse the template once per worker; every document clones pages from it
+    _worker_template = ParsedTemplate(template) if template is not None else None
+
+def _render_one(document):
+    if _worker_template is not None:
+        try:
+            return "pdf", render(document, "pdf", template=_worker_template).getvalue()
+        except Exception as e:
+            logger.error("Error generating PDF in bulk job: %s", e)
+    return "docx", render(document, "docx").getvalue()
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, unseekable buffer that hands finished ZIP bytes to a generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def generate_bulk_zip(form_id, answer_sets, workers=BULK_WORKERS, max_rows=BULK_MAX_ROWS, get_connection=None):
+    """
+    Render one document per answer set and stream them back as a ZIP
+
+    The form record, question texts and template are loaded once for the
+    whole batch; rendering is spread across worker processes, and finished
+    documents are written to the archive in input order as they complete.
+    The form is looked up and every answer set is read and checked before
+    anything is streamed, so an unknown form_id raises KeyError and bad input
+    raises ValueError straight away. A document that fails to render once
+    streaming has begun gets a .error.txt entry in its place.
+
+    Args:
+        form_id (str): The form to fill
+        answer_sets (iterable): Dicts of question id -> value
+        workers (int): Number of worker processes
+        max_rows (int): Largest number of answer sets to accept
+        get_connection (callable): Connection for catalog read-through
+
+    Returns:
+        generator: Chunks of the ZIP archive as bytes
+    """
+    form_data = lookup_form(form_id, get_connection)
+    if form_data is None:
+        raise KeyError(f"Unknown form_id: {form_id}")
+    form_name = form_data["form_name"]
+    form_link = form_data["form_link"]
+
+    documents = _prepare_documents(form_id, form_name, form_link, answer_sets, max_rows, get_connection)
+
+    template = None
+    if form_link.lower().endswith('.pdf'):
+        try:
+            template = get_template_store().fetch(form_link)
+        except Exception as e:
+            logger.error("Could not load template for bulk job, falling back to DOCX: %s", e)
+
+    return _stream_zip(documents, template, workers)
+
+def _prepare_documents(form_id, form_name, form_link, answer_sets, max_rows, get_connection):
+    """Read every answer set and build its document, before the first byte is streamed"""
+    rows = list(itertools.islice(answer_sets, max_rows + 1))
+    if len(rows) > max_rows:
+        raise ValueError(f"At most {max_rows} answer sets per batch")
+
+    # Every question any row answers, resolved together rather than once per row
+    question_texts = load_question_texts(
+        set().union(*(answer_question_ids(row) for row in rows)), get_connection
+    )
+    current = get_catalog()
+    used_names = set()
+    documents = []
+    for index, row in enumerate(rows, start=1):
+        filename = _unique_filename(
+            _safe_filename(row.pop(FILENAME_COLUMN, None) or f"{index:05d}_{form_name}"), used_names
+        )
+        documents.append((filename, FormDocument(
+            form_name, form_link, resolve_form_answers(row, question_texts=question_texts),
+            current.get_field_fills(form_id, row)
+        )))
+    return documents
+
+def _stream_zip(documents, template, workers):
+    stream = _ZipStream()
+    archive = zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_DEFLATED)
+    context = multiprocessing.get_context(os.environ.get("JOB_START_METHOD", "spawn"))
+    pending = deque()
+    # Keep a bounded number of rendered documents in flight so huge batches stream in bounded memory
+    window = max(1, workers) * 4
+
+    def write_next():
+        filename, future = pending.popleft()
+        try:
+            kind, content = future.result()
+        except Exception as e:
+            # The response has started, so the failure is reported inside the archive
+            logger.error("Bulk document %s failed: %s", filename, e)
+            archive.writestr(f"{filename}.error.txt", f"Failed to generate document: {e}\n")
+            return
+        archive.writestr(f"{filename}.{kind}", content)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(template,)) as executor:
+        for filename, document in documents:
+            pending.append((filename, executor.submit(_render_one, document)))
+            while len(pending) >= window:
+                write_next()
+                yield stream.drain()
+        while pending:
+            write_next()
+            yield stream.drain()
+
+    archive.close()
+    yield stream.drain()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill one form for many answer sets and write a ZIP")
+    parser.add_argument("form_id", help="Form to fill, e.g. FRM004")
+    parser.add_argument("answers", help="CSV or JSONL file of answer sets, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="ZIP file to write")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="Input format, guessed from the file name if omitted")
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS)
+    args = parser.parse_args()
+
+    fmt = args.format or ("jsonl" if args.answers.endswith((".jsonl", ".ndjson")) else "csv")
+    source = sys.stdin if args.answers == "-" else open(args.answers, newline="", encoding="utf-8")
+    try:
+        with open(args.output, "wb") as output:
+            for chunk in generate_bulk_zip(args.form_id, parse_answer_sets(source, fmt), workers=args.workers):
+                output.write(chunk)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    with zipfile.ZipFile(args.output) as archive:
+        print(f"Wrote {len(archive.namelist())} documents to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# How often, in seconds, to check whether the database file was rewritten
+CATALOG_CHECK_INTERVAL = float(os.environ.get("CATALOG_CHECK_INTERVAL", "2"))
+
+class Catalog:
+    """
+    In-memory snapshot of the services, forms and questions tables.
+
+    The tables are loaded once into dicts indexed the way the API reads them:
+    service -> forms, form -> question ids and question -> category. Rows keep
+    the order SQLite returned them in, so responses match the old queries.
+    """
+
+    def __init__(self, conn, version=1, signature=None, last_modified=None):
+        self.version = version
+        self.signature = signature
+        self.loaded_at = time.time()
+        # When the underlying database was last written, for Last-Modified headers
+        self.last_modified = last_modified or self.loaded_at
+        # Serialized API responses for this version, keyed by route and arguments
+        self._responses = {}
+
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM services')
+        self.services = [dict(row) for row in cursor.fetchall()]
+        self.services_by_id = {service['service_id']: service for service in self.services}
+
+        cursor.execute('SELECT * FROM forms')
+        self.forms_by_id = {}
+        self.forms_by_service = {}
+        for row in cursor.fetchall():
+            form = dict(row)
+            self.forms_by_id[form['form_id']] = form
+            self.forms_by_service.setdefault(form['service_id'], []).append(form)
+
+        cursor.execute('SELECT * FROM ques_categories')
+        self.categories = [dict(row) for row in cursor.fetchall()]
+
+        cursor.execute('SELECT * FROM input_ques')
+        self.questions = [dict(row) for row in cursor.fetchall()]
+        self.questions_by_id = {question['ques_id']: question for question in self.questions}
+
+        cursor.execute('SELECT form_id, form_query_id FROM form_queries ORDER BY id')
+        self.form_questions = {}
+        for row in cursor.fetchall():
+            self.form_questions.setdefault(row['form_id'], set()).add(row['form_query_id'])
+
+        # Where each question's answer goes in the form's PDF, precomputed by index_form_fields.py
+        self.field_map = {}
+        try:
+            cursor.execute(
+                'SELECT m.form_id, m.ques_id, f.template_sha256, f.page_index, f.annot_index, f.field_type '
+                'FROM form_field_map m JOIN form_fields f '
+                'ON f.form_id = m.form_id AND f.field_name = m.field_name '
+                'ORDER BY m.id'
+            )
+        except sqlite3.OperationalError:
+            # Databases seeded before the field tables existed simply have no mapping
+            logger.warning("No form field tables in the database, PDF fields will not be filled")
+        else:
+            for row in cursor.fetchall():
+                self.field_map.setdefault(row['form_id'], {}).setdefault(row['ques_id'], []).append(
+                    (row['template_sha256'], row['page_index'], row['annot_index'], row['field_type'])
+                )
+        cursor.close()
+
+    def get_services(self):
+        """All services, as returned by /api/services"""
+        return self.services
+
+    def get_forms(self, service_id):
+        """Forms of a service joined with the service name, as returned by /api/forms"""
+        service = self.services_by_id.get(service_id)
+        if service is None:
+            return []
+        return [
+            {
+                'service_id': service['service_id'],
+                'service_name': service['service_name'],
+                'form_id': form['form_id'],
+                'form_name': form['form_name'],
+                'form_link': form['form_link'],
+            }
+            for form in self.forms_by_service.get(service_id, [])
+        ]
+
+    def get_form(self, form_id):
+        """The forms row for form_id, or None"""
+        return self.forms_by_id.get(form_id)
+
+    def get_form_details(self, form_id):
+        """
+        Form row, categories and questions for a form, as returned by /api/form-details
+
+        Returns:
+            list: The combined rows, or None if the form is not in the catalog
+        """
+        form = self.forms_by_id.get(form_id)
+        if form is None:
+            return None
+        ques_ids = self.form_questions.get(form_id, set())
+        questions = [question for question in self.questions if question['ques_id'] in ques_ids]
+        category_ids = {question['category_id'] for question in questions}
+        categories = [category for category in self.categories if category['id'] in category_ids]
+        return [form] + categories + questions
+
+    def serialized(self, key, build, dumps):
+        """
+        Serialize a catalog response once per catalog version
+
+        Args:
+            key (tuple): Route and arguments identifying the response
+            build (callable): Returns the data to serialize
+            dumps (callable): Serializer returning a str
+
+        Returns:
+            tuple: (body bytes, content-derived ETag)
+        """
+        cached = self._responses.get(key)
+        if cached is None:
+            body = dumps(build()).encode('utf-8')
+            etag = hashlib.sha1(body).hexdigest()
+            cached = (body, etag)
+            self._responses[key] = cached
+        return cached
+
+    def get_question_texts(self, ques_ids):
+        """Map each known question id to its text"""
+        return {
+            ques_id: self.questions_by_id[ques_id]['ques_text']
+            for ques_id in ques_ids
+            if ques_id in self.questions_by_id
+        }
+
+    def get_field_fills(self, form_id, form_details):
+        """
+        Turn a form submission into AcroForm fills by looking up the precomputed field map
+
+        Args:
+            form_id (str): The form being filled
+            form_details (dict): The submitted form data
+
+        Returns:
+            list: (template_sha256, page_index, annot_index, field_type, value) tuples
+        """
+        form_fields = self.field_map.get(form_id)
+        if not form_fields:
+            return []
+        fills = []
+        for key, value in form_details.items():
+            if key == "form_id" or not key.isdigit():
+                continue
+            for template_sha256, page_index, annot_index, field_type in form_fields.get(f"Q{key.zfill(3)}", ()):
+                fills.append((template_sha256, page_index, annot_index, field_type, value))
+        return fills
+
+def database_signature(db_path):
+    """
+    Cheap fingerprint of the database files, used to notice when they are rewritten
+
+    The seeding scripts delete and recreate the file, which changes its inode;
+    in-place writes in WAL mode show up on the -wal file.
+    """
+    signature = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+_catalog = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+def reload_catalog():
+    """
+    Load a fresh catalog from the database and swap it in
+
+    Returns:
+        Catalog: The newly loaded catalog
+    """
+    global _catalog, _last_check
+    with _lock:
+        db_path = db.get_db_path()
+        signature = database_signature(db_path)
+        version = _catalog.version + 1 if _catalog is not None else 1
+        conn = db.connect(db_path)
+        try:
+            last_modified = max(os.stat(path).st_mtime for path in (db_path, f"{db_path}-wal") if os.path.exists(path))
+            catalog = Catalog(conn, version=version, signature=signature, last_modified=last_modified)
+        finally:
+            conn.close()
+        _catalog = catalog
+        _last_check = time.monotonic()
+        logger.info(
+            "Loaded catalog v%d: %d services, %d forms, %d questions",
+            catalog.version, len(catalog.services), len(catalog.forms_by_id), len(catalog.questions)
+        )
+        return catalog
+
+def invalidate_catalog():
+    """Force the next get_catalog call to reload from the database"""
+    global _last_check
+    with _lock:
+        if _catalog is not None:
+            _catalog.signature = None
+        # Not 0.0: time.monotonic() may itself be below CATALOG_CHECK_INTERVAL, e.g. soon after boot
+        _last_check = float('-inf')
+
+def get_catalog():
+    """
+    Return the current catalog, reloading it if the database was rewritten
+
+    The database files are only stat()ed, at most every CATALOG_CHECK_INTERVAL
+    seconds; reads in between are served entirely from memory.
+    """
+    global _last_check
+    catalog = _catalog
+    if catalog is None:
+        return reload_catalog()
+    now = time.monotonic()
+    if now - _last_check >= CATALOG_CHECK_INTERVAL:
+        _last_check = now
+        if database_signature(db.get_db_path()) != catalog.signature:
+            return reload_catalog()
+    return catalog
+
+# Read-through queries, kept here so benchmarks/check_query_plans.py checks the SQL the app runs
+FORMS_QUERY = """
+    SELECT services.service_id, services.service_name, forms.form_id, forms.form_name, forms.form_link
+    FROM services
+    INNER JOIN forms ON services.service_id = forms.service_id
+    WHERE forms.service_id = ?
+"""
+
+# The form, each of its questions and each question's category in one pass;
+# forms without questions still return their row through the LEFT JOINs
+FORM_DETAILS_QUERY = """
+    SELECT forms.form_id, forms.form_name, forms.form_description, forms.form_link, forms.service_id,
+           input_ques.ques_id, input_ques.ques_text, input_ques.placeholder, input_ques.category_id,
+           ques_categories.id AS cat_id, ques_categories.name AS cat_name,
+           ques_categories.description AS cat_description
+    FROM forms
+    LEFT JOIN form_queries ON form_queries.form_id = forms.form_id
+    LEFT JOIN input_ques ON input_ques.ques_id = form_queries.form_query_id
+    LEFT JOIN ques_categories ON ques_categories.id = input_ques.category_id
+    WHERE forms.form_id = ?
+    ORDER BY input_ques.ques_id
+"""
+
+QUESTION_TEXTS_QUERY = "SELECT ques_id, ques_text FROM input_ques WHERE ques_id IN ({placeholders});"
+
+FORM_QUERY = "SELECT form_link, form_name FROM forms where form_id = ?;"
+
+def split_form_details(rows):
+    """
+    Turn FORM_DETAILS_QUERY rows into the form row, its categories and its questions
+
+    Returns:
+        list: The form, then its categories, then its questions, or [] if the form does not exist
+    """
+    if not rows:
+        return []
+    first = rows[0]
+    form = {key: first[key] for key in ('form_id', 'form_name', 'form_description', 'form_link', 'service_id')}
+    categories = {}
+    questions = {}
+    for row in rows:
+        if row['ques_id'] is None or row['ques_id'] in questions:
+            continue
+        questions[row['ques_id']] = {
+            key: row[key] for key in ('ques_id', 'ques_text', 'placeholder', 'category_id')
+        }
+        if row['cat_id'] is not None and row['cat_id'] not in categories:
+            categories[row['cat_id']] = {
+                'id': row['cat_id'], 'name': row['cat_name'], 'description': row['cat_description']
+            }
+    return [form] + sorted(categories.values(), key=lambda category: category['id']) + list(questions.values())
+
+def _read_through(query, params, get_connection=None):
+    """Run a query for data missing from the catalog, on the given or a fresh connection"""
+    conn = get_connection() if get_connection is not None else db.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        return rows
+    finally:
+        if get_connection is None:
+            conn.close()
+
+def answer_question_ids(form_details):
+    """
+    Question ids answered by a form submission, e.g. {"1": ...} -> {"Q001"}
+
+    Returns:
+        set: The question ids
+    """
+    return {f"Q{key.zfill(3)}" for key in form_details if key != "form_id" and key.isdigit()}
+
+def load_question_texts(ques_ids, get_connection=None):
+    """
+    Map question ids to their texts
+
+    Texts come from the catalog, reading through to the database in a single
+    IN (...) query for any it lacks. Unknown ids are left out.
+
+    Args:
+        ques_ids (iterable): Question ids such as "Q001"
+        get_connection (callable): Returns the connection to read through with
+
+    Returns:
+        dict: ques_id -> question text
+    """
+    ques_ids = sorted(set(ques_ids))
+    question_texts = get_catalog().get_question_texts(ques_ids)
+    missing = [ques_id for ques_id in ques_ids if ques_id not in question_texts]
+    if missing:
+        placeholders = ', '.join('?' * len(missing))
+        rows = _read_through(
+            QUESTION_TEXTS_QUERY.format(placeholders=placeholders),
+            missing, get_connection
+        )
+        question_texts.update({row["ques_id"]: row["ques_text"] for row in rows})
+    return question_texts
+
+def resolve_form_answers(form_details, get_connection=None, question_texts=None):
+    """
+    Pair every numeric answer of a form submission with its question text
+
+    Args:
+        form_details (dict): The submitted form data
+        get_connection (callable): Returns the connection to read through with
+        question_texts (dict): Texts already loaded with load_question_texts, e.g.
+            once for a whole batch; looked up for this submission if None
+
+    Returns:
+        list: (question_text, value) pairs in submission order
+    """
+    answers = [(key, value) for key, value in form_details.items() if key != "form_id" and key.isdigit()]
+    if question_texts is None:
+        question_texts = load_question_texts(answer_question_ids(form_details), get_connection)
+    # Make sure to properly format the IDs, e.g. "1" -> "Q001"
+    return [(question_texts.get(f"Q{key.zfill(3)}", f"Field {key}"), value) for key, value in answers]
+
+def lookup_form(form_id, get_connection=None):
+    """
+    Return the link and name of a form, from the catalog when possible
+
+    Returns:
+        dict: form_link and form_name, or None if the form does not exist
+    """
+    form = get_catalog().get_form(form_id)
+    if form is not None:
+        return {"form_link": form["form_link"], "form_name": form["form_name"]}
+    rows = _read_through(FORM_QUERY, [form_id], get_connection)
+    return rows[0] if rows else None
@@ -0,0 +1,107 @@
+import logging
+import os
+import sqlite3
+
+from flask import g
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = 'legal_assistant.db'
+ALT_DB_FILE = 'legal_assistant_new.db'
+
+# Applied to every new connection
+CONNECTION_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.environ.get("DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # Negative values are in KiB
+    'cache_size': -int(os.environ.get("DB_CACHE_KIB", "16384")),
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
+}
+
+_db_path = None
+
+def resolve_db_path():
+    """
+    Work out which database file to use, once per process
+
+    Returns:
+        str: Absolute path of the database file
+    """
+    db_path = os.environ.get("DATABASE_PATH", DB_FILE)
+
+    # Check for the main database file
+    if not os.path.exists(db_path):
+        # Check for the alternate database file
+        if os.path.exists(ALT_DB_FILE):
+            logger.info("Using alternative database: %s", ALT_DB_FILE)
+            db_path = ALT_DB_FILE
+        else:
+            logger.warning("Database file not found: %s. Creating empty database.", db_path)
+
+    return os.path.abspath(db_path)
+
+def get_db_path():
+    """Return the database path, resolving it on first use"""
+    global _db_path
+    if _db_path is None:
+        _db_path = resolve_db_path()
+    return _db_path
+
+def connect(db_path=None):
+    """
+    Open a new tuned connection, for use outside of a request (scripts, workers)
+
+    Args:
+        db_path (str): Database file, defaults to the resolved application database
+
+    Returns:
+        sqlite3.Connection: A connection returning sqlite3.Row rows
+    """
+    conn = sqlite3.connect(db_path or get_db_path())
+    conn.row_factory = sqlite3.Row
+    for name, value in CONNECTION_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value};")
+    return conn
+
+def configure_database(db_path=None):
+    """
+    Apply database-level settings that persist in the file, such as WAL mode
+
+    WAL lets catalog reads run concurrently with writes from the seeding scripts.
+    """
+    try:
+        conn = sqlite3.connect(db_path or get_db_path())
+        try:
+            conn.execute("PRAGMA journal_mode = WAL;")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning("Could not enable WAL mode: %s", e)
+
+def get_db_connection():
+    """
+    Return the connection for the current request, opening it on first use
+
+    The connection is closed by close_db_connection when the request ends.
+    """
+    conn = g.get('_db_connection')
+    if conn is None:
+        try:
+            conn = connect()
+        except Exception as e:
+            logger.error("Database connection error: %s", e)
+            raise
+        g._db_connection = conn
+    return conn
+
+def close_db_connection(exception=None):
+    """Close the current request's connection, if one was opened"""
+    conn = g.pop('_db_connection', None)
+    if conn is not None:
+        conn.close()
+
+def init_app(app):
+    """Resolve the database once and register per-request connection cleanup"""
+    configure_database(get_db_path())
+    app.teardown_appcontext(close_db_connection)
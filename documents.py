@@ -0,0 +1,459 @@
+import hashlib
+import io
+import os
+import textwrap
+import threading
+from urllib.parse import quote
+
+from model.cache import LRUCache
+from template_store import TemplateFetchError
+
+DOCX_MIMETYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PDF_MIMETYPE = "application/pdf"
+HTML_MIMETYPE = "text/html"
+
+# Size of the pieces documents are streamed to clients in
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", str(64 * 1024)))
+
+# Memory budget for parsed templates, measured by the size of their source PDFs
+PARSED_TEMPLATE_CACHE_BYTES = int(os.environ.get("PARSED_TEMPLATE_CACHE_BYTES", str(128 * 1024 * 1024)))
+PARSED_TEMPLATE_CACHE_SIZE = int(os.environ.get("PARSED_TEMPLATE_CACHE_SIZE", "64"))
+
+# python-docx and PyPDF2 are imported where they are used, so importing this
+# module (for the document model and renderer registry) stays cheap
+
+class ParsedTemplate:
+    """
+    A template PDF parsed once and shared by every request in the process.
+
+    PyPDF2 readers load objects lazily from their stream, so page cloning is
+    serialized with a per-template lock.
+    """
+
+    def __init__(self, content, content_hash=None):
+        from PyPDF2 import PdfReader
+
+        self.content_hash = content_hash or hashlib.sha256(content).hexdigest()
+        self.size = len(content)
+        self.reader = PdfReader(io.BytesIO(content))
+        self.lock = threading.Lock()
+
+    def copy_pages_to(self, writer):
+        """Clone every page of the template, and its AcroForm if any, into writer"""
+        from PyPDF2.generic import NameObject
+
+        with self.lock:
+            for page in self.reader.pages:
+                writer.add_page(page)
+            root = self.reader.trailer["/Root"]
+            if "/AcroForm" in root:
+                # Cloned after the pages so the fields point at the copied widgets
+                acroform = root["/AcroForm"].clone(writer)
+                writer._root_object[NameObject("/AcroForm")] = acroform
+                for field in acroform.get("/Fields") or []:
+                    _link_kids(field)
+
+def _link_kids(field):
+    # Page cloning drops /Parent from the widgets, so point every kid back at its field
+    from PyPDF2.generic import NameObject
+
+    for kid in field.get_object().get("/Kids") or []:
+        kid.get_object()[NameObject("/Parent")] = field
+        _link_kids(kid)
+
+def _qualified_field_name(annot):
+    names = []
+    node = annot
+    while node is not None:
+        if "/T" in node:
+            names.append(str(node["/T"]))
+        node = node["/Parent"].get_object() if "/Parent" in node else None
+    return ".".join(reversed(names))
+
+def _field_type(annot):
+    node = annot
+    while node is not None:
+        if "/FT" in node:
+            return str(node["/FT"])
+        node = node["/Parent"].get_object() if "/Parent" in node else None
+    return None
+
+def extract_form_fields(content):
+    """
+    List the AcroForm fields of a template PDF along with where their widgets live
+
+    Args:
+        content (bytes): The template PDF
+
+    Returns:
+        list: Dicts with field_name, field_type, page_index and annot_index
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(content))
+    fields = []
+    seen = set()
+    for page_index, page in enumerate(reader.pages):
+        for annot_index, annot in enumerate(page.get("/Annots") or []):
+            annot = annot.get_object()
+            if annot.get("/Subtype") != "/Widget":
+                continue
+            field_name = _qualified_field_name(annot)
+            # A field with several widgets is filled through its first one
+            if not field_name or field_name in seen:
+                continue
+            seen.add(field_name)
+            fields.append({
+                "field_name": field_name,
+                "field_type": _field_type(annot),
+                "page_index": page_index,
+                "annot_index": annot_index,
+            })
+    return fields
+
+def fill_form_fields(writer, template, field_fills):
+    """
+    Write answers straight into the indexed AcroForm fields of a copied template
+
+    Each fill names the page and annotation position recorded when the
+    template was indexed, so no page is scanned for field names here.
+    Fills indexed against a different version of the template are skipped.
+
+    Args:
+        writer (PdfWriter): Writer holding the copied template pages
+        template (ParsedTemplate): The template the pages were copied from
+        field_fills (list): (template_sha256, page_index, annot_index, field_type, value) tuples
+
+    Returns:
+        int: Number of fields filled
+    """
+    from PyPDF2.generic import BooleanObject, NameObject, TextStringObject
+
+    filled = 0
+    for template_sha256, page_index, annot_index, field_type, value in field_fills:
+        if template_sha256 != template.content_hash:
+            continue
+        annot = writer.pages[page_index]["/Annots"][annot_index].get_object()
+        # Widgets without their own name hold the value on their parent field
+        field = annot if "/T" in annot else annot["/Parent"].get_object()
+        if field_type == "/Btn":
+            state = NameObject(value if str(value).startswith("/") else f"/{value}")
+            field[NameObject("/V")] = state
+            annot[NameObject("/AS")] = state
+        else:
+            field[NameObject("/V")] = TextStringObject(str(value))
+        filled += 1
+    if filled and "/AcroForm" in writer._root_object:
+        # Ask viewers to draw the new values
+        writer._root_object["/AcroForm"].get_object()[NameObject("/NeedAppearances")] = BooleanObject(True)
+    return filled
+
+parsed_templates = LRUCache(
+    maxsize=PARSED_TEMPLATE_CACHE_SIZE,
+    max_weight=PARSED_TEMPLATE_CACHE_BYTES,
+    weigh=lambda template: template.size,
+)
+
+def get_parsed_template(form_link, content, content_hash=None):
+    """
+    Return the parsed template for a link and content, parsing it on first use
+
+    Args:
+        form_link (str): Where the template came from
+        content (bytes): The template PDF
+        content_hash (str): SHA-256 of content, if already known
+
+    Returns:
+        ParsedTemplate: The shared parsed template
+    """
+    content_hash = content_hash or hashlib.sha256(content).hexdigest()
+    key = (form_link, content_hash)
+    template = parsed_templates.get(key)
+    if template is None:
+        template = ParsedTemplate(content, content_hash)
+        parsed_templates.set(key, template)
+    return template
+
+class FormDocument:
+    """
+    Format-neutral model of a filled form, built once and handed to every renderer.
+
+    Plain attributes only, so documents can be sent to worker processes.
+    """
+
+    def __init__(self, form_name, form_link, answers, field_fills=None):
+        self.form_name = form_name
+        self.form_link = form_link
+        # (question_text, value) pairs in submission order
+        self.answers = list(answers)
+        # AcroForm fills for the PDF template, see fill_form_fields
+        self.field_fills = field_fills or []
+
+class Renderer:
+    """
+    Base class of the output formats.
+
+    Subclasses write the document into a binary buffer with render(); chunks()
+    slices that into pieces for streamed responses, and text formats can
+    override it to yield markup as it is produced.
+    """
+
+    kind = None
+    mimetype = None
+
+    def render(self, document, output, **options):
+        raise NotImplementedError
+
+    def chunks(self, document, chunk_size=STREAM_CHUNK_SIZE, **options):
+        output = io.BytesIO()
+        self.render(document, output, **options)
+        view = output.getbuffer()
+        try:
+            for start in range(0, len(view), chunk_size):
+                yield bytes(view[start:start + chunk_size])
+        finally:
+            view.release()
+
+class HtmlRenderer(Renderer):
+    """The preview shown after the form is submitted"""
+
+    kind = "html"
+    mimetype = HTML_MIMETYPE
+
+    def parts(self, document):
+        """Yield the preview markup piece by piece"""
+        # Create a simple HTML placeholder for PDF files
+        yield f"""
+        <div class="alert alert-info">
+            <h3>PDF Document Preview</h3>
+            <p>The selected document "{document.form_name}" is a PDF file.</p>
+            <p>In a real-world scenario, we would process this PDF file by:</p>
+            <ol>
+                <li>Converting the PDF to a modifiable format</li>
+                <li>Filling in your provided information:</li>
+            </ol>
+            
+            <div class="card p-3 my-3" style="background-color: #2c3e50; border-radius: 10px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
+                <h4 class="text-white">Form Data Provided:</h4>
+                <ul class="text-white">
+        """
+
+        # Add the form details to the HTML content
+        for question_text, value in document.answers:
+            yield f"<li><strong>{question_text}:</strong> {value}</li>"
+
+        yield f"""
+                </ul>
+            </div>
+            
+            <p>The final document would be a completed version of the form with your information inserted in the appropriate places.</p>
+            
+            <div class="d-grid gap-2 d-md-flex justify-content-md-end">
+                <a href="{document.form_link}" target="_blank" class="btn btn-primary">
+                    <i class="bi bi-file-earmark-pdf"></i> View Original PDF
+                </a>
+            </div>
+        </div>
+        """
+
+    def render(self, document, output, **options):
+        for part in self.parts(document):
+            output.write(part.encode("utf-8"))
+
+    def chunks(self, document, chunk_size=STREAM_CHUNK_SIZE, **options):
+        # Group the small pieces so each streamed chunk is worth a write
+        pending = []
+        size = 0
+        for part in self.parts(document):
+            data = part.encode("utf-8")
+            pending.append(data)
+            size += len(data)
+            if size >= chunk_size:
+                yield b"".join(pending)
+                pending = []
+                size = 0
+        if pending:
+            yield b"".join(pending)
+
+class DocxRenderer(Renderer):
+    """The answers as a Word document"""
+
+    kind = "docx"
+    mimetype = DOCX_MIMETYPE
+
+    def render(self, document, output, **options):
+        from docx import Document
+
+        doc = Document()
+        doc.add_heading(f"{document.form_name}", 0)
+
+        doc.add_heading("Form Details", level=1)
+        for question_text, value in document.answers:
+            doc.add_paragraph(f"{question_text}: {value}")
+
+        doc.add_paragraph(f"Original Document: {document.form_link}")
+        doc.save(output)
+
+class PdfRenderer(Renderer):
+    """
+    The source PDF with its indexed fields filled and the answers listed on extra pages.
+
+    Needs the template, as a ParsedTemplate or raw bytes, in the template option.
+    """
+
+    kind = "pdf"
+    mimetype = PDF_MIMETYPE
+
+    # Letter size page and the layout of the form data pages, in points
+    PAGE_WIDTH = 612
+    PAGE_HEIGHT = 792
+    MARGIN = 54
+    FONT_SIZE = 10
+    LEADING = 14
+    LINE_CHARS = 95
+
+    def render(self, document, output, template=None, **options):
+        if template is None:
+            raise ValueError("PDF rendering needs the template PDF")
+        if not isinstance(template, ParsedTemplate):
+            template = ParsedTemplate(template)
+
+        from PyPDF2 import PdfWriter
+
+        writer = PdfWriter()
+
+        # Process each page
+        template.copy_pages_to(writer)
+
+        # Write the answers into the form fields they are mapped to
+        if document.field_fills:
+            fill_form_fields(writer, template, document.field_fills)
+
+        # Add metadata pages with the form data
+        self._add_data_pages(writer, document)
+
+        writer.write(output)
+
+    def _lines(self, document):
+        yield f"{document.form_name} - Form Data"
+        yield ""
+        for question_text, value in document.answers:
+            yield from textwrap.wrap(f"{question_text}: {value}", self.LINE_CHARS) or [""]
+
+    def _add_data_pages(self, writer, document):
+        from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+        font = DictionaryObject({
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+            NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+        })
+        font_ref = writer._add_object(font)
+        lines_per_page = (self.PAGE_HEIGHT - 2 * self.MARGIN) // self.LEADING
+        lines = list(self._lines(document))
+        for start in range(0, len(lines), lines_per_page):
+            content = [
+                b"BT",
+                f"/F1 {self.FONT_SIZE} Tf {self.LEADING} TL {self.MARGIN} {self.PAGE_HEIGHT - self.MARGIN} Td".encode("ascii"),
+            ]
+            for line in lines[start:start + lines_per_page]:
+                content.append(b"(" + _pdf_string(line) + b") Tj T*")
+            content.append(b"ET")
+
+            stream = DecodedStreamObject()
+            stream.set_data(b"\n".join(content))
+            writer.add_blank_page(width=self.PAGE_WIDTH, height=self.PAGE_HEIGHT)
+            # add_page stores a copy, so edit the page the writer actually holds
+            page = writer.pages[-1]
+            page[NameObject("/Resources")] = DictionaryObject({
+                NameObject("/Font"): DictionaryObject({NameObject("/F1"): font_ref}),
+            })
+            page[NameObject("/Contents")] = writer._add_object(stream)
+
+def _pdf_string(text):
+    # Helvetica is set up with WinAnsiEncoding, which cp1252 matches
+    data = text.encode("cp1252", "replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+RENDERERS = {}
+
+def register_renderer(renderer):
+    """Make an output format available to render() under its kind"""
+    RENDERERS[renderer.kind] = renderer
+    return renderer
+
+for _renderer in (HtmlRenderer(), DocxRenderer(), PdfRenderer()):
+    register_renderer(_renderer)
+
+def render(document, kind, **options):
+    """
+    Render a document into a fresh buffer
+
+    Args:
+        document (FormDocument): The filled form
+        kind (str): Output format, e.g. 'html', 'docx' or 'pdf'
+        **options: Renderer options, e.g. template for PDFs
+
+    Returns:
+        io.BytesIO: The output, positioned at the start
+    """
+    output = io.BytesIO()
+    RENDERERS[kind].render(document, output, **options)
+    output.seek(0)
+    return output
+
+def render_chunks(document, kind, chunk_size=STREAM_CHUNK_SIZE, **options):
+    """Render a document as an iterator of byte chunks, for streamed responses"""
+    return RENDERERS[kind].chunks(document, chunk_size=chunk_size, **options)
+
+def content_disposition(download_name):
+    """
+    Content-Disposition value for a download, safe for any file name
+
+    Header values must be latin-1, so the plain filename parameter gets an
+    ASCII stand-in and the real name goes in the RFC 5987 filename* parameter.
+
+    Args:
+        download_name (str): The file name offered to the user
+
+    Returns:
+        str: The header value
+    """
+    fallback = "".join(ch if " " <= ch <= "~" and ch not in '"\\' else "_" for ch in download_name)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(download_name, safe='')}"
+
+def falls_back_to_docx(error):
+    """
+    Whether a failed PDF render should be served as a DOCX instead
+
+    A template download the server answered with an error status is reported
+    to the user, since the form link itself is broken. Any other failure, such
+    as an unreachable host or an unreadable PDF, falls back to the DOCX.
+
+    Args:
+        error (Exception): What the PDF render raised
+
+    Returns:
+        bool: True to fall back to DOCX, False to report the error
+    """
+    return not (isinstance(error, TemplateFetchError) and error.status_code is not None)
+
+def iter_chunks(data, chunk_size=STREAM_CHUNK_SIZE):
+    """Slice an already rendered output into chunks for a streamed response"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+def build_html(form_name, form_link, answers):
+    """Shortcut rendering the HTML preview of a form as a str"""
+    return render(FormDocument(form_name, form_link, answers), "html").getvalue().decode("utf-8")
+
+def build_docx(form_name, form_link, answers):
+    """Shortcut rendering a form as DOCX, returned as a BytesIO positioned at the start"""
+    return render(FormDocument(form_name, form_link, answers), "docx")
+
+def build_pdf(template, form_name, answers, field_fills=None):
+    """Shortcut rendering a form onto its template PDF, returned as a BytesIO positioned at the start"""
+    return render(FormDocument(form_name, "", answers, field_fills), "pdf", template=template)
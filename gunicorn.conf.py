@@ -0,0 +1,20 @@
+import multiprocessing
+import os
+
+# Run with: gunicorn -c gunicorn.conf.py wsgi:app
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+
+# Import wsgi.py in the master so the catalog, TF-IDF index and intent matcher
+# are built once and shared copy-on-write by every forked worker
+preload_app = True
+
+# Recycle workers now and then to bound fragmentation; jitter avoids restarting them all at once
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "500"))
+
+def post_fork(server, worker):
+    server.log.info("Worker %s forked with the preloaded app", worker.pid)
@@ -0,0 +1,215 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import stat
+import tempfile
+import time
+from itertools import islice
+
+import db
+from setup_db import (
+    build_search_index, create_indexes_script, create_tables_script, insert_data_script, insert_knowledge_base,
+)
+
+# Tables in load order, so referenced rows are always loaded first
+CATALOG_TABLES = [
+    "services", "ques_categories", "forms", "input_ques", "form_queries", "form_fields", "form_field_map",
+    "kb_documents", "kb_keywords",
+]
+
+# Rows per executemany call and transaction
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "5000"))
+
+# Checkpoints of the old database attempted, each waiting this many seconds for readers, before an import gives up
+SWAP_CHECKPOINT_ATTEMPTS = int(os.environ.get("SWAP_CHECKPOINT_ATTEMPTS", "5"))
+SWAP_CHECKPOINT_WAIT = float(os.environ.get("SWAP_CHECKPOINT_WAIT", "1"))
+
+def find_table_file(source_dir, table):
+    """Return the CSV or JSONL file holding a table's rows, or None"""
+    for extension in (".csv", ".jsonl", ".ndjson"):
+        path = os.path.join(source_dir, table + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+def read_rows(path):
+    """
+    Stream the rows of a CSV (with a header line) or JSONL file as dicts
+
+    Args:
+        path (str): The catalog file
+
+    Yields:
+        dict: column name -> value
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def load_table(conn, table, rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Insert rows into a table with executemany, one transaction per batch
+
+    Columns are taken from the first row; every later row must use the same
+    ones. Empty CSV cells are stored as NULL.
+
+    Returns:
+        int: Number of rows inserted
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0
+    known = set(table_columns(conn, table))
+    columns = [column for column in first if column is not None]
+    unknown = [column for column in columns if column not in known]
+    if unknown:
+        raise ValueError(f"{table}: unknown columns {unknown}")
+    statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+    def values(row):
+        return tuple(None if row.get(column) == "" else row.get(column) for column in columns)
+
+    count = 0
+    pending = [first]
+    while True:
+        pending.extend(islice(rows, batch_size - len(pending)))
+        if not pending:
+            break
+        with conn:
+            conn.executemany(statement, [values(row) for row in pending])
+        count += len(pending)
+        pending = []
+    return count
+
+def build_catalog(path, source_dir, batch_size=IMPORT_BATCH_SIZE, sample_data=False):
+    """
+    Build a complete catalog database at path from a directory of table files
+
+    Tables are created without their lookup indexes, filled in batches, then
+    indexed (including the kb_search full-text index), checked for dangling
+    references and ANALYZEd.
+
+    Returns:
+        dict: table -> number of rows imported
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        # Nothing reads this file until it is complete, so skip the rollback journal and syncs
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -65536")
+        conn.executescript(create_tables_script)
+        if sample_data:
+            conn.executescript(insert_data_script)
+            insert_knowledge_base(conn)
+        # executescript leaves autocommit on; let `with conn` manage the batches
+        conn.isolation_level = ""
+
+        counts = {}
+        for table in CATALOG_TABLES:
+            table_file = find_table_file(source_dir, table)
+            if table_file is None:
+                continue
+            start = time.perf_counter()
+            counts[table] = load_table(conn, table, read_rows(table_file), batch_size)
+            print(f"Imported {counts[table]} rows into {table} in {time.perf_counter() - start:.2f}s")
+
+        print("Creating indexes...")
+        conn.executescript(create_indexes_script)
+        build_search_index(conn)
+
+        problems = conn.execute("PRAGMA foreign_key_check").fetchall()
+        if problems:
+            table, rowid, parent, _ = problems[0]
+            raise ValueError(f"{len(problems)} rows reference missing records, e.g. {table} row {rowid} -> {parent}")
+
+        conn.execute("ANALYZE")
+        # Match the journal mode the app switches the live database to
+        conn.execute("PRAGMA journal_mode = WAL")
+    finally:
+        conn.close()
+    return counts
+
+def checkpoint_database(db_path, attempts=SWAP_CHECKPOINT_ATTEMPTS, wait=SWAP_CHECKPOINT_WAIT):
+    """
+    Copy db_path's write-ahead log into the database file and truncate the log
+
+    Raises:
+        sqlite3.OperationalError: If readers still kept the log busy after every attempt
+    """
+    conn = sqlite3.connect(db_path, timeout=wait)
+    try:
+        for _ in range(attempts):
+            # (busy, log frames, checkpointed frames); busy is 1 if the log could not be emptied
+            busy, _, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            if not busy:
+                return
+    finally:
+        conn.close()
+    raise sqlite3.OperationalError(f"Could not checkpoint {db_path}, readers are still using its write-ahead log")
+
+def _fsync_directory(path):
+    # Makes the rename durable; directories cannot be opened like this on every platform
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def swap_database(new_path, db_path):
+    """
+    Atomically replace db_path with the freshly built database at new_path
+
+    The old database's write-ahead log is checkpointed and truncated first so
+    no leftover -wal file is read against the new database; if that cannot be
+    done the swap is abandoned and db_path is left as it was.
+    """
+    if os.path.exists(db_path):
+        checkpoint_database(db_path)
+    # mkstemp creates the file private to this user; keep the permissions of the database it replaces
+    os.chmod(new_path, stat.S_IMODE(os.stat(db_path).st_mode) if os.path.exists(db_path) else 0o644)
+    with open(new_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(new_path, db_path)
+    _fsync_directory(os.path.dirname(os.path.abspath(db_path)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a catalog of services, forms and questions from CSV/JSONL files")
+    parser.add_argument("source", help="Directory with one <table>.csv or <table>.jsonl file per table")
+    parser.add_argument("-o", "--output", help="Database to replace, defaults to the application database")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--sample-data", action="store_true", help="Keep the built-in sample catalog as well")
+    args = parser.parse_args()
+
+    db_path = os.path.abspath(args.output or db.resolve_db_path())
+    # Build next to the target so the final rename stays on one filesystem
+    fd, tmp_path = tempfile.mkstemp(prefix=".import-", suffix=".db", dir=os.path.dirname(db_path))
+    os.close(fd)
+    start = time.perf_counter()
+    try:
+        counts = build_catalog(tmp_path, args.source, args.batch_size, args.sample_data)
+        swap_database(tmp_path, db_path)
+    except Exception as e:
+        print(f"Import failed, {db_path} was left untouched: {str(e)}")
+        return 1
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    print(f"Imported {sum(counts.values())} rows into {db_path} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,132 @@
+import argparse
+import hashlib
+import logging
+import re
+
+import db
+from documents import extract_form_fields
+from template_store import TemplateFetchError, get_template_store
+
+logger = logging.getLogger(__name__)
+
+# Smallest token overlap between a question and a field name to map them automatically
+AUTO_MAP_THRESHOLD = 0.5
+
+def _tokens(text):
+    # Split camelCase and punctuation so "PetitionerName[0]" and "Petitioner's name" overlap
+    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text or "")
+    return {token for token in re.findall(r'[a-z]+', text.lower()) if len(token) > 1}
+
+def auto_map(questions, fields, threshold=AUTO_MAP_THRESHOLD):
+    """
+    Pair questions with the form field whose name best matches their text
+
+    Args:
+        questions (list): (ques_id, ques_text) pairs
+        fields (list): Field dicts from extract_form_fields
+        threshold (float): Smallest Jaccard overlap of tokens to accept
+
+    Returns:
+        list: (ques_id, field_name) pairs
+    """
+    field_tokens = [(field["field_name"], _tokens(field["field_name"].split(".")[-1])) for field in fields]
+    mapping = []
+    used = set()
+    for ques_id, ques_text in questions:
+        question_tokens = _tokens(ques_text)
+        best_name, best_score = None, threshold
+        for field_name, tokens in field_tokens:
+            if field_name in used or not tokens or not question_tokens:
+                continue
+            score = len(question_tokens & tokens) / len(question_tokens | tokens)
+            if score >= best_score:
+                best_name, best_score = field_name, score
+        if best_name is not None:
+            used.add(best_name)
+            mapping.append((ques_id, best_name))
+    return mapping
+
+def index_form(conn, form_id, form_link, store=None, map_questions=True):
+    """
+    Record the AcroForm fields of one form's template and map its questions onto them
+
+    Existing fields of the form are replaced; mappings that were set by hand
+    are kept as long as their field still exists.
+
+    Returns:
+        tuple: (number of fields, number of newly mapped questions)
+    """
+    store = store or get_template_store()
+    content = store.fetch(form_link)
+    template_sha256 = hashlib.sha256(content).hexdigest()
+    fields = extract_form_fields(content)
+
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM form_fields WHERE form_id = ?;", (form_id,))
+    cursor.executemany(
+        "INSERT INTO form_fields (form_id, field_name, field_type, page_index, annot_index, template_sha256) "
+        "VALUES (?, ?, ?, ?, ?, ?);",
+        [
+            (form_id, field["field_name"], field["field_type"], field["page_index"], field["annot_index"], template_sha256)
+            for field in fields
+        ]
+    )
+    # Drop mappings to fields the new template no longer has
+    cursor.execute(
+        "DELETE FROM form_field_map WHERE form_id = ? AND field_name NOT IN "
+        "(SELECT field_name FROM form_fields WHERE form_id = ?);",
+        (form_id, form_id)
+    )
+
+    mapped = []
+    if map_questions:
+        cursor.execute(
+            "SELECT q.ques_id, q.ques_text FROM form_queries fq "
+            "JOIN input_ques q ON q.ques_id = fq.form_query_id "
+            "WHERE fq.form_id = ? AND q.ques_id NOT IN (SELECT ques_id FROM form_field_map WHERE form_id = ?) "
+            "ORDER BY fq.id;",
+            (form_id, form_id)
+        )
+        questions = [(row[0], row[1]) for row in cursor.fetchall()]
+        cursor.execute("SELECT field_name FROM form_field_map WHERE form_id = ?;", (form_id,))
+        taken = {row[0] for row in cursor.fetchall()}
+        mapped = auto_map(questions, [field for field in fields if field["field_name"] not in taken])
+        cursor.executemany(
+            "INSERT OR IGNORE INTO form_field_map (form_id, ques_id, field_name) VALUES (?, ?, ?);",
+            [(form_id, ques_id, field_name) for ques_id, field_name in mapped]
+        )
+    conn.commit()
+    cursor.close()
+    return len(fields), len(mapped)
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the AcroForm fields of the PDF form templates")
+    parser.add_argument("--form", help="Only index this form_id")
+    parser.add_argument("--no-auto-map", action="store_true", help="Do not map questions to fields by name")
+    args = parser.parse_args()
+
+    conn = db.connect()
+    try:
+        query = "SELECT form_id, form_link FROM forms"
+        params = ()
+        if args.form:
+            query += " WHERE form_id = ?"
+            params = (args.form,)
+        forms = [(row["form_id"], row["form_link"]) for row in conn.execute(query, params)]
+        failures = 0
+        for form_id, form_link in forms:
+            if not form_link.lower().endswith('.pdf'):
+                continue
+            try:
+                field_count, mapped_count = index_form(conn, form_id, form_link, map_questions=not args.no_auto_map)
+            except TemplateFetchError as e:
+                print(f"  {form_id}: {e}")
+                failures += 1
+                continue
+            print(f"{form_id}: {field_count} fields, {mapped_count} questions mapped")
+    finally:
+        conn.close()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,6 +3,8 @@ import os
 import time
 import sys
 
+from setup_db import build_search_index, insert_knowledge_base
+
 def init_database():
     db_file = 'legal_assistant.db'
     
@@ -36,6 +38,10 @@ def init_database():
             schema_sql = f.read()
             cursor.executescript(schema_sql)
         
+        # Seed the chat knowledge base and its full-text index
+        insert_knowledge_base(cursor)
+        build_search_index(cursor)
+        
         # Commit the changes and close the connection
         conn.commit()
         conn.close()
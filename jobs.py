@@ -0,0 +1,192 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Worker processes used for document assembly
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", str(os.cpu_count() or 2)))
+
+# Most jobs allowed to wait or run at once before new submissions are refused
+JOB_QUEUE_LIMIT = int(os.environ.get("JOB_QUEUE_LIMIT", "256"))
+
+# Seconds a finished job's result is kept for collection
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", "600"))
+
+# How worker processes are started; spawn is safe alongside a threaded web server
+JOB_START_METHOD = os.environ.get("JOB_START_METHOD", "spawn")
+
+class JobQueueFull(Exception):
+    """Raised when the queue already holds JOB_QUEUE_LIMIT unfinished jobs"""
+
+def render_final_document(document):
+    """
+    Build the downloadable document for a form
+
+    Runs inside a worker process, so it only takes the picklable FormDocument.
+    PDF forms fall back to DOCX on the same errors as the final_form route;
+    a template the server refused is raised, so the job fails with it.
+
+    Returns:
+        tuple: (kind, content bytes) where kind is 'pdf' or 'docx'
+    """
+    from documents import falls_back_to_docx, get_parsed_template, render
+    from template_store import get_template_store
+
+    if document.form_link.lower().endswith('.pdf'):
+        try:
+            content, content_hash = get_template_store().fetch_with_hash(document.form_link)
+            # Parsed once per worker process and reused by later jobs for the same template
+            template = get_parsed_template(document.form_link, content, content_hash)
+            return 'pdf', render(document, 'pdf', template=template).getvalue()
+        except Exception as e:
+            if not falls_back_to_docx(e):
+                raise
+            logger.error("Error generating PDF in job: %s", e)
+    return 'docx', render(document, 'docx').getvalue()
+
+class Job:
+    """A submitted document generation job and, once finished, its result"""
+
+    def __init__(self, job_id, artifact_id, form_name):
+        self.job_id = job_id
+        self.artifact_id = artifact_id
+        self.form_name = form_name
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+        self.kind = None
+        self.content = None
+        self.error = None
+
+    @property
+    def status(self):
+        if self.content is not None:
+            return 'done'
+        if self.error is not None:
+            return 'failed'
+        if self.future is not None and self.future.running():
+            return 'running'
+        return 'queued'
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'artifact_id': self.artifact_id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'error': self.error,
+        }
+
+class JobQueue:
+    """
+    Local queue of document generation jobs run on a pool of worker processes.
+
+    Web workers only submit jobs and poll their status, so PDF assembly never
+    occupies a request thread. Finished results are kept for JOB_RESULT_TTL
+    seconds after completion.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, limit=JOB_QUEUE_LIMIT, result_ttl=JOB_RESULT_TTL,
+                 start_method=JOB_START_METHOD):
+        self.workers = workers
+        self.limit = limit
+        self.result_ttl = result_ttl
+        self.start_method = start_method
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _reset_after_fork(self):
+        # A forked child inherits neither the parent's worker processes nor its jobs
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            context = multiprocessing.get_context(self.start_method)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._executor
+
+    def _expire(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, artifact_id, document, done=None):
+        """
+        Queue a document for generation
+
+        Args:
+            artifact_id (str): Artifact the result belongs to
+            document (FormDocument): The filled form to render
+            done (callable): Called with the job once it finishes successfully
+
+        Returns:
+            Job: The queued job
+        """
+        with self._lock:
+            self._expire()
+            pending = sum(1 for job in self._jobs.values() if job.finished_at is None)
+            if pending >= self.limit:
+                raise JobQueueFull(f"Too many pending jobs ({pending})")
+            job = Job(uuid.uuid4().hex, artifact_id, document.form_name)
+            self._jobs[job.job_id] = job
+            try:
+                job.future = self._get_executor().submit(render_final_document, document)
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool rather than failing every later job
+                logger.warning("Document worker pool was broken, restarting it")
+                self._executor = None
+                job.future = self._get_executor().submit(render_final_document, document)
+
+        def finish(future):
+            try:
+                job.kind, job.content = future.result()
+            except Exception as e:
+                logger.error("Document job %s failed: %s", job.job_id, e)
+                job.error = str(e)
+            job.finished_at = time.time()
+            if job.content is not None and done is not None:
+                done(job)
+
+        job.future.add_done_callback(finish)
+        return job
+
+    def add_finished(self, artifact_id, form_name, kind, content):
+        """Record a job whose result was already available, e.g. from the artifact cache"""
+        with self._lock:
+            self._expire()
+            job = Job(uuid.uuid4().hex, artifact_id, form_name)
+            job.kind = kind
+            job.content = content
+            job.finished_at = time.time()
+            self._jobs[job.job_id] = job
+            return job
+
+    def get(self, job_id):
+        """Return a job by id, or None if unknown or expired"""
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+job_queue = JobQueue()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=job_queue._reset_after_fork)
@@ -0,0 +1,183 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+
+from flask import g, has_request_context, request
+
+# All of these are read when configure_logging() runs, after .env is loaded
+DEFAULT_LOG_LEVEL = "INFO"
+DEFAULT_LOG_FORMAT = "text"
+DEFAULT_LOG_PAYLOAD_MAX = 512
+DEFAULT_LOG_QUEUE_SIZE = 10000
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+class Payload:
+    """
+    Log argument that serializes and truncates a value only if the record is emitted.
+
+    Use it for result sets and request bodies: logger.debug("Forms: %s", Payload(forms)).
+    """
+
+    max_length = DEFAULT_LOG_PAYLOAD_MAX
+
+    def __init__(self, value, max_length=None):
+        self.value = value
+        self.max_length = max_length or Payload.max_length
+
+    def __str__(self):
+        if isinstance(self.value, str):
+            text = self.value
+        else:
+            try:
+                text = json.dumps(self.value, default=str, ensure_ascii=False)
+            except (TypeError, ValueError):
+                text = repr(self.value)
+        if len(text) > self.max_length:
+            return f"{text[:self.max_length]}... ({len(text)} chars)"
+        return text
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the timestamp, level, logger, message and route"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        route = getattr(record, "route", None)
+        if route is not None:
+            entry["route"] = route
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+def parse_sample_rates(spec):
+    """
+    Parse LOG_SAMPLE_RATES, e.g. "/api/chat=0.05,/api/forms=0.2,*=1"
+
+    Returns:
+        dict: route -> fraction of requests whose DEBUG/INFO records are kept
+    """
+    rates = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        route, rate = item.split("=", 1)
+        rates[route.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+class RouteSamplingFilter(logging.Filter):
+    """
+    Keep the DEBUG and INFO records of only a sample of requests per route.
+
+    The decision is made once per request, so a sampled request keeps all its
+    records. Warnings and errors always pass. Records also get a route
+    attribute for the structured formatter.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self.default_rate = rates.get("*", 1.0)
+
+    def filter(self, record):
+        if not has_request_context():
+            record.route = None
+            return True
+        rule = request.url_rule
+        record.route = rule.rule if rule is not None else request.path
+        if record.levelno >= logging.WARNING:
+            return True
+        sampled = g.get("_log_sampled")
+        if sampled is None:
+            rate = self.rates.get(record.route, self.default_rate)
+            sampled = rate >= 1.0 or random.random() < rate
+            g._log_sampled = sampled
+        return sampled
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener = None
+_queue_handler = None
+
+def configure_logging():
+    """
+    Route all logging through a bounded queue drained by a background thread
+
+    Request threads only filter, format and enqueue; the listener thread
+    does the writing. Settings come from the environment (and so from .env):
+
+        LOG_LEVEL         root level, default INFO
+        LOG_FORMAT        "text" or "json"
+        LOG_SAMPLE_RATES  per-route sampling of DEBUG/INFO records, see parse_sample_rates
+        LOG_PAYLOAD_MAX   longest logged payload, in characters
+        LOG_QUEUE_SIZE    records buffered before new ones are dropped
+
+    Returns:
+        logging.handlers.QueueListener: The running listener
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    level = os.environ.get("LOG_LEVEL", DEFAULT_LOG_LEVEL).upper()
+    Payload.max_length = int(os.environ.get("LOG_PAYLOAD_MAX", str(DEFAULT_LOG_PAYLOAD_MAX)))
+
+    stream_handler = logging.StreamHandler()
+    if os.environ.get("LOG_FORMAT", DEFAULT_LOG_FORMAT).lower() == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(int(os.environ.get("LOG_QUEUE_SIZE", str(DEFAULT_LOG_QUEUE_SIZE))))
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RouteSamplingFilter(parse_sample_rates(os.environ.get("LOG_SAMPLE_RATES"))))
+
+    _queue_handler = queue_handler
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def _restart_after_fork():
+    # The listener thread does not survive fork, and its queue may have been
+    # locked by it at that moment; give the child a fresh queue and thread
+    global _listener
+    if _listener is None:
+        return
+    log_queue = queue.Queue(_queue_handler.queue.maxsize)
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
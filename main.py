@@ -1,4 +1,4 @@
-from app import app
+from app import create_app
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5500, debug=True)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=5500, debug=True)
\ No newline at end of file
@@ -5,6 +5,7 @@ import os
 # Enhanced response patterns for legal assistance chatbot with government resources
 patterns = [
     {
+        'intent': 'greeting',
         'pattern': r'(?i)hello|hi|hey',
         'responses': [
             "Hello! I'm your legal documentation assistant. I can help with divorce documents, wills, business formation, or power of attorney forms. I can also direct you to official government resources for additional guidance. How can I assist you today?",
@@ -13,6 +14,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'divorce',
         'pattern': r'(?i)divorce|family law',
         'responses': [
             "I can help with divorce and family law documents. Our templates include divorce petitions, custody agreements, and property division forms. For official guidance, I recommend visiting the U.S. Courts website (https://www.uscourts.gov/services-forms/divorce) or your state's judicial website. Would you like to proceed with our divorce petition form?",
@@ -21,6 +23,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'will',
         'pattern': r'(?i)will|testament|estate',
         'responses': [
             "Estate planning is crucial for protecting your assets and wishes. I offer simple wills, living wills, and comprehensive estate plans. For additional guidance, visit the American Bar Association's estate planning resources at https://www.americanbar.org/groups/real_property_trust_estate/. Would you like to create a basic will or something more comprehensive?",
@@ -29,6 +32,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'contract',
         'pattern': r'(?i)contract|agreement',
         'responses': [
             "I can provide various contract templates for business and personal use. For consumer protection guidelines, review the FTC's resources at https://consumer.ftc.gov/. For business contracts, the SBA offers guidance at https://www.sba.gov/business-guide/launch-your-business/write-your-business-plan. What type of agreement do you need?",
@@ -37,6 +41,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'power_of_attorney',
         'pattern': r'(?i)power of attorney|poa',
         'responses': [
             "Power of Attorney documents are crucial for proper representation. I offer general, limited, medical, and financial POA templates. For elder law concerns, visit the National Academy of Elder Law Attorneys at https://www.naela.org/. The NIH also provides guidance on healthcare POAs at https://www.nia.nih.gov/health/advance-care-planning. Which type of POA do you need?",
@@ -45,6 +50,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'business',
         'pattern': r'(?i)business|company|corporation|llc',
         'responses': [
             "I can help with business formation documents for LLCs, corporations, and partnerships. The Small Business Administration offers comprehensive guidance at https://www.sba.gov/business-guide/launch-your-business/choose-business-structure. Your state's Secretary of State website also has specific requirements. Which business structure interests you?",
@@ -53,6 +59,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'custody',
         'pattern': r'(?i)custody|child support|visitation',
         'responses': [
             "Child custody matters are sensitive and governed by state laws. I can provide templates for custody agreements and parenting plans. For state guidelines on child support, visit the Office of Child Support Enforcement at https://www.acf.hhs.gov/css. What specific custody document do you need assistance with?",
@@ -61,6 +68,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'rental',
         'pattern': r'(?i)tenant|landlord|lease|rent',
         'responses': [
             "I can provide residential and commercial lease agreements. For tenants' rights, visit the U.S. Department of Housing and Urban Development at https://www.hud.gov/topics/rental_assistance. For landlords, the American Apartment Owners Association offers resources at https://www.american-apartment-owners-association.org/. What type of rental document do you need?",
@@ -69,6 +77,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'tax',
         'pattern': r'(?i)tax|taxes|irs',
         'responses': [
             "Tax matters involve both federal and state considerations. While I don't offer tax advice, I can direct you to the IRS website at https://www.irs.gov/ for federal tax forms and information. For state taxes, visit your state's department of revenue. Would you like links to specific tax forms?",
@@ -77,6 +86,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'benefits',
         'pattern': r'(?i)benefit|medicare|medicaid|social security',
         'responses': [
             "Government benefits programs have specific eligibility requirements and application procedures. For Social Security, visit https://www.ssa.gov/. For Medicare, visit https://www.medicare.gov/. For Medicaid, visit https://www.medicaid.gov/ or your state's health services website. Which benefit program are you interested in?",
@@ -85,6 +95,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'immigration',
         'pattern': r'(?i)immigration|visa|citizenship|naturalization',
         'responses': [
             "Immigration matters involve complex federal regulations. The official U.S. Citizenship and Immigration Services website at https://www.uscis.gov/ provides forms, processing times, and status checks. The State Department handles visa information at https://travel.state.gov/content/travel/en/us-visas.html. What immigration document do you need help with?",
@@ -93,6 +104,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'help',
         'pattern': r'(?i)help|guidance|assist|what can you do',
         'responses': [
             "I can help with legal documents and direct you to government resources. My areas of expertise include: 1) Divorce/family law, 2) Wills/estate planning, 3) Business formation, 4) Power of attorney documents, 5) Landlord-tenant matters, and 6) Government benefits information. I can also provide links to official websites for further guidance. What area interests you?",
@@ -101,6 +113,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'thanks',
         'pattern': r'(?i)thank you|thanks',
         'responses': [
             "You're welcome! Remember that while I provide document templates and resources, consulting with a qualified attorney for your specific situation is always recommended. Is there anything else I can help you with?",
@@ -109,6 +122,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'affirmation',
         'pattern': r'(?i)yes|yes please|sure|okay|please',
         'responses': [
             "Great! To help you better, could you specify which type of legal document or information you're looking for? Our categories include divorce forms, wills, business contracts, power of attorney documents, rental agreements, and government benefits information.",
@@ -117,6 +131,7 @@ patterns = [
         ]
     },
     {
+        'intent': 'farewell',
         'pattern': r'(?i)bye|goodbye',
         'responses': [
             "Goodbye! Remember that USA.gov (https://www.usa.gov/) is a comprehensive resource for government services and information. Feel free to return if you need more legal document assistance.",
@@ -134,6 +149,51 @@ default_responses = [
     "I'm your legal documentation assistant. Please specify what kind of legal forms you need help with. You can say things like 'I need divorce papers' or 'Help me create a will' so I can guide you better."
 ]
 
+def compile_patterns(intents):
+    """
+    Compile every intent pattern once, keeping their priority order
+
+    Args:
+        intents (list): Pattern entries with a 'pattern' regex
+
+    Returns:
+        list: (compiled pattern, entry) pairs
+    """
+    return [(re.compile(item['pattern']), item) for item in intents]
+
+# Compiled once at import; rebuild with compile_patterns(patterns) if patterns change
+compiled_patterns = compile_patterns(patterns)
+
+def match_pattern(message):
+    """
+    Find the first intent, in priority order, whose pattern matches the message
+
+    Args:
+        message (str): The user's input message
+
+    Returns:
+        dict: The winning intent entry, or None if nothing matches
+    """
+    for pattern, item in compiled_patterns:
+        if pattern.search(message):
+            return item
+    return None
+
+def match_intent(message):
+    """
+    Name the intent that fires for a message
+
+    Args:
+        message (str): The user's input message
+
+    Returns:
+        str: The intent name, or None if no pattern matches
+    """
+    if not message:
+        return None
+    item = match_pattern(message)
+    return item['intent'] if item else None
+
 def get_response(message):
     """
     Generate a response based on the input message using pattern matching.
@@ -147,10 +207,10 @@ def get_response(message):
     if not message:
         return "I'm here to help with your legal documentation needs. What can I assist you with today?"
     
-    # Check for matches in our patterns
-    for item in patterns:
-        if re.search(item['pattern'], message):
-            return random.choice(item['responses'])
+    # Check the precompiled patterns in priority order
+    item = match_pattern(message)
+    if item is not None:
+        return random.choice(item['responses'])
     
     # Return default response if no pattern matches
     return random.choice(default_responses)
@@ -0,0 +1,128 @@
+from collections import deque
+
+def is_word_char(ch):
+    """Match the definition of a word character used by the \\w regex class"""
+    return ch.isalnum() or ch == '_'
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over the knowledge base keywords.
+
+    All keywords are compiled into one trie with failure links, so a query is
+    scanned once and every keyword occurrence is reported regardless of how
+    many documents or keywords the knowledge base holds.
+    """
+
+    def __init__(self, documents):
+        # Per state: outgoing transitions, failure link and keywords ending here
+        self.transitions = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+        # keyword -> knowledge base indexes that list it, in list order
+        self.owners = {}
+
+        for doc_index, item in enumerate(documents):
+            for keyword in item['keywords']:
+                keyword = keyword.lower()
+                if not keyword:
+                    continue
+                owners = self.owners.setdefault(keyword, [])
+                if doc_index not in owners:
+                    owners.append(doc_index)
+                self._add(keyword)
+
+        self._link()
+
+    def _add(self, keyword):
+        state = 0
+        for ch in keyword:
+            next_state = self.transitions[state].get(ch)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+                self.transitions[state][ch] = next_state
+            state = next_state
+        if keyword not in self.outputs[state]:
+            self.outputs[state].append(keyword)
+
+    def _link(self):
+        # Breadth-first so every failure target is finished before it is used
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.transitions[fallback].get(ch, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def find(self, text):
+        """
+        Find every whole-word keyword occurrence in one pass over the text
+
+        Args:
+            text (str): Lowercased query text, e.g. the output of preprocess_text
+
+        Returns:
+            list: (start, end, keyword) tuples in order of where each hit ends
+        """
+        hits = []
+        state = 0
+        transitions = self.transitions
+        fail = self.fail
+        length = len(text)
+        for i, ch in enumerate(text):
+            while state and ch not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(ch, 0)
+            if not self.outputs[state]:
+                continue
+            # Only keep hits that are not glued to a neighbouring word character
+            if i + 1 < length and is_word_char(text[i + 1]):
+                continue
+            for keyword in self.outputs[state]:
+                start = i - len(keyword) + 1
+                if start > 0 and is_word_char(text[start - 1]):
+                    continue
+                hits.append((start, i + 1, keyword))
+        return hits
+
+    def matching_documents(self, text):
+        """
+        Knowledge base entries with at least one keyword in the text
+
+        Args:
+            text (str): Lowercased query text
+
+        Returns:
+            set: Indexes of the matching knowledge base entries
+        """
+        matches = set()
+        for _, _, keyword in self.find(text):
+            matches.update(self.owners[keyword])
+        return matches
+
+    def best_match(self, text):
+        """
+        Pick the knowledge base entry for a query from its keyword hits
+
+        Ties are broken deterministically by knowledge base order, the same
+        priority the original nested loop gave.
+
+        Args:
+            text (str): Lowercased query text
+
+        Returns:
+            int: Index of the matching knowledge base entry, or None
+        """
+        best = None
+        for _, _, keyword in self.find(text):
+            first_owner = self.owners[keyword][0]
+            if best is None or first_owner < best:
+                best = first_owner
+        return best
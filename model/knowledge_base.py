@@ -0,0 +1,78 @@
+# Built-in chat knowledge base: document types, responses and official resources.
+# service_id links an entry to its service in the forms catalog, if it has one.
+# setup_db.py seeds the kb_documents and kb_keywords tables from this list and
+# model/similarity.py falls back to it when the database has none.
+knowledge_base = [
+    {
+        'document_type': 'divorce',
+        'service_id': 'SVC001',
+        'keywords': ['divorce', 'separation', 'alimony', 'child custody', 'marital', 'spouse', 'marriage dissolution'],
+        'response': "For divorce proceedings, we offer divorce petition forms, property settlement agreements, child custody agreements, and alimony arrangement documents. For official guidance, I recommend visiting the U.S. Courts website (https://www.uscourts.gov/services-forms/divorce) or your state's judicial website. For example, California residents can find resources at https://www.courts.ca.gov/selfhelp-divorce.htm. Would you like me to guide you to a specific divorce form?"
+    },
+    {
+        'document_type': 'will',
+        'service_id': 'SVC002',
+        'keywords': ['will', 'testament', 'inheritance', 'estate', 'heir', 'beneficiary', 'executor', 'probate', 'trust'],
+        'response': "For wills and testaments, we have last will templates, living will forms, and executor appointment documents. For additional guidance, visit the American Bar Association's estate planning resources at https://www.americanbar.org/groups/real_property_trust_estate/. The AARP also offers excellent will resources at https://www.aarp.org/money/investing/info-2022/complete-guide-to-wills.html. Would you like assistance with a specific type of will?"
+    },
+    {
+        'document_type': 'power_of_attorney',
+        'service_id': 'SVC003',
+        'keywords': ['power of attorney', 'poa', 'legal authority', 'representative', 'incapacitation', 'healthcare proxy', 'durable power'],
+        'response': "Our Power of Attorney documents include general POA, limited POA, medical POA, and durable POA options. For elder law concerns, visit the National Academy of Elder Law Attorneys at https://www.naela.org/. You can find state-specific information through USA.gov at https://www.usa.gov/legal-docs. The NIH also provides guidance on healthcare POAs at https://www.nia.nih.gov/health/advance-care-planning. Which POA document interests you?"
+    },
+    {
+        'document_type': 'business',
+        'service_id': 'SVC004',
+        'keywords': ['business', 'corporation', 'llc', 'partnership', 'startup', 'entrepreneur', 'company', 'incorporation', 'bylaws'],
+        'response': "For business documentation, we offer incorporation papers, LLC formation documents, partnership agreements, and business contract templates. The Small Business Administration offers comprehensive guidance at https://www.sba.gov/business-guide/launch-your-business/choose-business-structure. For tax considerations, review the IRS business structures page at https://www.irs.gov/businesses/small-businesses-self-employed/business-structures. What type of business document do you need?"
+    },
+    {
+        'document_type': 'real_estate',
+        'service_id': None,
+        'keywords': ['real estate', 'property', 'lease', 'rental', 'mortgage', 'tenant', 'landlord', 'deed', 'eviction', 'foreclosure'],
+        'response': "Our real estate document collection includes lease agreements, property purchase contracts, mortgage applications, and landlord-tenant forms. For tenants' rights, visit the U.S. Department of Housing and Urban Development at https://www.hud.gov/topics/rental_assistance. For mortgage guidance, consult the Consumer Financial Protection Bureau at https://www.consumerfinance.gov/owning-a-home/. What kind of real estate transaction are you working on?"
+    },
+    {
+        'document_type': 'intellectual_property',
+        'service_id': None,
+        'keywords': ['copyright', 'trademark', 'patent', 'intellectual property', 'ip', 'creative works', 'invention', 'brand protection'],
+        'response': "We have intellectual property documents including copyright registrations, trademark applications, patent documents, and IP assignment agreements. For official filing information, visit the U.S. Patent and Trademark Office at https://www.uspto.gov/ for patents and trademarks, and the U.S. Copyright Office at https://copyright.gov/ for copyright protection. The USPTO also offers guided assistance at https://www.uspto.gov/learning-and-resources. What IP protection are you seeking?"
+    },
+    {
+        'document_type': 'employment',
+        'service_id': None,
+        'keywords': ['employment', 'job', 'worker', 'employee', 'hiring', 'termination', 'contract', 'labor', 'workplace', 'discrimination'],
+        'response': "Our employment documents include employment contracts, non-disclosure agreements, termination letters, and workplace policy templates. The U.S. Department of Labor provides extensive guidance on employment laws at https://www.dol.gov/. For workplace discrimination concerns, visit the Equal Employment Opportunity Commission at https://www.eeoc.gov/. What employment document do you need assistance with?"
+    },
+    {
+        'document_type': 'family',
+        'service_id': None,
+        'keywords': ['family', 'adoption', 'guardianship', 'name change', 'prenuptial', 'postnuptial', 'paternity', 'child support'],
+        'response': "We offer various family law documents including adoption applications, guardianship forms, name change petitions, and marriage agreements. For child support guidelines, visit the Office of Child Support Enforcement at https://www.acf.hhs.gov/css. The Child Welfare Information Gateway also provides resources on adoption and guardianship at https://www.childwelfare.gov/. What family law matter can I help you with?"
+    },
+    {
+        'document_type': 'immigration',
+        'service_id': None,
+        'keywords': ['immigration', 'visa', 'citizenship', 'naturalization', 'green card', 'permanent resident', 'alien', 'deportation'],
+        'response': "For immigration matters, reliable information is critical. The official U.S. Citizenship and Immigration Services website at https://www.uscis.gov/ provides all necessary forms and guidance. For visa information, visit the State Department at https://travel.state.gov/content/travel/en/us-visas.html. While we can help with document organization, we recommend consulting these official sources or an immigration attorney. What immigration document do you need help with?"
+    },
+    {
+        'document_type': 'tax',
+        'service_id': None,
+        'keywords': ['tax', 'taxes', 'irs', 'deduction', 'credit', 'filing', 'return', 'audit', 'exemption'],
+        'response': "For tax matters, the Internal Revenue Service (IRS) provides comprehensive guidance and forms at https://www.irs.gov/. For state taxes, visit your state's department of revenue website. The IRS offers interactive tax assistants at https://www.irs.gov/help/ita to help determine filing status, credits, and deductions. While I can direct you to these resources, specific tax advice should come from a qualified tax professional. What tax information are you seeking?"
+    },
+    {
+        'document_type': 'benefits',
+        'service_id': None,
+        'keywords': ['benefits', 'medicare', 'medicaid', 'social security', 'disability', 'veteran', 'retirement', 'unemployment', 'welfare'],
+        'response': "Government benefit programs have specific requirements and application procedures. For Social Security, visit https://www.ssa.gov/. For Medicare, visit https://www.medicare.gov/. For Medicaid, visit https://www.medicaid.gov/ or your state's health services website. Benefits.gov also offers a benefit finder tool at https://www.benefits.gov/benefit-finder to identify programs you may qualify for. Which benefit program information do you need?"
+    },
+    {
+        'document_type': 'general',
+        'service_id': None,
+        'keywords': ['document', 'form', 'legal', 'paperwork', 'template', 'agreement', 'contract', 'help', 'guidance'],
+        'response': "We offer a wide range of legal documents and forms, along with connections to official government resources. For comprehensive legal information, USA.gov provides resources at https://www.usa.gov/legal-services. To help you better, could you specify what kind of legal matter you need assistance with? I can then direct you to the appropriate forms and official guidance."
+    }
+]
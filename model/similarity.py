@@ -1,72 +1,66 @@
+import hashlib
+import itertools
+import json
+import logging
 import os
+import pickle
 import random
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-
-# Enhanced knowledge base with document types, responses, and official resources
-knowledge_base = [
-    {
-        'document_type': 'divorce',
-        'keywords': ['divorce', 'separation', 'alimony', 'child custody', 'marital', 'spouse', 'marriage dissolution'],
-        'response': "For divorce proceedings, we offer divorce petition forms, property settlement agreements, child custody agreements, and alimony arrangement documents. For official guidance, I recommend visiting the U.S. Courts website (https://www.uscourts.gov/services-forms/divorce) or your state's judicial website. For example, California residents can find resources at https://www.courts.ca.gov/selfhelp-divorce.htm. Would you like me to guide you to a specific divorce form?"
-    },
-    {
-        'document_type': 'will',
-        'keywords': ['will', 'testament', 'inheritance', 'estate', 'heir', 'beneficiary', 'executor', 'probate', 'trust'],
-        'response': "For wills and testaments, we have last will templates, living will forms, and executor appointment documents. For additional guidance, visit the American Bar Association's estate planning resources at https://www.americanbar.org/groups/real_property_trust_estate/. The AARP also offers excellent will resources at https://www.aarp.org/money/investing/info-2022/complete-guide-to-wills.html. Would you like assistance with a specific type of will?"
-    },
-    {
-        'document_type': 'power_of_attorney',
-        'keywords': ['power of attorney', 'poa', 'legal authority', 'representative', 'incapacitation', 'healthcare proxy', 'durable power'],
-        'response': "Our Power of Attorney documents include general POA, limited POA, medical POA, and durable POA options. For elder law concerns, visit the National Academy of Elder Law Attorneys at https://www.naela.org/. You can find state-specific information through USA.gov at https://www.usa.gov/legal-docs. The NIH also provides guidance on healthcare POAs at https://www.nia.nih.gov/health/advance-care-planning. Which POA document interests you?"
-    },
-    {
-        'document_type': 'business',
-        'keywords': ['business', 'corporation', 'llc', 'partnership', 'startup', 'entrepreneur', 'company', 'incorporation', 'bylaws'],
-        'response': "For business documentation, we offer incorporation papers, LLC formation documents, partnership agreements, and business contract templates. The Small Business Administration offers comprehensive guidance at https://www.sba.gov/business-guide/launch-your-business/choose-business-structure. For tax considerations, review the IRS business structures page at https://www.irs.gov/businesses/small-businesses-self-employed/business-structures. What type of business document do you need?"
-    },
-    {
-        'document_type': 'real_estate',
-        'keywords': ['real estate', 'property', 'lease', 'rental', 'mortgage', 'tenant', 'landlord', 'deed', 'eviction', 'foreclosure'],
-        'response': "Our real estate document collection includes lease agreements, property purchase contracts, mortgage applications, and landlord-tenant forms. For tenants' rights, visit the U.S. Department of Housing and Urban Development at https://www.hud.gov/topics/rental_assistance. For mortgage guidance, consult the Consumer Financial Protection Bureau at https://www.consumerfinance.gov/owning-a-home/. What kind of real estate transaction are you working on?"
-    },
-    {
-        'document_type': 'intellectual_property',
-        'keywords': ['copyright', 'trademark', 'patent', 'intellectual property', 'ip', 'creative works', 'invention', 'brand protection'],
-        'response': "We have intellectual property documents including copyright registrations, trademark applications, patent documents, and IP assignment agreements. For official filing information, visit the U.S. Patent and Trademark Office at https://www.uspto.gov/ for patents and trademarks, and the U.S. Copyright Office at https://copyright.gov/ for copyright protection. The USPTO also offers guided assistance at https://www.uspto.gov/learning-and-resources. What IP protection are you seeking?"
-    },
-    {
-        'document_type': 'employment',
-        'keywords': ['employment', 'job', 'worker', 'employee', 'hiring', 'termination', 'contract', 'labor', 'workplace', 'discrimination'],
-        'response': "Our employment documents include employment contracts, non-disclosure agreements, termination letters, and workplace policy templates. The U.S. Department of Labor provides extensive guidance on employment laws at https://www.dol.gov/. For workplace discrimination concerns, visit the Equal Employment Opportunity Commission at https://www.eeoc.gov/. What employment document do you need assistance with?"
-    },
-    {
-        'document_type': 'family',
-        'keywords': ['family', 'adoption', 'guardianship', 'name change', 'prenuptial', 'postnuptial', 'paternity', 'child support'],
-        'response': "We offer various family law documents including adoption applications, guardianship forms, name change petitions, and marriage agreements. For child support guidelines, visit the Office of Child Support Enforcement at https://www.acf.hhs.gov/css. The Child Welfare Information Gateway also provides resources on adoption and guardianship at https://www.childwelfare.gov/. What family law matter can I help you with?"
-    },
-    {
-        'document_type': 'immigration',
-        'keywords': ['immigration', 'visa', 'citizenship', 'naturalization', 'green card', 'permanent resident', 'alien', 'deportation'],
-        'response': "For immigration matters, reliable information is critical. The official U.S. Citizenship and Immigration Services website at https://www.uscis.gov/ provides all necessary forms and guidance. For visa information, visit the State Department at https://travel.state.gov/content/travel/en/us-visas.html. While we can help with document organization, we recommend consulting these official sources or an immigration attorney. What immigration document do you need help with?"
-    },
-    {
-        'document_type': 'tax',
-        'keywords': ['tax', 'taxes', 'irs', 'deduction', 'credit', 'filing', 'return', 'audit', 'exemption'],
-        'response': "For tax matters, the Internal Revenue Service (IRS) provides comprehensive guidance and forms at https://www.irs.gov/. For state taxes, visit your state's department of revenue website. The IRS offers interactive tax assistants at https://www.irs.gov/help/ita to help determine filing status, credits, and deductions. While I can direct you to these resources, specific tax advice should come from a qualified tax professional. What tax information are you seeking?"
-    },
-    {
-        'document_type': 'benefits',
-        'keywords': ['benefits', 'medicare', 'medicaid', 'social security', 'disability', 'veteran', 'retirement', 'unemployment', 'welfare'],
-        'response': "Government benefit programs have specific requirements and application procedures. For Social Security, visit https://www.ssa.gov/. For Medicare, visit https://www.medicare.gov/. For Medicaid, visit https://www.medicaid.gov/ or your state's health services website. Benefits.gov also offers a benefit finder tool at https://www.benefits.gov/benefit-finder to identify programs you may qualify for. Which benefit program information do you need?"
-    },
-    {
-        'document_type': 'general',
-        'keywords': ['document', 'form', 'legal', 'paperwork', 'template', 'agreement', 'contract', 'help', 'guidance'],
-        'response': "We offer a wide range of legal documents and forms, along with connections to official government resources. For comprehensive legal information, USA.gov provides resources at https://www.usa.gov/legal-services. To help you better, could you specify what kind of legal matter you need assistance with? I can then direct you to the appropriate forms and official guidance."
-    }
-]
+import sqlite3
+import threading
+import time
+import numpy as np
+import sklearn
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+
+from model.cache import LRUCache
+from model.keywords import KeywordAutomaton
+from model.knowledge_base import knowledge_base as builtin_knowledge_base
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the layout of the saved index changes
+INDEX_VERSION = 1
+
+# Where the fitted TF-IDF index is persisted between runs
+INDEX_PATH = os.environ.get(
+    "TFIDF_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts", f"tfidf_index.v{INDEX_VERSION}.pkl")
+)
+
+# Minimum cosine similarity for a knowledge base match
+SIMILARITY_THRESHOLD = 0.1
+
+# Response cache for repeated chat queries, keyed on the preprocessed query
+CHAT_CACHE_SIZE = int(os.environ.get("CHAT_CACHE_SIZE", "1024"))
+CHAT_CACHE_TTL = float(os.environ.get("CHAT_CACHE_TTL", "3600"))
+
+# Where the knowledge base comes from: "db" reads the kb_documents and kb_keywords tables,
+# falling back to model/knowledge_base.py if they are missing or empty; "builtin" never reads them
+KB_SOURCE = os.environ.get("KB_SOURCE", "db").lower()
+
+# Rank queries against the kb_search full-text table with BM25 before the in-memory TF-IDF index
+KB_SEARCH = os.environ.get("KB_SEARCH", "1").lower() not in ("0", "false", "no")
+
+# Most kb_search rows read per query
+KB_SEARCH_LIMIT = int(os.environ.get("KB_SEARCH_LIMIT", "5"))
+
+# Least BM25 score a kb_search row needs to count as a match; with the column weights in
+# KB_SEARCH_QUERY a whole keyword or title term scores above it and a lone description word below
+KB_SEARCH_MIN_SCORE = float(os.environ.get("KB_SEARCH_MIN_SCORE", "3.0"))
+
+# Least seconds between warnings about failed searches; the failures in between are counted
+KB_SEARCH_WARN_INTERVAL = float(os.environ.get("KB_SEARCH_WARN_INTERVAL", "60"))
+
+# How often, in seconds, to check whether the database file was rewritten (same setting as the catalog)
+KB_CHECK_INTERVAL = float(os.environ.get("CATALOG_CHECK_INTERVAL", "2"))
+
+# Ranked results returned by rank_documents when no count is given, and the most allowed
+DEFAULT_TOP_K = int(os.environ.get("CHAT_TOP_K", "3"))
+MAX_TOP_K = int(os.environ.get("CHAT_MAX_TOP_K", "20"))
+
+# The knowledge base in use; the database copy replaces the built-in one when present
+knowledge_base = builtin_knowledge_base
 
 # Enhanced default responses with references to resources
 default_responses = [
@@ -82,12 +76,414 @@ def preprocess_text(text):
     text = re.sub(r'[^\w\s]', '', text)
     return text
 
-def get_document(user_query):
+KB_DOCUMENTS_QUERY = "SELECT document_type, service_id, response FROM kb_documents ORDER BY position;"
+KB_KEYWORDS_QUERY = "SELECT document_type, keyword FROM kb_keywords ORDER BY id;"
+
+# Column weights are in table order: document_type, form_id, title, description, keywords
+KB_SEARCH_QUERY = """
+SELECT document_type, bm25(kb_search, 0.0, 0.0, 10.0, 2.0, 5.0) AS rank
+FROM kb_search
+WHERE kb_search MATCH ? AND document_type IS NOT NULL
+ORDER BY rank
+LIMIT ?;
+"""
+
+def _database_path():
+    import db
+    return db.get_db_path()
+
+def load_knowledge_base(conn=None):
+    """
+    Read the knowledge base from the kb_documents and kb_keywords tables
+
+    Args:
+        conn (sqlite3.Connection): Connection to read with, defaults to a new one on the application database
+
+    Returns:
+        list: Knowledge base entries in priority order, or None if the tables are missing or empty
+    """
+    import db
+
+    own_connection = conn is None
+    # Never create an empty database file just to find it has no knowledge base
+    if own_connection and not os.path.exists(_database_path()):
+        return None
+    documents = {}
+    try:
+        if own_connection:
+            conn = db.connect()
+        for document_type, service_id, response in conn.execute(KB_DOCUMENTS_QUERY):
+            documents[document_type] = {
+                'document_type': document_type,
+                'service_id': service_id,
+                'keywords': [],
+                'response': response,
+            }
+        for document_type, keyword in conn.execute(KB_KEYWORDS_QUERY):
+            if document_type in documents:
+                documents[document_type]['keywords'].append(keyword)
+    except sqlite3.Error as e:
+        logger.warning("Could not load the knowledge base from the database: %s", e)
+        return None
+    finally:
+        if own_connection and conn is not None:
+            conn.close()
+    return list(documents.values()) or None
+
+def reload_knowledge_base():
+    """
+    Load the knowledge base (see KB_SOURCE) and rebuild the in-memory indexes over it
+
+    Returns:
+        list: The knowledge base now in use
+    """
+    global knowledge_base, _document_indexes, _index, _keyword_matcher
+    global _kb_signature, _kb_last_check, _search_available
+    from catalog import database_signature
+
+    with _kb_lock:
+        signature = database_signature(_database_path()) if KB_SOURCE == "db" else None
+        documents = (load_knowledge_base() if KB_SOURCE == "db" else None) or builtin_knowledge_base
+        # Everything is built before any of it is installed, so a concurrent query
+        # never pairs the new entries with the old indexes or the other way round
+        index = _load_index(documents, INDEX_PATH)
+        matcher = KeywordAutomaton(documents)
+        document_indexes = {item['document_type']: i for i, item in enumerate(documents)}
+        knowledge_base, _document_indexes, _index, _keyword_matcher = documents, document_indexes, index, matcher
+        _knowledge_base_changed()
+        # A replaced database may have gained the kb_search table
+        _search_available = KB_SEARCH
+        _kb_signature = signature
+        _kb_last_check = time.monotonic()
+        return documents
+
+def get_knowledge_base():
+    """
+    Return the knowledge base in use, loading it and its indexes on first use
+
+    As with the catalog, the database files are only stat()ed, at most every
+    KB_CHECK_INTERVAL seconds, and everything is reloaded once setup_db.py or
+    import_catalog.py has replaced them.
+    """
+    global _kb_last_check
+    if _kb_signature is _UNLOADED:
+        return reload_knowledge_base()
+    if KB_SOURCE == "db":
+        now = time.monotonic()
+        if now - _kb_last_check >= KB_CHECK_INTERVAL:
+            _kb_last_check = now
+            from catalog import database_signature
+            if database_signature(_database_path()) != _kb_signature:
+                return reload_knowledge_base()
+    return knowledge_base
+
+# Loaded on first use (or by the app's warm-up), so importing this module never touches the database
+_UNLOADED = object()
+_kb_signature = _UNLOADED
+_kb_last_check = 0.0
+_kb_lock = threading.Lock()
+_document_indexes = {}
+
+def search_match_expression(processed_query):
+    """
+    FTS5 MATCH expression finding any meaningful word of a preprocessed query
+
+    Returns:
+        str: The expression, or None if the query has no searchable words
     """
-    Find the most relevant document based on the user query using cosine similarity
+    terms = [term for term in processed_query.split() if len(term) > 1 and term not in ENGLISH_STOP_WORDS]
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+def search_knowledge_base(processed_query, limit=KB_SEARCH_LIMIT, conn=None):
+    """
+    Rank the knowledge base entries and catalog forms for a query with BM25
+
+    The kb_search table is queried on disk, so this scales with the catalog
+    rather than with what fits in memory.
+
+    Args:
+        processed_query (str): Output of preprocess_text
+        limit (int): Most matches to return
+        conn (sqlite3.Connection): Connection to query with, e.g. the request's;
+            defaults to a new one on the application database, closed afterwards
+
+    Returns:
+        list: (document_type, score) pairs scoring at least KB_SEARCH_MIN_SCORE, best first,
+            or None if kb_search is unavailable
+    """
+    global _search_available
+    if not _search_available:
+        return None
+    expression = search_match_expression(processed_query)
+    if expression is None:
+        return []
+    import db
+
+    own_connection = conn is None
+    if own_connection and not os.path.exists(_database_path()):
+        return None
+    try:
+        if own_connection:
+            conn = db.connect()
+        try:
+            rows = conn.execute(KB_SEARCH_QUERY, (expression, limit)).fetchall()
+        finally:
+            if own_connection:
+                conn.close()
+    except sqlite3.OperationalError as e:
+        if str(e).startswith(("no such table", "no such module")):
+            # No kb_search table or no FTS5: keep to the in-memory index until the database changes
+            logger.warning("Knowledge base search unavailable, using the in-memory index: %s", e)
+            _search_available = False
+        else:
+            # e.g. "database is locked" while a catalog import runs: skip the search for this query only
+            _warn_search_failed(e)
+        return None
+    # bm25() is lower for better matches
+    return [(document_type, -rank) for document_type, rank in rows if -rank >= KB_SEARCH_MIN_SCORE]
+
+_search_available = KB_SEARCH
+
+def _warn_search_failed(error):
+    """Log a failed search, at most once every KB_SEARCH_WARN_INTERVAL seconds"""
+    global _search_failures, _search_warned_at
+    # Counted without a lock; the total in a warning is approximate under load
+    _search_failures += 1
+    now = time.monotonic()
+    if now - _search_warned_at < KB_SEARCH_WARN_INTERVAL:
+        return
+    logger.warning(
+        "Knowledge base search failed for %d queries, using the in-memory index for them: %s",
+        _search_failures, error
+    )
+    _search_failures = 0
+    _search_warned_at = now
+
+_search_failures = 0
+_search_warned_at = float('-inf')
+
+class TfidfIndex:
+    """
+    TF-IDF retrieval index over the knowledge base keywords.
+
+    The vectorizer is fitted once and the document matrix is kept in memory,
+    so a query only needs a ``transform`` and a sparse dot product.
+    """
+
+    def __init__(self, vectorizer, document_matrix, fingerprint):
+        self.vectorizer = vectorizer
+        self.document_matrix = document_matrix
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def fit(cls, documents):
+        """
+        Fit a new index on a list of knowledge base entries
+
+        Args:
+            documents (list): Knowledge base entries with a 'keywords' list
+
+        Returns:
+            TfidfIndex: The fitted index
+        """
+        corpus = [' '.join(item['keywords']) for item in documents]
+        vectorizer = TfidfVectorizer()
+        document_matrix = vectorizer.fit_transform(corpus)
+        return cls(vectorizer, document_matrix, knowledge_base_fingerprint(documents))
+
+    def similarities(self, processed_query):
+        """
+        Score a preprocessed query against every knowledge base entry
+
+        Args:
+            processed_query (str): Output of preprocess_text
+
+        Returns:
+            numpy.ndarray: Cosine similarity per knowledge base entry
+        """
+        return self.similarity_matrix([processed_query])[0]
+
+    def similarity_matrix(self, processed_queries):
+        """
+        Score many preprocessed queries at once with a single sparse matrix product
+
+        Args:
+            processed_queries (list): Outputs of preprocess_text
+
+        Returns:
+            numpy.ndarray: Array of shape (len(processed_queries), len(knowledge_base))
+        """
+        query_matrix = self.vectorizer.transform(processed_queries)
+        # TF-IDF rows are L2-normalised, so the dot product is the cosine similarity
+        return (query_matrix @ self.document_matrix.T).toarray()
+
+    def save(self, path=INDEX_PATH):
+        """Persist the fitted index as a versioned artifact"""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        payload = {
+            'version': INDEX_VERSION,
+            'sklearn_version': sklearn.__version__,
+            'fingerprint': self.fingerprint,
+            'vectorizer': self.vectorizer,
+            'document_matrix': self.document_matrix,
+        }
+        # Write to a temporary file first so readers never see a partial artifact
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, fingerprint=None):
+        """
+        Load a saved index without refitting
+
+        Args:
+            path (str): Location of the saved artifact
+            fingerprint (str): Expected knowledge base fingerprint, if any
+
+        Returns:
+            TfidfIndex: The loaded index, or None if the artifact is missing or stale
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+        if payload.get('version') != INDEX_VERSION or payload.get('sklearn_version') != sklearn.__version__:
+            return None
+        if fingerprint is not None and payload.get('fingerprint') != fingerprint:
+            return None
+        return cls(payload['vectorizer'], payload['document_matrix'], payload['fingerprint'])
+
+def knowledge_base_fingerprint(documents):
+    """Hash of the knowledge base keywords, used to detect stale saved indexes"""
+    keywords = [item['keywords'] for item in documents]
+    return hashlib.sha256(json.dumps(keywords).encode('utf-8')).hexdigest()
+
+def _load_index(documents, path):
+    """Load the saved index for documents, refitting and saving it if stale"""
+    fingerprint = knowledge_base_fingerprint(documents)
+
+    index = None
+    try:
+        index = TfidfIndex.load(path, fingerprint)
+    except Exception as e:
+        logger.warning("Could not load TF-IDF index from %s: %s", path, e)
+
+    if index is None:
+        index = TfidfIndex.fit(documents)
+        try:
+            index.save(path)
+        except OSError as e:
+            # A read-only checkout still works, it just refits on every start
+            logger.warning("Could not save TF-IDF index to %s: %s", path, e)
+    return index
+
+def build_index(documents=None, path=INDEX_PATH):
+    """
+    Load the saved index for the knowledge base, refitting and saving it if stale
+
+    Args:
+        documents (list): Knowledge base entries, defaults to knowledge_base
+        path (str): Location of the saved artifact
+
+    Returns:
+        TfidfIndex: The ready-to-query index
+    """
+    global _index
+    documents = knowledge_base if documents is None else documents
+    _index = _load_index(documents, path)
+    _knowledge_base_changed()
+    return _index
+
+def get_index():
+    """Return the process-wide TF-IDF index for the current knowledge base, building it on first use"""
+    get_knowledge_base()
+    if _index is None:
+        return build_index()
+    return _index
+
+_index = None
+
+def build_keyword_matcher(documents=None):
+    """
+    Compile the knowledge base keywords into a single multi-pattern automaton
+
+    Args:
+        documents (list): Knowledge base entries, defaults to knowledge_base
+
+    Returns:
+        KeywordAutomaton: The compiled automaton
+    """
+    global _keyword_matcher
+    documents = knowledge_base if documents is None else documents
+    _keyword_matcher = KeywordAutomaton(documents)
+    _knowledge_base_changed()
+    return _keyword_matcher
+
+def match_keywords(processed_query):
+    """
+    Return the knowledge base entry whose keywords appear as whole words in the query
+
+    Args:
+        processed_query (str): Output of preprocess_text
+
+    Returns:
+        dict: The matching knowledge base entry, or None
+    """
+    get_knowledge_base()
+    best_match_index = _keyword_match_index(processed_query)
+    return knowledge_base[best_match_index] if best_match_index is not None else None
+
+_keyword_matcher = None
+
+# Knowledge base index matched by each recently seen query, or None for no match.
+# Keyed by (_kb_version, processed query): a query that read the version before a
+# reload can still finish and cache its answer, but no later query will read it.
+response_cache = LRUCache(maxsize=CHAT_CACHE_SIZE, ttl=CHAT_CACHE_TTL)
+
+_kb_versions = itertools.count()
+_kb_version = next(_kb_versions)
+
+def _knowledge_base_changed():
+    """Retire the answers cached against the previous knowledge base or indexes"""
+    global _kb_version
+    # Bumped only after the new knowledge base and indexes are in place
+    _kb_version = next(_kb_versions)
+    response_cache.clear()
+
+_MISSING = object()
+
+def _response_for(best_match_index):
+    """Turn a resolved knowledge base index into a response message"""
+    if best_match_index is None:
+        return random.choice(default_responses)
+    return knowledge_base[best_match_index]['response']
+
+def _keyword_match_index(processed_query):
+    matcher = _keyword_matcher if _keyword_matcher is not None else build_keyword_matcher()
+    return matcher.best_match(processed_query)
+
+def _search_match_index(processed_query, conn=None):
+    for document_type, _ in search_knowledge_base(processed_query, conn=conn) or []:
+        best_match_index = _document_indexes.get(document_type)
+        if best_match_index is not None:
+            return best_match_index
+    return None
+
+def get_document(user_query, get_connection=None):
+    """
+    Find the most relevant document for the user query: by keyword, then by BM25
+    full-text search of the database, then by TF-IDF cosine similarity
     
     Args:
         user_query (str): The user's input message
+        get_connection (callable): Returns the connection for the full-text search,
+            e.g. the request's; a new one is opened and closed if None
         
     Returns:
         str: A response message recommending appropriate documents
@@ -95,42 +491,219 @@ def get_document(user_query):
     if not user_query:
         return "I'm here to help you find the right legal documents. What type of legal matter are you dealing with?"
     
+    # Pick up a rewritten database before matching
+    get_knowledge_base()
+    
     # Preprocess the user query
     processed_query = preprocess_text(user_query)
+    cache_key = (_kb_version, processed_query)
+    
+    # Repeated queries skip matching entirely
+    cached = response_cache.get(cache_key, _MISSING)
+    if cached is not _MISSING:
+        return _response_for(cached)
     
     # Check for direct keyword matches first (simple approach)
-    for item in knowledge_base:
-        for keyword in item['keywords']:
-            if keyword in processed_query:
-                return item['response']
+    best_match_index = _keyword_match_index(processed_query)
+    if best_match_index is not None:
+        response_cache.set(cache_key, best_match_index)
+        return _response_for(best_match_index)
     
-    # If no direct matches, use TF-IDF and cosine similarity
+    # Then the BM25-ranked full-text search over the knowledge base and forms catalog
+    if _search_available:
+        conn = get_connection() if get_connection is not None else None
+        best_match_index = _search_match_index(processed_query, conn)
+        if best_match_index is not None:
+            response_cache.set(cache_key, best_match_index)
+            return _response_for(best_match_index)
+    
+    # If no direct matches, use the prebuilt TF-IDF index and cosine similarity
     try:
-        # Create corpus with knowledge base items
-        corpus = [' '.join(item['keywords']) for item in knowledge_base]
-        corpus.append(processed_query)
-        
-        # Calculate TF-IDF vectors
-        vectorizer = TfidfVectorizer()
-        tfidf_matrix = vectorizer.fit_transform(corpus)
-        
-        # Calculate similarity between query and each knowledge base item
-        query_vector = tfidf_matrix[-1]
-        document_vectors = tfidf_matrix[:-1]
-        
-        # Calculate cosine similarity
-        similarities = cosine_similarity(query_vector, document_vectors).flatten()
+        similarities = get_index().similarities(processed_query)
         
         # Get index of most similar document
-        best_match_index = similarities.argmax()
+        best_match_index = int(similarities.argmax())
         
         # If similarity is above threshold, return the response
-        if similarities[best_match_index] > 0.1:
-            return knowledge_base[best_match_index]['response']
-        else:
-            return random.choice(default_responses)
+        if similarities[best_match_index] <= SIMILARITY_THRESHOLD:
+            best_match_index = None
+        response_cache.set(cache_key, best_match_index)
+        return _response_for(best_match_index)
             
     except Exception as e:
         # Fallback to simpler matching if there's an error with the similarity calculation
-        print(f"Error in similarity calculation: {str(e)}")
+        logger.exception("Error in similarity calculation: %s", e)
         return random.choice(default_responses)
+
+def top_k_indices(scores, k):
+    """
+    Indexes of the k highest scores, best first
+
+    np.partition finds the k-th highest score in linear time; everything above
+    it and, in knowledge base order, as many entries tied with it as fit are the
+    winners, and only those k are sorted. Equal scores keep knowledge base order.
+
+    Args:
+        scores (numpy.ndarray): One score per knowledge base entry
+        k (int): How many indexes to return
+
+    Returns:
+        list: Up to k indexes into scores
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return []
+    if k < len(scores):
+        # argpartition alone would pick arbitrary entries among those tied at the boundary
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)[:k - len(above)]
+        candidates = np.concatenate((above, tied))
+    else:
+        candidates = np.arange(len(scores))
+    order = np.lexsort((candidates, -scores[candidates]))
+    return [int(index) for index in candidates[order]]
+
+def rank_documents(user_query, top_k=DEFAULT_TOP_K, get_connection=None):
+    """
+    Rank the knowledge base entries for a user query
+
+    The stages are those of get_document, so the first result is the entry it
+    answers with: entries with a whole-word keyword hit come first, in knowledge
+    base order, then full-text search hits by BM25 score, then the rest by TF-IDF
+    cosine similarity. Entries no stage matches, i.e. with no keyword hit, no
+    search hit and a similarity of at most SIMILARITY_THRESHOLD, are left out.
+
+    Args:
+        user_query (str): The user's input message
+        top_k (int): Most entries to return
+        get_connection (callable): Returns the connection for the full-text search,
+            e.g. the request's; a new one is opened and closed if None
+
+    Returns:
+        list: Dicts with document_type, service_id, match ('keyword', 'search' or
+            'similarity'), score (the TF-IDF cosine similarity) and response, best first
+    """
+    if not user_query:
+        return []
+    get_knowledge_base()
+    processed_query = preprocess_text(user_query)
+
+    similarities = get_index().similarities(processed_query)
+    count = len(similarities)
+    # Cosine similarity is at most 1, so each stage gets its own band above the next
+    ranking = np.where(similarities > SIMILARITY_THRESHOLD, similarities, -np.inf)
+    matches = np.full(count, 'similarity', dtype=object)
+
+    if _search_available:
+        conn = get_connection() if get_connection is not None else None
+        searched = []
+        for document_type, _ in search_knowledge_base(processed_query, conn=conn) or []:
+            index = _document_indexes.get(document_type)
+            if index is not None and index not in searched:
+                searched.append(index)
+        for position, index in enumerate(searched):
+            ranking[index] = 2.0 - position / len(searched)
+            matches[index] = 'search'
+
+    matcher = _keyword_matcher if _keyword_matcher is not None else build_keyword_matcher()
+    for index in matcher.matching_documents(processed_query):
+        ranking[index] = 4.0 - index / count
+        matches[index] = 'keyword'
+
+    results = []
+    for index in top_k_indices(ranking, top_k):
+        if ranking[index] == -np.inf:
+            break
+        item = knowledge_base[index]
+        results.append({
+            'document_type': item['document_type'],
+            'service_id': item['service_id'],
+            'match': matches[index],
+            'score': round(float(similarities[index]), 4),
+            'response': item['response'],
+        })
+    return results
+
+def _search_batch(pending, pending_queries, responses, get_connection, version):
+    """Run the full-text stage for a batch over one connection; return what it did not match"""
+    import db
+
+    conn = None
+    if get_connection is not None:
+        conn = get_connection()
+    elif os.path.exists(_database_path()):
+        conn = db.connect()
+    try:
+        unmatched, unmatched_queries = [], []
+        for i, processed_query in zip(pending, pending_queries):
+            best_match_index = _search_match_index(processed_query, conn)
+            if best_match_index is not None:
+                response_cache.set((version, processed_query), best_match_index)
+                responses[i] = _response_for(best_match_index)
+            else:
+                unmatched.append(i)
+                unmatched_queries.append(processed_query)
+        return unmatched, unmatched_queries
+    finally:
+        if get_connection is None and conn is not None:
+            conn.close()
+
+def get_documents(user_queries, get_connection=None):
+    """
+    Find the most relevant document for many user queries at once
+
+    Queries that miss the cache and the keyword stage are searched over one
+    database connection for the whole batch; those the full-text search misses
+    too are transformed together into one sparse matrix and scored with a
+    single matrix product.
+
+    Args:
+        user_queries (list): The user's input messages
+        get_connection (callable): Returns the connection for the full-text search,
+            e.g. the request's; one is opened for the batch if None
+
+    Returns:
+        list: One response message per query, in input order
+    """
+    get_knowledge_base()
+    version = _kb_version
+    responses = [None] * len(user_queries)
+    pending = []
+    pending_queries = []
+
+    for i, user_query in enumerate(user_queries):
+        if not user_query:
+            responses[i] = "I'm here to help you find the right legal documents. What type of legal matter are you dealing with?"
+            continue
+        processed_query = preprocess_text(user_query)
+        cached = response_cache.get((version, processed_query), _MISSING)
+        if cached is not _MISSING:
+            responses[i] = _response_for(cached)
+            continue
+        best_match_index = _keyword_match_index(processed_query)
+        if best_match_index is not None:
+            response_cache.set((version, processed_query), best_match_index)
+            responses[i] = _response_for(best_match_index)
+        else:
+            pending.append(i)
+            pending_queries.append(processed_query)
+
+    if pending and _search_available:
+        pending, pending_queries = _search_batch(pending, pending_queries, responses, get_connection, version)
+
+    if pending:
+        try:
+            similarities = get_index().similarity_matrix(pending_queries)
+            best_match_indexes = similarities.argmax(axis=1)
+            best_scores = similarities[range(len(pending)), best_match_indexes]
+            for i, processed_query, best_match_index, score in zip(pending, pending_queries, best_match_indexes, best_scores):
+                best_match_index = int(best_match_index) if score > SIMILARITY_THRESHOLD else None
+                response_cache.set((version, processed_query), best_match_index)
+                responses[i] = _response_for(best_match_index)
+        except Exception as e:
+            logger.exception("Error in batch similarity calculation: %s", e)
+            for i in pending:
+                responses[i] = random.choice(default_responses)
+
+    return responses
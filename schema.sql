@@ -1,4 +1,8 @@
 -- Drop tables if they exist to avoid conflicts
+DROP TABLE IF EXISTS kb_keywords;
+DROP TABLE IF EXISTS kb_documents;
+DROP TABLE IF EXISTS form_field_map;
+DROP TABLE IF EXISTS form_fields;
 DROP TABLE IF EXISTS form_queries;
 DROP TABLE IF EXISTS input_ques;
 DROP TABLE IF EXISTS ques_categories;
@@ -47,6 +51,55 @@ CREATE TABLE form_queries (
     FOREIGN KEY (form_query_id) REFERENCES input_ques (ques_id)
 );
 
+-- Create form_fields table (AcroForm fields extracted from each form's PDF template)
+CREATE TABLE form_fields (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    form_id TEXT NOT NULL,
+    field_name TEXT NOT NULL,
+    field_type TEXT,
+    page_index INTEGER NOT NULL,
+    annot_index INTEGER NOT NULL,
+    template_sha256 TEXT NOT NULL,
+    FOREIGN KEY (form_id) REFERENCES forms (form_id),
+    UNIQUE (form_id, field_name)
+);
+
+-- Create form_field_map table (mapping between questions and PDF fields of a form)
+CREATE TABLE form_field_map (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    form_id TEXT NOT NULL,
+    ques_id TEXT NOT NULL,
+    field_name TEXT NOT NULL,
+    FOREIGN KEY (form_id) REFERENCES forms (form_id),
+    FOREIGN KEY (ques_id) REFERENCES input_ques (ques_id),
+    UNIQUE (form_id, ques_id, field_name)
+);
+
+-- Create kb_documents table (chat knowledge base entries, optionally linked to a service)
+CREATE TABLE kb_documents (
+    document_type TEXT PRIMARY KEY,
+    service_id TEXT,
+    position INTEGER NOT NULL,
+    response TEXT NOT NULL,
+    FOREIGN KEY (service_id) REFERENCES services (service_id)
+);
+
+-- Create kb_keywords table (keywords that identify each knowledge base entry)
+CREATE TABLE kb_keywords (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_type TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    FOREIGN KEY (document_type) REFERENCES kb_documents (document_type),
+    UNIQUE (document_type, keyword)
+);
+
+-- Indexes for the catalog lookups: forms by service, questions by form and categories of questions
+CREATE INDEX idx_forms_service_id ON forms (service_id);
+CREATE INDEX idx_form_queries_form_id ON form_queries (form_id, form_query_id);
+CREATE INDEX idx_form_queries_form_query_id ON form_queries (form_query_id);
+CREATE INDEX idx_input_ques_category_id ON input_ques (category_id);
+CREATE INDEX idx_kb_keywords_document_type ON kb_keywords (document_type);
+
 -- Insert sample data for services
 INSERT INTO services (service_id, service_name, service_description) VALUES
 ('SVC001', 'Divorce', 'Legal services related to divorce proceedings'),
@@ -95,4 +148,8 @@ INSERT INTO form_queries (form_id, form_query_id) VALUES
 ('FRM004', 'Q001'), -- LLC Formation needs personal and business info
 ('FRM004', 'Q003'),
 ('FRM004', 'Q006'),
-('FRM004', 'Q008');
\ No newline at end of file
+('FRM004', 'Q008');
+
+-- The knowledge base rows come from model/knowledge_base.py. kb_search, the FTS5 index the chat
+-- ranks with BM25, is defined only in setup_db.py, since it needs SQLite's FTS5 extension;
+-- init_db.py seeds the one and builds the other (build_search_index) after running this script
@@ -4,6 +4,10 @@ import os
 # Database setup script
 create_tables_script = '''
 -- Drop tables if they exist to avoid conflicts
+DROP TABLE IF EXISTS kb_keywords;
+DROP TABLE IF EXISTS kb_documents;
+DROP TABLE IF EXISTS form_field_map;
+DROP TABLE IF EXISTS form_fields;
 DROP TABLE IF EXISTS form_queries;
 DROP TABLE IF EXISTS input_ques;
 DROP TABLE IF EXISTS ques_categories;
@@ -51,6 +55,58 @@ CREATE TABLE form_queries (
     FOREIGN KEY (form_id) REFERENCES forms (form_id),
     FOREIGN KEY (form_query_id) REFERENCES input_ques (ques_id)
 );
+
+-- Create form_fields table (AcroForm fields extracted from each form's PDF template)
+CREATE TABLE form_fields (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    form_id TEXT NOT NULL,
+    field_name TEXT NOT NULL,
+    field_type TEXT,
+    page_index INTEGER NOT NULL,
+    annot_index INTEGER NOT NULL,
+    template_sha256 TEXT NOT NULL,
+    FOREIGN KEY (form_id) REFERENCES forms (form_id),
+    UNIQUE (form_id, field_name)
+);
+
+-- Create form_field_map table (mapping between questions and PDF fields of a form)
+CREATE TABLE form_field_map (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    form_id TEXT NOT NULL,
+    ques_id TEXT NOT NULL,
+    field_name TEXT NOT NULL,
+    FOREIGN KEY (form_id) REFERENCES forms (form_id),
+    FOREIGN KEY (ques_id) REFERENCES input_ques (ques_id),
+    UNIQUE (form_id, ques_id, field_name)
+);
+
+-- Create kb_documents table (chat knowledge base entries, optionally linked to a service)
+CREATE TABLE kb_documents (
+    document_type TEXT PRIMARY KEY,
+    service_id TEXT,
+    position INTEGER NOT NULL,
+    response TEXT NOT NULL,
+    FOREIGN KEY (service_id) REFERENCES services (service_id)
+);
+
+-- Create kb_keywords table (keywords that identify each knowledge base entry)
+CREATE TABLE kb_keywords (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_type TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    FOREIGN KEY (document_type) REFERENCES kb_documents (document_type),
+    UNIQUE (document_type, keyword)
+);
+'''
+
+# Index script, run once the sample data is in
+create_indexes_script = '''
+-- Indexes for the catalog lookups: forms by service, questions by form and categories of questions
+CREATE INDEX idx_forms_service_id ON forms (service_id);
+CREATE INDEX idx_form_queries_form_id ON form_queries (form_id, form_query_id);
+CREATE INDEX idx_form_queries_form_query_id ON form_queries (form_query_id);
+CREATE INDEX idx_input_ques_category_id ON input_ques (category_id);
+CREATE INDEX idx_kb_keywords_document_type ON kb_keywords (document_type);
 '''
 
 # Sample data script
@@ -106,6 +162,75 @@ INSERT INTO form_queries (form_id, form_query_id) VALUES
 ('FRM004', 'Q008');
 '''
 
+# Full-text search table, created last; needs SQLite's FTS5 extension
+create_search_index_script = '''
+-- Full-text index over the knowledge base and the forms catalog, ranked with BM25 by the chat
+DROP TABLE IF EXISTS kb_search;
+CREATE VIRTUAL TABLE kb_search USING fts5(
+    document_type UNINDEXED,
+    form_id UNINDEXED,
+    title,
+    description,
+    keywords,
+    tokenize = 'unicode61'
+);
+'''
+
+# (Re)fill kb_search from the knowledge base and forms tables
+fill_search_index_script = '''
+DELETE FROM kb_search;
+
+INSERT INTO kb_search (document_type, form_id, title, description, keywords)
+SELECT d.document_type, NULL, replace(d.document_type, '_', ' '), s.service_description,
+       (SELECT group_concat(k.keyword, ' ') FROM kb_keywords k WHERE k.document_type = d.document_type)
+FROM kb_documents d
+LEFT JOIN services s ON s.service_id = d.service_id;
+
+-- Forms answer with the knowledge base entry of their service
+INSERT INTO kb_search (document_type, form_id, title, description, keywords)
+SELECT d.document_type, f.form_id, f.form_name, f.form_description, NULL
+FROM forms f
+JOIN kb_documents d ON d.service_id = f.service_id;
+'''
+
+def build_search_index(cursor):
+    """
+    Create and fill kb_search, if this SQLite build has FTS5
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor or connection to build with
+
+    Returns:
+        bool: False if the index could not be built; the chat then uses its in-memory index
+    """
+    try:
+        cursor.executescript(create_search_index_script)
+        cursor.executescript(fill_search_index_script)
+    except sqlite3.OperationalError as e:
+        print(f"Could not build the search index: {str(e)}")
+        return False
+    return True
+
+def insert_knowledge_base(cursor, documents=None):
+    """
+    Seed kb_documents and kb_keywords from the built-in knowledge base
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor or connection to insert with
+        documents (list): Knowledge base entries, defaults to model/knowledge_base.py
+    """
+    from model.knowledge_base import knowledge_base
+
+    documents = knowledge_base if documents is None else documents
+    cursor.executemany(
+        "INSERT INTO kb_documents (document_type, service_id, position, response) VALUES (?, ?, ?, ?)",
+        [(item['document_type'], item['service_id'], position, item['response']) for position, item in enumerate(documents)]
+    )
+    cursor.executemany(
+        "INSERT INTO kb_keywords (document_type, keyword) VALUES (?, ?)",
+        [(item['document_type'], keyword) for item in documents for keyword in item['keywords']]
+    )
+
 def init_database():
     db_file = 'legal_assistant.db'
     
@@ -138,6 +263,13 @@ def init_database():
         
         print("Inserting sample data...")
         cursor.executescript(insert_data_script)
+        insert_knowledge_base(cursor)
+        
+        print("Creating indexes...")
+        cursor.executescript(create_indexes_script)
+        
+        print("Building the knowledge base search index...")
+        build_search_index(cursor)
         
         # Commit the changes and close the connection
         conn.commit()
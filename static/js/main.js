@@ -25,6 +25,13 @@ document.addEventListener('DOMContentLoaded', function() {
     let selectedServiceId = null;
     let selectedFormId = null;
     let currentFormData = null;
+    let currentArtifactId = null;
+    
+    // Ranked documents requested with each chat message
+    const CHAT_TOP_K = 3;
+    
+    // Badges for ranked documents matched without a similarity score
+    const MATCH_LABELS = {keyword: 'Keyword match', search: 'Text match'};
     
     // Fetch services on page load
     fetchServices();
@@ -39,6 +46,11 @@ document.addEventListener('DOMContentLoaded', function() {
     
     downloadBtn.addEventListener('click', downloadDocument);
     
+    // Edited answers no longer match the rendered preview
+    formFields.addEventListener('input', function() {
+        currentArtifactId = null;
+    });
+    
     sendMessageBtn.addEventListener('click', sendChatMessage);
     
     chatInput.addEventListener('keypress', function(e) {
@@ -202,6 +214,7 @@ document.addEventListener('DOMContentLoaded', function() {
     function selectForm(formId, formName) {
         console.log("Selected form:", formId, formName);
         selectedFormId = formId;
+        currentArtifactId = null;
         formTitle.textContent = formName;
         
         // Show loading in form fields
@@ -390,6 +403,8 @@ document.addEventListener('DOMContentLoaded', function() {
         .then(data => {
             // Display the generated document content
             previewContent.innerHTML = data.content;
+            // Remember the rendered artifact so the download can reuse it
+            currentArtifactId = data.artifact_id || null;
         })
         .catch(error => {
             previewContent.innerHTML = `
@@ -416,6 +431,11 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
         
+        // Let the server reuse the document it already rendered for the preview
+        if (currentArtifactId) {
+            formData.artifact_id = currentArtifactId;
+        }
+        
         // Create a temporary form to submit the download request
         const tempForm = document.createElement('form');
         tempForm.method = 'POST';
@@ -471,7 +491,7 @@ document.addEventListener('DOMContentLoaded', function() {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ user_chat: userMessage })
+            body: JSON.stringify({ user_chat: userMessage, top_k: CHAT_TOP_K })
         })
         .then(response => {
             console.log("Response status:", response.status);
@@ -485,6 +505,11 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Add AI response to chat
             addMessageToChat(data.aiMessage, 'ai');
+            
+            // Offer the forms of every ranked document at once
+            if (data.results && data.results.length > 0) {
+                addResultsToChat(data.results);
+            }
         })
         .catch(error => {
             console.error('Error in chat:', error);
@@ -501,6 +526,43 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    function addResultsToChat(results) {
+        const forms = [];
+        results.forEach(result => {
+            result.forms.forEach(form => forms.push(form));
+        });
+        if (forms.length === 0) return;
+        
+        const messageDiv = document.createElement('div');
+        messageDiv.className = 'message ai-message';
+        messageDiv.innerHTML = `
+            <div class="message-content">
+                <p class="mb-2">Matching forms:</p>
+                <div class="list-group chat-results"></div>
+            </div>
+        `;
+        
+        const resultsList = messageDiv.querySelector('.chat-results');
+        forms.forEach(form => {
+            // Only a similarity match has a meaningful percentage; keyword and search matches can score 0
+            const badge = form.match === 'similarity' ? `${Math.round(form.score * 100)}%` : MATCH_LABELS[form.match];
+            const formButton = document.createElement('button');
+            formButton.type = 'button';
+            formButton.className = 'list-group-item list-group-item-action d-flex justify-content-between align-items-center';
+            formButton.innerHTML = `
+                <span>${form.form_name} <small class="text-muted">${form.service_name}</small></span>
+                <span class="badge bg-primary rounded-pill">${badge}</span>
+            `;
+            formButton.addEventListener('click', function() {
+                selectForm(form.form_id, form.form_name);
+            });
+            resultsList.appendChild(formButton);
+        });
+        
+        chatMessages.appendChild(messageDiv);
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    }
+    
     function addMessageToChat(message, sender) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}-message`;
@@ -0,0 +1,329 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Where downloaded templates are kept between requests
+TEMPLATE_CACHE_DIR = os.environ.get("TEMPLATE_CACHE_DIR", os.path.join("cache", "templates"))
+
+# Optional local directory of template files laid out as <host>/<path>; when set the network is never used
+TEMPLATE_FIXTURE_DIR = os.environ.get("TEMPLATE_FIXTURE_DIR")
+
+# Seconds before a cached template is revalidated against its source
+TEMPLATE_MAX_AGE = float(os.environ.get("TEMPLATE_MAX_AGE", "86400"))
+
+# (connect, read) timeouts for template downloads
+TEMPLATE_TIMEOUT = (
+    float(os.environ.get("TEMPLATE_CONNECT_TIMEOUT", "3.05")),
+    float(os.environ.get("TEMPLATE_READ_TIMEOUT", "20")),
+)
+
+class TemplateFetchError(Exception):
+    """Raised when a template cannot be downloaded and no cached copy exists"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Return the process-wide pooled HTTP session used for template downloads"""
+    global _session
+    # Imported on first download; fixtures and cached templates never need them
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            retries = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=retries)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+_async_sessions = {}
+
+async def get_async_session():
+    """Return the aiohttp session of the running event loop, creating it on first use"""
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=32, limit_per_host=8)
+        session = aiohttp.ClientSession(connector=connector)
+        _async_sessions[loop] = session
+    return session
+
+async def close_async_session():
+    """Close the running event loop's aiohttp session, e.g. at server shutdown"""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+def _reset_session_after_fork():
+    # Pooled sockets must not be shared between forked worker processes
+    global _session, _session_lock
+    _session = None
+    _session_lock = threading.Lock()
+    _async_sessions.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_session_after_fork)
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+class TemplateStore:
+    """
+    Content-addressed on-disk cache of form templates, keyed by form_link.
+
+    Template bytes are stored once under the SHA-256 of their content, and a
+    small JSON record per link remembers which blob it points at along with
+    the ETag / Last-Modified validators used to revalidate it.
+    """
+
+    def __init__(self, cache_dir=TEMPLATE_CACHE_DIR, fixture_dir=TEMPLATE_FIXTURE_DIR,
+                 max_age=TEMPLATE_MAX_AGE, timeout=TEMPLATE_TIMEOUT, session=None):
+        self.cache_dir = cache_dir
+        self.fixture_dir = fixture_dir
+        self.max_age = max_age
+        self.timeout = timeout
+        self.session = session
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.index_dir = os.path.join(cache_dir, "index")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def _record_path(self, url):
+        return os.path.join(self.index_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + ".json")
+
+    def _blob_path(self, content_hash):
+        return os.path.join(self.blob_dir, content_hash)
+
+    def get_record(self, url):
+        """Return the cache record for a link, or None if it was never fetched"""
+        try:
+            with open(self._record_path(url), 'r') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self._blob_path(record['sha256'])):
+            return None
+        return record
+
+    def _store(self, url, content, etag=None, last_modified=None):
+        content_hash = hashlib.sha256(content).hexdigest()
+        blob_path = self._blob_path(content_hash)
+        if not os.path.exists(blob_path):
+            _write_atomic(blob_path, content)
+        record = {
+            'url': url,
+            'sha256': content_hash,
+            'size': len(content),
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': time.time(),
+        }
+        _write_atomic(self._record_path(url), json.dumps(record).encode('utf-8'))
+        return record
+
+    def _read_blob(self, record):
+        with open(self._blob_path(record['sha256']), 'rb') as f:
+            return f.read()
+
+    def _fixture_path(self, url):
+        # Fixtures mirror the link's host and path, e.g.
+        # https://www.courts.ca.gov/documents/fl100.pdf -> www.courts.ca.gov/documents/fl100.pdf,
+        # so links that share a file name never share a template
+        parsed = urlparse(url)
+        relative = os.path.normpath(os.path.join(parsed.netloc, parsed.path.lstrip('/')))
+        if relative.startswith(os.pardir) or os.path.isabs(relative):
+            raise TemplateFetchError(f"Invalid template link: {url}", status_code=404)
+        return os.path.join(self.fixture_dir, relative)
+
+    def fetch(self, url, force=False):
+        """
+        Return the template bytes for a link, downloading or revalidating if needed
+
+        Args:
+            url (str): The form_link of the template
+            force (bool): Revalidate even if the cached copy is still fresh
+
+        Returns:
+            bytes: The template content
+        """
+        content, _ = self.fetch_with_hash(url, force=force)
+        return content
+
+    def _cached(self, url, force=False):
+        """
+        Serve a link without the network when possible
+
+        Returns:
+            tuple: ((content, sha256) or None, cache record or None)
+        """
+        if self.fixture_dir:
+            path = self._fixture_path(url)
+            try:
+                with open(path, 'rb') as f:
+                    content = f.read()
+            except OSError:
+                raise TemplateFetchError(f"Template fixture not found: {path}", status_code=404)
+            return (content, hashlib.sha256(content).hexdigest()), None
+
+        record = self.get_record(url)
+        if record is not None and not force and time.time() - record['fetched_at'] < self.max_age:
+            return (self._read_blob(record), record['sha256']), record
+        return None, record
+
+    def _revalidation_headers(self, record):
+        headers = {}
+        if record is not None:
+            if record.get('etag'):
+                headers['If-None-Match'] = record['etag']
+            if record.get('last_modified'):
+                headers['If-Modified-Since'] = record['last_modified']
+        return headers
+
+    def _download_failed(self, url, record, error):
+        if record is not None:
+            logger.warning("Could not revalidate %s, serving cached copy: %s", url, error)
+            return self._read_blob(record), record['sha256']
+        raise TemplateFetchError(f"Failed to download the template: {str(error)}")
+
+    def _handle_response(self, url, record, status_code, headers, content):
+        if status_code == 304 and record is not None:
+            # Unchanged upstream: keep the blob and restart the freshness window
+            record['fetched_at'] = time.time()
+            _write_atomic(self._record_path(url), json.dumps(record).encode('utf-8'))
+            return self._read_blob(record), record['sha256']
+
+        if status_code != 200:
+            if record is not None:
+                logger.warning("Revalidating %s returned %s, serving cached copy", url, status_code)
+                return self._read_blob(record), record['sha256']
+            raise TemplateFetchError(
+                f"Failed to download the PDF. Status code: {status_code}",
+                status_code=status_code
+            )
+
+        record = self._store(
+            url, content,
+            etag=headers.get('ETag'),
+            last_modified=headers.get('Last-Modified'),
+        )
+        logger.info("Cached template %s (%d bytes)", url, record['size'])
+        return content, record['sha256']
+
+    def fetch_with_hash(self, url, force=False):
+        """Like fetch, but also return the SHA-256 of the content"""
+        cached, record = self._cached(url, force)
+        if cached is not None:
+            return cached
+
+        import requests
+
+        session = self.session or get_session()
+        try:
+            response = session.get(url, headers=self._revalidation_headers(record), timeout=self.timeout)
+        except requests.RequestException as e:
+            return self._download_failed(url, record, e)
+        return self._handle_response(url, record, response.status_code, response.headers, response.content)
+
+    async def fetch_with_hash_async(self, url, force=False, executor=None):
+        """
+        Like fetch_with_hash, without blocking the event loop
+
+        Downloads go through aiohttp when it is installed; otherwise the
+        blocking download runs on executor (the loop's default if None).
+        Disk access for the cache always runs on the executor.
+        """
+        loop = asyncio.get_running_loop()
+        cached, record = await loop.run_in_executor(executor, self._cached, url, force)
+        if cached is not None:
+            return cached
+
+        try:
+            import aiohttp
+        except ImportError:
+            return await loop.run_in_executor(executor, self.fetch_with_hash, url, force)
+
+        session = await get_async_session()
+        connect_timeout, read_timeout = self.timeout
+        try:
+            async with session.get(
+                url, headers=self._revalidation_headers(record),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+            ) as response:
+                status_code = response.status
+                headers = {name: response.headers.get(name) for name in ('ETag', 'Last-Modified')}
+                content = await response.read() if status_code == 200 else b""
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return await loop.run_in_executor(executor, self._download_failed, url, record, e)
+        return await loop.run_in_executor(
+            executor, self._handle_response, url, record, status_code, headers, content
+        )
+
+    def prefetch(self, urls, force=False):
+        """
+        Download every link into the cache
+
+        Returns:
+            dict: url -> error message for the links that failed
+        """
+        failures = {}
+        for url in urls:
+            try:
+                self.fetch(url, force=force)
+            except TemplateFetchError as e:
+                failures[url] = str(e)
+        return failures
+
+_store = None
+
+def get_template_store():
+    """Return the process-wide template store"""
+    global _store
+    if _store is None:
+        _store = TemplateStore()
+    return _store
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local cache of form templates")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    prefetch_parser = subparsers.add_parser("prefetch", help="Download every forms.form_link into the cache")
+    prefetch_parser.add_argument("--force", action="store_true", help="Revalidate templates that are still fresh")
+    args = parser.parse_args()
+
+    import db
+
+    conn = db.connect()
+    try:
+        urls = [row["form_link"] for row in conn.execute("SELECT DISTINCT form_link FROM forms;")]
+    finally:
+        conn.close()
+
+    failures = get_template_store().prefetch(urls, force=args.force)
+    print(f"Prefetched {len(urls) - len(failures)} of {len(urls)} templates into {TEMPLATE_CACHE_DIR}")
+    for url, error in failures.items():
+        print(f"  {url}: {error}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,81 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Point the application at a scratch directory before any of its modules are imported
+DATA_DIR = tempfile.mkdtemp(prefix='legal-assistant-tests-')
+os.environ['DATABASE_PATH'] = os.path.join(DATA_DIR, 'legal_assistant.db')
+os.environ['TEMPLATE_CACHE_DIR'] = os.path.join(DATA_DIR, 'templates')
+os.environ['APP_WARMUP'] = '0'
+
+def pytest_unconfigure(config):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+@pytest.fixture(scope='session')
+def database():
+    """Build the sample database with setup_db.py and return its path"""
+    import setup_db
+
+    cwd = os.getcwd()
+    os.chdir(DATA_DIR)
+    try:
+        assert setup_db.init_database()
+    finally:
+        os.chdir(cwd)
+    return os.environ['DATABASE_PATH']
+
+@pytest.fixture
+def scratch_database(database, tmp_path, monkeypatch):
+    """A copy of the sample database that the test may change, used in place of the shared one"""
+    import catalog
+    import db
+
+    path = str(tmp_path / 'legal_assistant.db')
+    shutil.copyfile(database, path)
+    monkeypatch.setattr(db, '_db_path', path)
+    monkeypatch.setattr(catalog, '_catalog', None)
+    return path
+
+@pytest.fixture(scope='session')
+def acroform_pdf():
+    """A one-page template with a nested text field, a checkbox and a field filled through its parent"""
+    from PyPDF2 import PdfWriter
+    from PyPDF2.generic import ArrayObject, DictionaryObject, NameObject, RectangleObject, TextStringObject
+
+    writer = PdfWriter()
+    writer.add_blank_page(612, 792)
+    page = writer.pages[0]
+
+    def widget(**entries):
+        annot = DictionaryObject({
+            NameObject('/Type'): NameObject('/Annot'),
+            NameObject('/Subtype'): NameObject('/Widget'),
+            NameObject('/Rect'): RectangleObject([72, 700, 300, 720]),
+        })
+        annot.update({NameObject(f'/{key}'): value for key, value in entries.items()})
+        return annot
+
+    applicant = writer._add_object(DictionaryObject({NameObject('/T'): TextStringObject('applicant')}))
+    name = writer._add_object(widget(FT=NameObject('/Tx'), T=TextStringObject('name'), Parent=applicant))
+    applicant.get_object()[NameObject('/Kids')] = ArrayObject([name])
+    agree = writer._add_object(widget(FT=NameObject('/Btn'), T=TextStringObject('agree')))
+    signature = writer._add_object(DictionaryObject({
+        NameObject('/T'): TextStringObject('signature'), NameObject('/FT'): NameObject('/Tx'),
+    }))
+    signature_widget = writer._add_object(widget(Parent=signature))
+    signature.get_object()[NameObject('/Kids')] = ArrayObject([signature_widget])
+
+    page[NameObject('/Annots')] = ArrayObject([name, agree, signature_widget])
+    writer._root_object[NameObject('/AcroForm')] = DictionaryObject({
+        NameObject('/Fields'): ArrayObject([applicant, agree, signature]),
+    })
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
@@ -0,0 +1,131 @@
+import io
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as app_module
+import catalog
+from artifacts import artifact_cache
+from model.similarity import MAX_TOP_K
+
+@pytest.fixture
+def client(scratch_database):
+    return app_module.create_app().test_client()
+
+@pytest.mark.parametrize('value, expected', [(1, 1), ('3', 3), (MAX_TOP_K, MAX_TOP_K)])
+def test_parse_top_k_accepts_counts_in_range(value, expected):
+    assert app_module.parse_top_k(value) == expected
+
+@pytest.mark.parametrize('value', [0, -1, MAX_TOP_K + 1, 'three', None, '2.5', [3]])
+def test_parse_top_k_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        app_module.parse_top_k(value)
+
+def test_chat_returns_ranked_results_with_forms(client):
+    response = client.post('/api/chat', json={'user_chat': 'divorce and my will', 'top_k': 2})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [result['document_type'] for result in data['results']] == ['divorce', 'will']
+    assert data['aiMessage'] == data['results'][0]['response']
+    assert [form['form_id'] for form in data['results'][0]['forms']] == ['FRM001']
+    assert data['results'][0]['forms'][0]['match'] == 'keyword'
+
+def test_chat_without_top_k_returns_only_the_answer(client):
+    response = client.post('/api/chat', json={'user_chat': 'divorce'})
+    assert list(response.get_json()) == ['aiMessage']
+
+def test_chat_with_top_k_ranks_once(client, monkeypatch):
+    from model import similarity
+
+    calls = []
+    rank_documents = similarity.rank_documents
+    monkeypatch.setattr(similarity, 'rank_documents', lambda *args: calls.append(args) or rank_documents(*args))
+    monkeypatch.setattr(similarity, 'get_document', lambda *args: pytest.fail('ran the chat stages twice'))
+    data = client.post('/api/chat', json={'user_chat': 'divorce', 'top_k': 3}).get_json()
+    assert len(calls) == 1
+    assert data['aiMessage'] == data['results'][0]['response']
+
+def test_chat_with_top_k_and_no_match_answers_with_a_default(client):
+    from model.similarity import default_responses
+
+    data = client.post('/api/chat', json={'user_chat': 'qwerty', 'top_k': 3}).get_json()
+    assert data == {'aiMessage': data['aiMessage'], 'results': []}
+    assert data['aiMessage'] in default_responses
+
+def test_chat_rejects_an_invalid_top_k(client):
+    response = client.post('/api/chat', json={'user_chat': 'divorce', 'top_k': MAX_TOP_K + 1})
+    assert response.status_code == 400
+    assert 'top_k' in response.get_json()['error']
+
+@pytest.mark.parametrize('path', ['/api/services', '/api/forms?service_id=SVC001', '/api/form-details?form_id=FRM001'])
+def test_catalog_endpoints_answer_304_when_unchanged(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.headers['Last-Modified']
+
+    revalidated = client.get(path, headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+    changed = client.get(path, headers={'If-None-Match': '"stale"'})
+    assert changed.status_code == 200
+    assert changed.data == response.data
+
+def test_catalog_etag_changes_with_the_catalog(client, scratch_database, monkeypatch):
+    monkeypatch.setattr(catalog, 'CATALOG_CHECK_INTERVAL', 0)
+    response = client.get('/api/services')
+    conn = sqlite3.connect(scratch_database)
+    with conn:
+        conn.execute("UPDATE services SET service_name = 'Family law' WHERE service_id = 'SVC001'")
+    conn.close()
+
+    updated = client.get('/api/services', headers={'If-None-Match': response.headers['ETag']})
+    assert updated.status_code == 200
+    assert updated.headers['ETag'] != response.headers['ETag']
+    assert updated.get_json()[0]['service_name'] == 'Family law'
+
+@pytest.fixture
+def letter_client(client, scratch_database):
+    conn = sqlite3.connect(scratch_database)
+    with conn:
+        conn.execute(
+            "INSERT INTO forms (form_id, form_name, form_description, form_link, service_id) "
+            "VALUES ('FRM900', 'Letter', '', 'https://example.org/letter.docx', 'SVC001')"
+        )
+    conn.close()
+    artifact_cache.clear()
+    return client
+
+def test_final_form_streams_a_separate_document_per_request(letter_client, tmp_path, monkeypatch):
+    import docx
+
+    # Nothing is written to the working directory, so concurrent downloads cannot collide
+    workdir = tmp_path / 'cwd'
+    workdir.mkdir()
+    monkeypatch.chdir(workdir)
+    names = [f'Person {i}' for i in range(8)]
+
+    def download(name):
+        response = letter_client.post('/api/final-form', json={'form_id': 'FRM900', '1': name})
+        assert response.is_streamed
+        assert response.headers['Content-Length'] == str(len(response.data))
+        return '\n'.join(paragraph.text for paragraph in docx.Document(io.BytesIO(response.data)).paragraphs)
+
+    with ThreadPoolExecutor(4) as executor:
+        texts = list(executor.map(download, names))
+    assert all(name in text for name, text in zip(names, texts))
+    assert os.listdir(workdir) == []
+
+def test_final_content_streams_the_preview(letter_client):
+    streamed = letter_client.post('/api/final-content?stream=1', json={'form_id': 'FRM900', '1': 'Jane Doe'})
+    assert streamed.is_streamed
+    assert streamed.mimetype == 'text/html'
+    assert 'Jane Doe' in streamed.get_data(as_text=True)
+
+    # The streamed markup was kept with the artifact
+    preview = letter_client.post('/api/final-content', json={'form_id': 'FRM900', '1': 'Jane Doe'}).get_json()
+    assert preview['artifact_id'] == streamed.headers['X-Artifact-Id']
+    assert preview['content'] == streamed.get_data(as_text=True)
@@ -0,0 +1,101 @@
+import io
+import json
+import sqlite3
+import threading
+import time
+
+import app as app_module
+import catalog
+from artifacts import Artifact, ArtifactCache, artifact_cache, artifact_key
+
+def test_artifact_key_ignores_order_and_non_answer_fields():
+    key = artifact_key('FRM001', {'form_id': 'FRM001', '1': 'Jane', '2': 'Doe'}, 1)
+    assert artifact_key('FRM001', {'2': 'Doe', '1': 'Jane', 'artifact_id': 'x', 'extra': 'y'}, 1) == key
+    assert len(key) == 32
+
+def test_artifact_key_compares_answers_as_text():
+    assert artifact_key('FRM001', {'1': 42}, 1) == artifact_key('FRM001', {'1': '42'}, 1)
+
+def test_artifact_key_changes_with_form_answers_and_catalog():
+    key = artifact_key('FRM001', {'1': 'Jane'}, 1)
+    assert artifact_key('FRM002', {'1': 'Jane'}, 1) != key
+    assert artifact_key('FRM001', {'1': 'John'}, 1) != key
+    assert artifact_key('FRM001', {'1': 'Jane', '2': ''}, 1) != key
+    assert artifact_key('FRM001', {'1': 'Jane'}, 2) != key
+
+def test_outputs_are_rendered_once():
+    cache = ArtifactCache()
+    artifact = cache.get_or_create('a', 'FRM001', None)
+    assert cache.get_or_create('a', 'FRM001', None) is artifact
+    calls = []
+
+    def render():
+        calls.append(1)
+        time.sleep(0.05)
+        return b'pdf'
+
+    threads = [threading.Thread(target=cache.render, args=(artifact, 'pdf', render)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.render(artifact, 'pdf', render) == b'pdf'
+    assert len(calls) == 1
+
+def test_artifacts_are_evicted_by_output_size():
+    cache = ArtifactCache(max_bytes=10)
+    first = cache.get_or_create('a', 'FRM001', None)
+    cache.render(first, 'pdf', lambda: b'x' * 6)
+    second = cache.get_or_create('b', 'FRM001', None)
+    cache.render(second, 'pdf', lambda: b'x' * 6)
+    assert cache.get('a') is None
+    assert cache.get('b') is second
+    assert isinstance(second, Artifact) and second.size() == 6
+
+def test_preview_is_rendered_once_per_submission(scratch_database):
+    client = app_module.create_app().test_client()
+    artifact_cache.clear()
+    submission = {'form_id': 'FRM001', '1': 'Jane Doe', '2': '2020-01-01'}
+    first = client.post('/api/final-content', json=submission).get_json()
+    assert first['artifact_id'] == artifact_key('FRM001', submission, catalog.get_catalog().version)
+    assert 'Jane Doe' in first['content']
+
+    second = client.post('/api/final-content', json=dict(reversed(list(submission.items())))).get_json()
+    assert second == first
+    assert artifact_cache.stats()['size'] == 1
+
+def test_artifact_growing_past_the_budget_is_dropped():
+    cache = ArtifactCache(max_bytes=10)
+    artifact = cache.get_or_create('a', 'FRM001', None)
+    cache.render(artifact, 'html', lambda: 'x' * 4)
+    assert cache.stats()['weight'] == 4
+    cache.render(artifact, 'pdf', lambda: b'x' * 50)
+    assert cache.get('a') is None
+    assert cache.stats()['weight'] == 0
+
+def docx_text(content):
+    import docx
+
+    return '\n'.join(paragraph.text for paragraph in docx.Document(io.BytesIO(content)).paragraphs)
+
+def test_download_fetches_the_previewed_artifact(scratch_database):
+    conn = sqlite3.connect(scratch_database)
+    with conn:
+        conn.execute(
+            "INSERT INTO forms (form_id, form_name, form_description, form_link, service_id) "
+            "VALUES ('FRM900', 'Letter', '', 'https://example.org/letter.docx', 'SVC001')"
+        )
+    conn.close()
+    client = app_module.create_app().test_client()
+    artifact_cache.clear()
+    preview = client.post('/api/final-content', json={'form_id': 'FRM900', '1': 'Jane Doe'}).get_json()
+
+    download = {'form_id': 'FRM900', '1': 'John Doe', 'artifact_id': preview['artifact_id']}
+    response = client.post('/api/final-form', data={'formData': json.dumps(download)})
+    assert response.status_code == 200
+    assert 'Jane Doe' in docx_text(response.data)
+
+    # Once the artifact is evicted the answers sent along are rendered instead
+    artifact_cache.clear()
+    response = client.post('/api/final-form', data={'formData': json.dumps(download)})
+    assert 'John Doe' in docx_text(response.data)
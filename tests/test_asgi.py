@@ -0,0 +1,171 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+import asgi
+from artifacts import artifact_cache
+
+def call(app, method, path, body=b'', content_type='application/json', query=b''):
+    """Drive the ASGI app through one request and return (status, headers, body)"""
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode('utf-8')
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query,
+        'headers': [(b'content-type', content_type.encode('latin-1'))],
+    }
+    asyncio.run(app(scope, receive, send))
+    start = messages[0]
+    assert start['type'] == 'http.response.start'
+    assert not messages[-1].get('more_body')
+    headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in start['headers']}
+    return start['status'], headers, b''.join(message.get('body', b'') for message in messages[1:])
+
+@pytest.fixture
+def app(scratch_database):
+    app = asgi.AsyncApp()
+    yield app
+    app.shutdown_executors()
+
+def test_unknown_route_is_not_found(app):
+    status, _, body = call(app, 'GET', '/api/nothing')
+    assert status == 404
+    assert json.loads(body) == {'error': 'Not found'}
+
+def test_wrong_method_is_not_allowed(app):
+    status, headers, _ = call(app, 'GET', '/api/chat')
+    assert status == 405
+    assert headers['allow'] == 'POST'
+
+def test_other_routes_go_to_the_fallback(scratch_database):
+    seen = []
+
+    async def fallback(scope, receive, send):
+        seen.append(scope['path'])
+        await asgi.Response.json([], status=200).send(send)
+
+    status, _, _ = call(asgi.AsyncApp(fallback=fallback), 'GET', '/api/services')
+    assert (status, seen) == (200, ['/api/services'])
+
+def test_chat(app):
+    status, _, body = call(app, 'POST', '/api/chat', {'user_chat': 'divorce and my will', 'top_k': 2})
+    data = json.loads(body)
+    assert status == 200
+    assert [result['document_type'] for result in data['results']] == ['divorce', 'will']
+    assert data['aiMessage'] == data['results'][0]['response']
+
+@pytest.mark.parametrize('body', [b'{"user_chat": ', {'user_chat': 'divorce', 'top_k': 0}])
+def test_chat_rejects_bad_requests(app, body):
+    status, _, _ = call(app, 'POST', '/api/chat', body)
+    assert status == 400
+
+def test_chat_batch(app):
+    status, _, body = call(app, 'POST', '/api/chat/batch', {'user_chats': ['divorce', 'LLC formation']})
+    assert status == 200
+    assert len(json.loads(body)['aiMessages']) == 2
+    assert call(app, 'POST', '/api/chat/batch', {'user_chats': 'divorce'})[0] == 400
+
+def test_body_size_is_limited(app, monkeypatch):
+    monkeypatch.setattr(asgi, 'ASYNC_MAX_BODY', 10)
+    assert call(app, 'POST', '/api/chat', {'user_chat': 'a long divorce question'})[0] == 413
+
+def test_overloaded_route_answers_503(app):
+    app.limiters['/api/chat'] = asgi.RouteLimiter(1, max_waiting=0)
+
+    async def two_requests():
+        release = asyncio.Event()
+        statuses = []
+
+        async def slow_chat(request):
+            await release.wait()
+            return asgi.Response.json({})
+
+        app.routes[('POST', '/api/chat')] = slow_chat
+
+        async def request():
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'{}'}
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {'type': 'http', 'method': 'POST', 'path': '/api/chat', 'headers': []}
+            await app(scope, receive, send)
+            statuses.append(messages[0]['status'])
+
+        first = asyncio.ensure_future(request())
+        await asyncio.sleep(0)
+        await request()
+        release.set()
+        await first
+        return statuses
+
+    assert asyncio.run(two_requests()) == [503, 200]
+
+def test_route_limiter_queues_up_to_max_waiting():
+    async def run():
+        limiter = asgi.RouteLimiter(1, max_waiting=1)
+        await limiter.__aenter__()
+        waiter = asyncio.ensure_future(limiter.__aenter__())
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        with pytest.raises(asgi.Overloaded):
+            await limiter.__aenter__()
+        await limiter.__aexit__(None, None, None)
+        await waiter
+        assert limiter.waiting == 0
+
+    asyncio.run(run())
+
+def test_documents(app, scratch_database):
+    conn = sqlite3.connect(scratch_database)
+    with conn:
+        conn.execute(
+            "INSERT INTO forms (form_id, form_name, form_description, form_link, service_id) "
+            "VALUES ('FRM900', 'Déclaration', '', 'https://example.org/letter.docx', 'SVC001')"
+        )
+    conn.close()
+    artifact_cache.clear()
+    status, _, body = call(app, 'POST', '/api/final-content', {'form_id': 'FRM900', '1': 'Jane Doe'})
+    preview = json.loads(body)
+    assert status == 200
+    assert 'Jane Doe' in preview['content']
+
+    form_data = json.dumps({'artifact_id': preview['artifact_id']})
+    status, headers, body = call(
+        app, 'POST', '/api/final-form', ('formData=' + form_data).encode('utf-8'),
+        content_type='application/x-www-form-urlencoded'
+    )
+    assert status == 200
+    assert headers['content-disposition'].endswith("filename*=UTF-8''D%C3%A9claration.docx")
+    assert body[:2] == b'PK'
+    assert call(app, 'POST', '/api/final-form', {'artifact_id': 'missing'})[0] == 404
+    assert call(app, 'POST', '/api/final-form', b'', content_type='text/plain')[0] == 400
+
+def test_lifespan(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(asgi, 'warm_up', lambda: calls.append('warm_up'))
+    messages = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+    sent = []
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    asyncio.run(app({'type': 'lifespan'}, receive, send))
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert calls == ['warm_up']
+    assert app.io_executor is None
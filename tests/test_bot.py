@@ -0,0 +1,39 @@
+import re
+
+import pytest
+
+from model import bot
+
+def reference_intent(message):
+    """match_intent before the precompiled patterns: re.search over the patterns in priority order"""
+    if not message:
+        return None
+    for item in bot.patterns:
+        if re.search(item['pattern'], message):
+            return item['intent']
+    return None
+
+@pytest.mark.parametrize('message', [
+    'I need divorce papers and help splitting our property',
+    'divorce and custody of my kids',
+    'my will leaves the business to my son',
+    'a contract for my LLC',
+    'power of attorney for my estate',
+    'landlord says the lease agreement is void',
+    'tax on my social security benefit',
+    'visa for my company employees',
+    'thanks, bye',
+    'yes please, help with a will',
+    'Hello, I have a question about child support',
+    'What can you do about my tenant?',
+    'POA',
+    'nothing relevant',
+    '',
+])
+def test_match_intent_keeps_the_priority_order(message):
+    assert bot.match_intent(message) == reference_intent(message)
+
+def test_earlier_patterns_win_overlaps():
+    # "hi" inside "this" fires the greeting before divorce, as the original if/elif chain did
+    assert bot.match_intent('this divorce') == bot.patterns[0]['intent']
+    assert bot.match_intent('divorce and my estate') == 'divorce'
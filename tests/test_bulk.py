@@ -0,0 +1,82 @@
+import io
+import sqlite3
+import zipfile
+
+import pytest
+
+import bulk
+
+render_one = bulk._render_one
+
+def test_csv_answer_sets_use_form_field_ids():
+    stream = io.StringIO('filename,Q001,002\nsmith,Jane,\n')
+    assert list(bulk.parse_answer_sets(stream, 'csv')) == [{'filename': 'smith', '001': 'Jane', '002': ''}]
+
+def test_jsonl_answer_sets_skip_blank_lines():
+    stream = io.StringIO('{"Q1": 5, "2": null}\n\n{"filename": "b"}\n')
+    assert list(bulk.parse_answer_sets(stream, 'jsonl')) == [{'1': '5', '2': ''}, {'filename': 'b'}]
+
+def test_jsonl_answer_sets_must_be_objects():
+    with pytest.raises(ValueError, match='Line 2'):
+        list(bulk.parse_answer_sets(io.StringIO('{"1": "a"}\n[1, 2]\n'), 'jsonl'))
+
+def test_unsupported_answer_format():
+    with pytest.raises(ValueError):
+        list(bulk.parse_answer_sets(io.StringIO(''), 'xml'))
+
+def test_unique_filenames():
+    used = set()
+    names = [bulk._unique_filename(name, used) for name in ('a', 'a', 'a_2', 'b', 'a')]
+    assert names == ['a', 'a_2', 'a_2_2', 'b', 'a_3']
+
+@pytest.fixture
+def letter_form(scratch_database):
+    conn = sqlite3.connect(scratch_database)
+    with conn:
+        conn.execute(
+            "INSERT INTO forms (form_id, form_name, form_description, form_link, service_id) "
+            "VALUES ('FRM900', 'Letter', '', 'https://example.org/letter.docx', 'SVC001')"
+        )
+    conn.close()
+
+def render_or_fail(document):
+    if dict(document.answers).get('Field 999') == 'fail':
+        raise RuntimeError('renderer crashed')
+    return render_one(document)
+
+def test_bulk_zip_has_one_entry_per_answer_set(letter_form):
+    answer_sets = bulk.parse_answer_sets(io.StringIO('filename,001\nsmith,Jane\nsmith,John\n../x,Joe\n'), 'csv')
+    content = b''.join(bulk.generate_bulk_zip('FRM900', answer_sets, workers=1))
+    names = zipfile.ZipFile(io.BytesIO(content)).namelist()
+    assert names == ['smith.docx', 'smith_2.docx', 'x.docx']
+
+def test_bulk_zip_rejects_an_unknown_form(scratch_database):
+    with pytest.raises(KeyError):
+        bulk.generate_bulk_zip('FRM999', [], workers=1)
+
+def test_bulk_zip_resolves_questions_once_per_batch(letter_form, monkeypatch):
+    calls = []
+    load_question_texts = bulk.load_question_texts
+
+    def recording_load_question_texts(ques_ids, get_connection=None):
+        calls.append(set(ques_ids))
+        return load_question_texts(ques_ids, get_connection)
+
+    monkeypatch.setattr(bulk, 'load_question_texts', recording_load_question_texts)
+    answer_sets = [{'1': 'Jane'}, {'1': 'John', '2': 'x'}, {'3': 'y'}]
+    b''.join(bulk.generate_bulk_zip('FRM900', answer_sets, workers=1))
+    assert calls == [{'Q001', 'Q002', 'Q003'}]
+
+def test_bulk_zip_checks_every_row_before_streaming(letter_form):
+    answer_sets = ({'1': str(i)} for i in range(5))
+    with pytest.raises(ValueError, match='At most 3'):
+        bulk.generate_bulk_zip('FRM900', answer_sets, workers=1, max_rows=3)
+
+def test_failed_documents_get_an_error_entry(letter_form, monkeypatch):
+    # Forked workers see the patched renderer
+    monkeypatch.setenv('JOB_START_METHOD', 'fork')
+    monkeypatch.setattr(bulk, '_render_one', render_or_fail)
+    answer_sets = [{'filename': 'a', '1': 'Jane'}, {'filename': 'b', '999': 'fail'}, {'filename': 'c', '1': 'Joe'}]
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(bulk.generate_bulk_zip('FRM900', answer_sets, workers=1))))
+    assert archive.namelist() == ['a.docx', 'b.error.txt', 'c.docx']
+    assert b'renderer crashed' in archive.read('b.error.txt')
@@ -0,0 +1,82 @@
+import pytest
+
+from model import cache
+from model.cache import LRUCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    return clock
+
+def test_evicts_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    assert lru.get('a') == 1
+    lru.set('c', 3)
+    assert lru.get('b') is None
+    assert (lru.get('a'), lru.get('c')) == (1, 3)
+    assert lru.stats()['evictions'] == 1
+
+def test_set_replaces_existing_entry():
+    lru = LRUCache(maxsize=2)
+    lru.set('a', 1)
+    lru.set('a', 2)
+    assert len(lru) == 1
+    assert lru.get('a') == 2
+
+def test_cached_none_is_not_a_miss():
+    lru = LRUCache()
+    missing = object()
+    lru.set('a', None)
+    assert lru.get('a', missing) is None
+    assert lru.get('b', missing) is missing
+
+def test_entries_expire_after_ttl(clock):
+    lru = LRUCache(ttl=10)
+    lru.set('a', 1)
+    clock.now += 9.9
+    assert lru.get('a') == 1
+    clock.now += 0.2
+    assert lru.get('a') is None
+    assert len(lru) == 0
+    assert lru.stats()['hits'] == 1
+    assert lru.stats()['misses'] == 1
+
+def test_evicts_by_weight():
+    lru = LRUCache(maxsize=10, max_weight=10, weigh=len)
+    lru.set('a', b'x' * 6)
+    lru.set('b', b'x' * 6)
+    assert lru.get('a') is None
+    assert lru.weight == 6
+    # Larger than the whole cache: not stored and nothing flushed
+    lru.set('c', b'x' * 11)
+    assert lru.get('c') is None
+    assert lru.get('b') is not None
+
+def test_zero_size_disables_caching():
+    lru = LRUCache(maxsize=0)
+    lru.set('a', 1)
+    assert lru.get('a') is None
+
+def test_clear_drops_everything():
+    lru = LRUCache(weigh=len, max_weight=100)
+    lru.set('a', b'xyz')
+    lru.clear()
+    assert len(lru) == 0
+    assert lru.weight == 0
+
+def test_oversized_value_replaces_the_cached_one():
+    lru = LRUCache(max_weight=10, weigh=len)
+    lru.set('a', b'x' * 4)
+    lru.set('a', b'x' * 20)
+    assert lru.get('a') is None
+    assert lru.weight == 0
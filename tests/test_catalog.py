@@ -0,0 +1,112 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import catalog
+
+@pytest.fixture
+def check_always(monkeypatch):
+    monkeypatch.setattr(catalog, 'CATALOG_CHECK_INTERVAL', 0)
+
+def add_service(path, service_id):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(
+            "INSERT INTO services (service_id, service_name, service_description) VALUES (?, ?, ?)",
+            (service_id, f"Service {service_id}", "Added by a test")
+        )
+    conn.close()
+
+def test_catalog_is_loaded_once(scratch_database, check_always):
+    current = catalog.get_catalog()
+    assert catalog.get_catalog() is current
+    assert current.version == 1
+    assert current.get_form('FRM001')['service_id'] == 'SVC001'
+
+def test_catalog_reloads_after_a_write(scratch_database, check_always):
+    current = catalog.get_catalog()
+    add_service(scratch_database, 'SVC900')
+    reloaded = catalog.get_catalog()
+    assert reloaded is not current
+    assert reloaded.version == current.version + 1
+    assert 'SVC900' in reloaded.services_by_id
+
+def test_catalog_reloads_after_the_file_is_replaced(scratch_database, check_always, tmp_path):
+    current = catalog.get_catalog()
+    replacement = str(tmp_path / 'replacement.db')
+    shutil.copyfile(scratch_database, replacement)
+    add_service(replacement, 'SVC901')
+    os.replace(replacement, scratch_database)
+    assert 'SVC901' in catalog.get_catalog().services_by_id
+    assert catalog.get_catalog().version == current.version + 1
+
+def test_catalog_is_not_checked_within_the_interval(scratch_database, monkeypatch):
+    monkeypatch.setattr(catalog, 'CATALOG_CHECK_INTERVAL', 3600)
+    current = catalog.get_catalog()
+    add_service(scratch_database, 'SVC902')
+    assert catalog.get_catalog() is current
+    catalog.invalidate_catalog()
+    assert 'SVC902' in catalog.get_catalog().services_by_id
+
+def test_serialized_responses_follow_the_catalog_version(scratch_database, check_always):
+    dumps = repr
+    key = ('services',)
+    body, etag = catalog.get_catalog().serialized(key, catalog.get_catalog().get_services, dumps)
+    assert catalog.get_catalog().serialized(key, lambda: None, dumps) == (body, etag)
+    add_service(scratch_database, 'SVC903')
+    current = catalog.get_catalog()
+    assert current.serialized(key, current.get_services, dumps)[1] != etag
+
+def test_database_signature_of_a_missing_file(tmp_path):
+    assert catalog.database_signature(str(tmp_path / 'missing.db')) == (None, None)
+
+def test_field_fills_follow_the_field_map(scratch_database):
+    conn = sqlite3.connect(scratch_database)
+    with conn:
+        conn.executemany(
+            "INSERT INTO form_fields (form_id, field_name, field_type, page_index, annot_index, template_sha256) "
+            "VALUES ('FRM001', ?, ?, 0, ?, 'abc')",
+            [('FullName[0]', '/Tx', 0), ('Married[0]', '/Btn', 1)]
+        )
+        conn.executemany(
+            "INSERT INTO form_field_map (form_id, ques_id, field_name) VALUES ('FRM001', ?, ?)",
+            [('Q001', 'FullName[0]'), ('Q002', 'Married[0]')]
+        )
+    conn.close()
+    fills = catalog.get_catalog().get_field_fills('FRM001', {'form_id': 'FRM001', '1': 'Jane Doe', '2': 'Yes', '9': 'x'})
+    assert fills == [('abc', 0, 0, '/Tx', 'Jane Doe'), ('abc', 0, 1, '/Btn', 'Yes')]
+    assert catalog.get_catalog().get_field_fills('FRM002', {'1': 'Jane Doe'}) == []
+
+def test_missing_question_texts_are_read_in_one_query(scratch_database, monkeypatch):
+    import db
+
+    monkeypatch.setattr(catalog, 'CATALOG_CHECK_INTERVAL', 3600)
+    catalog.get_catalog()
+    # Added behind the loaded catalog's back, so only the database knows these questions
+    conn = sqlite3.connect(scratch_database)
+    with conn:
+        conn.executemany(
+            "INSERT INTO input_ques (ques_id, ques_text, placeholder, category_id) "
+            "SELECT ?, ?, '', category_id FROM input_ques WHERE ques_id = 'Q001'",
+            [('Q101', 'Spouse name'), ('Q102', 'Spouse address')]
+        )
+    conn.close()
+
+    statements = []
+    conn = db.connect()
+    conn.set_trace_callback(statements.append)
+    try:
+        answers = catalog.resolve_form_answers(
+            {'form_id': 'FRM001', '102': 'b', '1': 'Jane', '101': 'a', '103': 'c', 'notes': 'x'}, lambda: conn
+        )
+    finally:
+        conn.close()
+    assert answers == [
+        ('Spouse address', 'b'),
+        (catalog.get_catalog().get_question_texts(['Q001'])['Q001'], 'Jane'),
+        ('Spouse name', 'a'),
+        ('Field 103', 'c'),
+    ]
+    assert statements == ["SELECT ques_id, ques_text FROM input_ques WHERE ques_id IN ('Q101', 'Q102', 'Q103');"]
@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+from flask import Flask
+
+import db
+
+@pytest.fixture
+def app(scratch_database):
+    app = Flask(__name__)
+    db.init_app(app)
+    return app
+
+def test_connections_are_tuned(scratch_database):
+    conn = db.connect()
+    try:
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+        assert conn.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+        assert conn.execute('PRAGMA temp_store').fetchone()[0] == 2  # MEMORY
+        assert conn.execute('PRAGMA cache_size').fetchone()[0] == db.CONNECTION_PRAGMAS['cache_size']
+        assert conn.execute('PRAGMA mmap_size').fetchone()[0] == db.CONNECTION_PRAGMAS['mmap_size']
+        assert isinstance(conn.execute('SELECT service_id FROM services').fetchone(), sqlite3.Row)
+    finally:
+        conn.close()
+
+def test_init_app_enables_wal(app, scratch_database):
+    conn = sqlite3.connect(scratch_database)
+    try:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    finally:
+        conn.close()
+
+def test_one_connection_per_request_closed_at_teardown(app, monkeypatch):
+    opened = []
+    connect = db.connect
+    monkeypatch.setattr(db, 'connect', lambda *args: opened.append(connect(*args)) or opened[-1])
+
+    with app.app_context():
+        assert db.get_db_connection() is db.get_db_connection()
+        db.get_db_connection().execute('SELECT 1')
+    with app.app_context():
+        db.get_db_connection()
+    assert len(opened) == 2
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+def test_requests_without_queries_open_no_connection(app, monkeypatch):
+    monkeypatch.setattr(db, 'connect', lambda *args: pytest.fail('opened a connection'))
+    with app.app_context():
+        pass
@@ -0,0 +1,121 @@
+import hashlib
+import io
+
+import pytest
+
+import documents
+from documents import FormDocument, ParsedTemplate, Renderer, get_parsed_template, _qualified_field_name, content_disposition, extract_form_fields, register_renderer, render, render_chunks
+from model.cache import LRUCache
+
+def filled_values(content):
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(content))
+    values = {}
+    for annot in reader.pages[0]['/Annots']:
+        annot = annot.get_object()
+        field = annot if '/T' in annot else annot['/Parent'].get_object()
+        values[_qualified_field_name(annot)] = field.get('/V')
+    return reader, values
+
+def test_extract_form_fields(acroform_pdf):
+    assert extract_form_fields(acroform_pdf) == [
+        {'field_name': 'applicant.name', 'field_type': '/Tx', 'page_index': 0, 'annot_index': 0},
+        {'field_name': 'agree', 'field_type': '/Btn', 'page_index': 0, 'annot_index': 1},
+        {'field_name': 'signature', 'field_type': '/Tx', 'page_index': 0, 'annot_index': 2},
+    ]
+
+def test_pdf_fills_indexed_fields(acroform_pdf):
+    template = ParsedTemplate(acroform_pdf)
+    fills = [
+        (template.content_hash, 0, 0, '/Tx', 'Jane Doe'),
+        (template.content_hash, 0, 1, '/Btn', 'Yes'),
+        (template.content_hash, 0, 2, '/Tx', 'J. Doe'),
+    ]
+    document = FormDocument('Petition', 'https://example.org/petition.pdf', [('Name', 'Jane Doe')], fills)
+    reader, values = filled_values(render(document, 'pdf', template=template).getvalue())
+    assert values == {'applicant.name': 'Jane Doe', 'agree': '/Yes', 'signature': 'J. Doe'}
+    assert reader.trailer['/Root']['/AcroForm']['/NeedAppearances']
+    # The template pages plus a page listing the answers
+    assert len(reader.pages) == 2
+
+def test_pdf_skips_fills_indexed_against_another_template(acroform_pdf):
+    template = ParsedTemplate(acroform_pdf)
+    document = FormDocument('Petition', 'https://example.org/petition.pdf', [], [('0' * 64, 0, 0, '/Tx', 'Jane Doe')])
+    _, values = filled_values(render(document, 'pdf', template=template).getvalue())
+    assert values['applicant.name'] is None
+
+@pytest.mark.parametrize('name, fallback, encoded', [
+    ('Simple Will.docx', 'Simple Will.docx', 'Simple%20Will.docx'),
+    ('Petición "A"_filled.pdf', 'Petici_n _A__filled.pdf', 'Petici%C3%B3n%20%22A%22_filled.pdf'),
+])
+def test_content_disposition_is_latin1_safe(name, fallback, encoded):
+    value = content_disposition(name)
+    assert value == f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{encoded}"
+    value.encode('latin-1')
+
+def test_templates_are_parsed_once_per_content(acroform_pdf, monkeypatch):
+    monkeypatch.setattr(documents, 'parsed_templates', LRUCache(maxsize=8))
+    template = get_parsed_template('https://example.org/a.pdf', acroform_pdf)
+    assert get_parsed_template('https://example.org/a.pdf', acroform_pdf, template.content_hash) is template
+    # New content behind the same link is parsed again
+    changed = acroform_pdf + b'\n'
+    assert get_parsed_template('https://example.org/a.pdf', changed) is not template
+
+def test_parsed_templates_are_evicted_by_size(acroform_pdf, monkeypatch):
+    size = len(acroform_pdf)
+    monkeypatch.setattr(documents, 'parsed_templates', LRUCache(
+        maxsize=8, max_weight=2 * size, weigh=lambda template: template.size))
+    first = get_parsed_template('https://example.org/1.pdf', acroform_pdf)
+    get_parsed_template('https://example.org/2.pdf', acroform_pdf)
+    assert get_parsed_template('https://example.org/1.pdf', acroform_pdf) is first
+    # A third template goes over the byte budget and pushes out the least recently used one
+    get_parsed_template('https://example.org/3.pdf', acroform_pdf)
+    assert len(documents.parsed_templates) == 2
+    assert get_parsed_template('https://example.org/1.pdf', acroform_pdf) is first
+    assert documents.parsed_templates.get(('https://example.org/2.pdf', first.content_hash)) is None
+
+    # A template bigger than the whole budget is used but not kept
+    huge = acroform_pdf + b' ' * (2 * size)
+    assert get_parsed_template('https://example.org/huge.pdf', huge).size == len(huge)
+    assert documents.parsed_templates.get(('https://example.org/huge.pdf', hashlib.sha256(huge).hexdigest())) is None
+
+LETTER = FormDocument('Letter', 'https://example.org/letter.pdf', [(f'Question {i}', f'Answer {i}') for i in range(200)])
+
+def test_html_chunks_join_up_to_the_rendered_preview():
+    chunks = list(render_chunks(LETTER, 'html', chunk_size=1024))
+    assert len(chunks) > 1
+    # Small pieces are grouped so every chunk but the last is at least chunk_size
+    assert all(len(chunk) >= 1024 for chunk in chunks[:-1])
+    assert b''.join(chunks) == render(LETTER, 'html').getvalue()
+
+def test_docx_and_pdf_chunks_are_slices_of_one_document(acroform_pdf):
+    import docx
+    from PyPDF2 import PdfReader
+
+    chunks = list(render_chunks(LETTER, 'docx', chunk_size=4096))
+    assert len(chunks) > 1
+    assert all(len(chunk) == 4096 for chunk in chunks[:-1])
+    text = [paragraph.text for paragraph in docx.Document(io.BytesIO(b''.join(chunks))).paragraphs]
+    assert 'Question 199: Answer 199' in text
+
+    chunks = list(render_chunks(LETTER, 'pdf', chunk_size=4096, template=acroform_pdf))
+    assert all(len(chunk) == 4096 for chunk in chunks[:-1])
+    # The template page, then the pages listing the answers
+    assert len(PdfReader(io.BytesIO(b''.join(chunks))).pages) > 1
+
+def test_registered_renderers_are_chunked_too(monkeypatch):
+    class TextRenderer(Renderer):
+        kind = 'txt'
+
+        def render(self, document, output, **options):
+            for question_text, value in document.answers:
+                output.write(f'{question_text}: {value}\n'.encode('utf-8'))
+
+    monkeypatch.setitem(documents.RENDERERS, 'txt', None)
+    register_renderer(TextRenderer())
+    chunks = list(render_chunks(LETTER, 'txt', chunk_size=100))
+    assert all(len(chunk) == 100 for chunk in chunks[:-1])
+    assert b''.join(chunks) == render(LETTER, 'txt').getvalue()
+    with pytest.raises(KeyError):
+        render_chunks(LETTER, 'odt')
@@ -0,0 +1,115 @@
+import functools
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+import catalog
+import import_catalog
+
+def write_catalog(directory, forms=None):
+    directory.mkdir()
+    (directory / 'services.csv').write_text(
+        'service_id,service_name,service_description\n'
+        'SVC100,Bankruptcy,Chapter 7 and chapter 13 filings\n'
+    )
+    forms = forms or [{'form_id': 'FRM100', 'form_name': 'Voluntary Petition', 'form_description': '',
+                       'form_link': 'https://example.org/b101.pdf', 'service_id': 'SVC100'}]
+    (directory / 'forms.jsonl').write_text(''.join(json.dumps(form) + '\n' for form in forms))
+    return str(directory)
+
+def run_import(monkeypatch, source, target, *options):
+    monkeypatch.setattr(sys, 'argv', ['import_catalog.py', source, '-o', target, *options])
+    return import_catalog.main()
+
+def rows(path, query):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(query).fetchall()
+    finally:
+        conn.close()
+
+def test_import_replaces_the_database(scratch_database, tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, 'CATALOG_CHECK_INTERVAL', 0)
+    old_catalog = catalog.get_catalog()
+    reader = sqlite3.connect(scratch_database)
+    reader.execute('BEGIN')
+    assert reader.execute('SELECT count(*) FROM forms').fetchone()[0] == 4
+
+    assert run_import(monkeypatch, write_catalog(tmp_path / 'source'), scratch_database) == 0
+
+    # Readers that started before the swap keep the old database
+    assert reader.execute('SELECT count(*) FROM forms').fetchone()[0] == 4
+    reader.close()
+    assert rows(scratch_database, 'SELECT form_id FROM forms') == [('FRM100',)]
+    assert rows(scratch_database, 'PRAGMA journal_mode') == [('wal',)]
+    assert [name for name in os.listdir(tmp_path) if name.startswith('.import-')] == []
+    assert catalog.get_catalog() is not old_catalog
+    assert list(catalog.get_catalog().forms_by_id) == ['FRM100']
+
+def test_import_keeps_the_sample_data_on_request(scratch_database, tmp_path, monkeypatch):
+    assert run_import(monkeypatch, write_catalog(tmp_path / 'source'), scratch_database, '--sample-data') == 0
+    assert len(rows(scratch_database, 'SELECT form_id FROM forms')) == 5
+    assert rows(scratch_database, "SELECT count(*) FROM kb_search WHERE kb_search MATCH 'divorce'")[0][0] > 0
+
+def test_failed_import_leaves_the_database_untouched(scratch_database, tmp_path, monkeypatch):
+    with open(scratch_database, 'rb') as f:
+        before = f.read()
+    dangling = [{'form_id': 'FRM100', 'form_name': 'Orphan', 'form_description': '',
+                 'form_link': 'https://example.org/x.pdf', 'service_id': 'SVC999'}]
+    assert run_import(monkeypatch, write_catalog(tmp_path / 'source', dangling), scratch_database) == 1
+    with open(scratch_database, 'rb') as f:
+        assert f.read() == before
+    assert [name for name in os.listdir(tmp_path) if name.startswith('.import-')] == []
+
+def test_load_table_inserts_in_batches(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'batches.db'))
+    conn.executescript(import_catalog.create_tables_script)
+    services = [{'service_id': f'SVC{i:03d}', 'service_name': f'Service {i}', 'service_description': ''}
+                for i in range(5)]
+    assert import_catalog.load_table(conn, 'services', iter(services), batch_size=2) == 5
+    assert conn.execute('SELECT count(*) FROM services WHERE service_description IS NULL').fetchone()[0] == 5
+    with pytest.raises(ValueError):
+        import_catalog.load_table(conn, 'services', [{'service_id': 'SVC100', 'colour': 'red'}])
+    conn.close()
+
+def test_swap_is_abandoned_while_readers_hold_the_log(scratch_database, tmp_path, monkeypatch):
+    monkeypatch.setattr(import_catalog, 'checkpoint_database',
+                        functools.partial(import_catalog.checkpoint_database, attempts=2, wait=0.01))
+    writer = sqlite3.connect(scratch_database)
+    writer.execute('PRAGMA journal_mode = WAL')
+    writer.execute('PRAGMA wal_autocheckpoint = 0')
+    with writer:
+        writer.execute("UPDATE services SET service_name = 'Family law' WHERE service_id = 'SVC001'")
+    # A reader whose snapshot includes the logged write keeps the log from being truncated
+    reader = sqlite3.connect(scratch_database)
+    reader.execute('BEGIN')
+    reader.execute('SELECT count(*) FROM services').fetchone()
+    try:
+        assert run_import(monkeypatch, write_catalog(tmp_path / 'source'), scratch_database) == 1
+    finally:
+        reader.close()
+        writer.close()
+    assert rows(scratch_database, "SELECT service_name FROM services WHERE service_id = 'SVC001'") == [('Family law',)]
+    assert [name for name in os.listdir(tmp_path) if name.startswith('.import-')] == []
+
+def test_checkpoint_retries_until_the_log_is_free(tmp_path, monkeypatch):
+    results = iter([(1, 5, 5), (1, 5, 5), (0, 0, 0)])
+
+    class Connection:
+        def execute(self, query):
+            assert query == 'PRAGMA wal_checkpoint(TRUNCATE)'
+            return self
+
+        def fetchone(self):
+            return next(results)
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(import_catalog.sqlite3, 'connect', lambda *args, **kwargs: Connection())
+    import_catalog.checkpoint_database(str(tmp_path / 'x.db'), attempts=3)
+    with pytest.raises(StopIteration):
+        next(results)
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from check_import_time import IMPORT_BUDGET_MS, LAZY_MODULES, eager_imports, measure, total_ms
+
+@pytest.fixture(scope='module')
+def app_imports():
+    return measure('app')
+
+def test_import_app_is_within_budget(app_imports):
+    assert total_ms(app_imports, 'app') <= IMPORT_BUDGET_MS
+
+def test_import_app_defers_heavy_libraries(app_imports):
+    assert eager_imports(app_imports) == []
+
+def test_heavy_libraries_are_checked():
+    for module in ('sklearn', 'PyPDF2', 'pdfrw', 'docx'):
+        assert module in LAZY_MODULES
+    assert eager_imports([(1, 'sklearn.feature_extraction.text'), (1, 'docx')]) == ['sklearn', 'docx']
@@ -0,0 +1,66 @@
+import hashlib
+
+import pytest
+
+import db
+import index_form_fields
+
+class StubStore:
+    def __init__(self, content):
+        self.content = content
+
+    def fetch(self, url):
+        return self.content
+
+def field(name):
+    return {'field_name': name, 'field_type': '/Tx', 'page_index': 0, 'annot_index': 0}
+
+def test_auto_map_pairs_questions_with_matching_field_names():
+    questions = [('Q001', 'Full Name'), ('Q004', 'Spouse Name'), ('Q002', 'Date of Birth')]
+    fields = [field('form1.PetitionerFullName[0]'), field('form1.SpouseName[0]'), field('form1.Signature[0]')]
+    assert index_form_fields.auto_map(questions, fields) == [
+        ('Q001', 'form1.PetitionerFullName[0]'), ('Q004', 'form1.SpouseName[0]')]
+
+def test_auto_map_uses_each_field_once_and_respects_the_threshold():
+    fields = [field('applicant.name')]
+    assert index_form_fields.auto_map([('Q001', 'Full Name'), ('Q004', 'Spouse Name')], fields) == [('Q001', 'applicant.name')]
+    assert index_form_fields.auto_map([('Q001', 'Full Name')], fields, threshold=0.6) == []
+    assert index_form_fields.auto_map([('Q009', '')], fields) == []
+
+@pytest.fixture
+def conn(scratch_database):
+    conn = db.connect()
+    yield conn
+    conn.close()
+
+def fields_and_mappings(conn):
+    fields = conn.execute(
+        "SELECT field_name, field_type, page_index, annot_index, template_sha256 FROM form_fields "
+        "WHERE form_id = 'FRM001' ORDER BY annot_index").fetchall()
+    mappings = conn.execute(
+        "SELECT ques_id, field_name FROM form_field_map WHERE form_id = 'FRM001' ORDER BY ques_id").fetchall()
+    return [tuple(row) for row in fields], [tuple(row) for row in mappings]
+
+def test_index_form_records_fields_and_maps_questions(conn, acroform_pdf):
+    assert index_form_fields.index_form(conn, 'FRM001', 'https://example.org/fl100.pdf', StubStore(acroform_pdf)) == (3, 1)
+    sha256 = hashlib.sha256(acroform_pdf).hexdigest()
+    fields, mappings = fields_and_mappings(conn)
+    assert fields == [
+        ('applicant.name', '/Tx', 0, 0, sha256), ('agree', '/Btn', 0, 1, sha256), ('signature', '/Tx', 0, 2, sha256)]
+    assert mappings == [('Q001', 'applicant.name')]
+
+def test_reindexing_keeps_hand_mappings_to_remaining_fields(conn, acroform_pdf):
+    with conn:
+        conn.executemany(
+            "INSERT INTO form_field_map (form_id, ques_id, field_name) VALUES ('FRM001', ?, ?)",
+            [('Q002', 'signature'), ('Q003', 'removed.field')]
+        )
+    assert index_form_fields.index_form(conn, 'FRM001', 'https://example.org/fl100.pdf', StubStore(acroform_pdf)) == (3, 1)
+    assert fields_and_mappings(conn)[1] == [('Q001', 'applicant.name'), ('Q002', 'signature')]
+    # Already mapped questions are not mapped again
+    assert index_form_fields.index_form(conn, 'FRM001', 'https://example.org/fl100.pdf', StubStore(acroform_pdf)) == (3, 0)
+
+def test_index_form_without_auto_mapping(conn, acroform_pdf):
+    store = StubStore(acroform_pdf)
+    assert index_form_fields.index_form(conn, 'FRM001', 'https://example.org/fl100.pdf', store, map_questions=False) == (3, 0)
+    assert fields_and_mappings(conn)[1] == []
@@ -0,0 +1,196 @@
+import io
+import json
+import sqlite3
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import app as app_module
+import jobs
+import template_store
+from artifacts import artifact_cache
+from documents import FormDocument
+from template_store import TemplateFetchError
+
+LETTER = FormDocument('Letter', 'https://example.org/letter.docx', [('Your name', 'Jane Doe')])
+PDF_FORM = FormDocument('Petition', 'https://example.org/petition.pdf', [('Your name', 'Jane Doe')])
+
+class InlinePool:
+    """Stands in for the process pool and runs each job in the calling thread"""
+
+    def __init__(self, max_workers=None, mp_context=None):
+        self.submitted = 0
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+class StalledPool(InlinePool):
+    """A pool whose jobs never finish"""
+
+    def submit(self, fn, *args):
+        return Future()
+
+class BrokenPool(InlinePool):
+    def submit(self, fn, *args):
+        raise BrokenProcessPool("A worker died")
+
+class FailingStore:
+    def __init__(self, error):
+        self.error = error
+
+    def fetch_with_hash(self, url):
+        raise self.error
+
+def test_job_runs_in_a_worker_process():
+    queue = jobs.JobQueue(workers=1, start_method='fork')
+    finished = []
+    try:
+        job = queue.submit('a1', LETTER, done=finished.append)
+        job.future.result(timeout=60)
+        deadline = time.time() + 10
+        while job.finished_at is None and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        queue.shutdown()
+    assert job.status == 'done'
+    assert job.kind == 'docx'
+    assert job.content[:2] == b'PK'
+    assert finished == [job]
+    assert queue.get(job.job_id) is job
+
+def test_failed_job_records_the_error(monkeypatch):
+    monkeypatch.setattr(jobs, 'ProcessPoolExecutor', InlinePool)
+    monkeypatch.setattr(jobs, 'render_final_document', lambda document: 1 / 0)
+    finished = []
+    job = jobs.JobQueue().submit('a1', LETTER, done=finished.append)
+    assert job.status == 'failed'
+    assert job.error == 'division by zero'
+    assert job.finished_at is not None
+    assert finished == []
+
+def test_submit_restarts_a_broken_pool(monkeypatch):
+    monkeypatch.setattr(jobs, 'ProcessPoolExecutor', InlinePool)
+    queue = jobs.JobQueue()
+    queue._executor = BrokenPool()
+    job = queue.submit('a1', LETTER)
+    assert job.status == 'done'
+    assert isinstance(queue._executor, InlinePool)
+    assert queue._executor.submitted == 1
+
+def test_full_queue_refuses_jobs(monkeypatch):
+    monkeypatch.setattr(jobs, 'ProcessPoolExecutor', StalledPool)
+    queue = jobs.JobQueue(limit=2)
+    queue.submit('a1', LETTER)
+    queue.submit('a2', LETTER)
+    with pytest.raises(jobs.JobQueueFull):
+        queue.submit('a3', LETTER)
+    # Finished jobs do not count against the limit
+    queue.add_finished('a4', 'Letter', 'docx', b'PK')
+
+def test_finished_jobs_expire():
+    queue = jobs.JobQueue(result_ttl=-1)
+    job = queue.add_finished('a1', 'Letter', 'docx', b'PK')
+    assert job.status == 'done'
+    assert queue.get(job.job_id) is None
+
+def test_reset_after_fork_forgets_the_parent_pool(monkeypatch):
+    monkeypatch.setattr(jobs, 'ProcessPoolExecutor', InlinePool)
+    queue = jobs.JobQueue()
+    job = queue.submit('a1', LETTER)
+    queue._reset_after_fork()
+    assert queue._executor is None
+    assert queue.get(job.job_id) is None
+
+@pytest.mark.parametrize('error, expected', [
+    (TemplateFetchError('unreachable'), 'docx'),
+    (ValueError('not a PDF'), 'docx'),
+    (TemplateFetchError('Not Found', status_code=404), None),
+])
+def test_render_final_document_falls_back_like_final_form(monkeypatch, error, expected):
+    monkeypatch.setattr(template_store, 'get_template_store', lambda: FailingStore(error))
+    if expected is None:
+        with pytest.raises(TemplateFetchError):
+            jobs.render_final_document(PDF_FORM)
+    else:
+        kind, content = jobs.render_final_document(PDF_FORM)
+        assert kind == expected
+        assert content[:2] == b'PK'
+
+@pytest.mark.parametrize('error, status', [(TemplateFetchError('unreachable'), 200), (TemplateFetchError('Not Found', status_code=404), 500)])
+def test_final_form_falls_back_like_the_jobs(scratch_database, monkeypatch, error, status):
+    monkeypatch.setattr(app_module, 'get_template_store', lambda: FailingStore(error))
+    artifact_cache.clear()
+    client = app_module.create_app().test_client()
+    response = client.post('/api/final-form', data={'formData': json.dumps({'form_id': 'FRM001', '1': 'Jane Doe'})})
+    assert response.status_code == status
+    if status == 200:
+        assert response.mimetype.endswith('wordprocessingml.document')
+
+@pytest.fixture
+def client(scratch_database, monkeypatch):
+    conn = sqlite3.connect(scratch_database)
+    with conn:
+        conn.execute(
+            "INSERT INTO forms (form_id, form_name, form_description, form_link, service_id) "
+            "VALUES ('FRM900', 'Letter', '', 'https://example.org/letter.docx', 'SVC001')"
+        )
+    conn.close()
+    artifact_cache.clear()
+    monkeypatch.setattr(jobs, 'ProcessPoolExecutor', InlinePool)
+    monkeypatch.setattr(app_module, 'job_queue', jobs.JobQueue())
+    return app_module.create_app().test_client()
+
+def test_job_routes(client):
+    import docx
+
+    response = client.post('/api/final-form/jobs', json={'form_id': 'FRM900', '1': 'Jane Doe'})
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job['status_url'] == f"/api/final-form/jobs/{job['job_id']}"
+
+    status = client.get(job['status_url']).get_json()
+    assert status['status'] == 'done'
+    assert status['artifact_id'] == job['artifact_id']
+
+    result = client.get(job['result_url'])
+    assert result.status_code == 200
+    assert 'filename="Letter.docx"' in result.headers['Content-Disposition']
+    assert 'Jane Doe' in '\n'.join(p.text for p in docx.Document(io.BytesIO(result.data)).paragraphs)
+
+    # The rendered document is kept with the artifact, so asking again needs no worker
+    again = client.post('/api/final-form/jobs', json={'artifact_id': job['artifact_id']}).get_json()
+    assert app_module.job_queue._executor.submitted == 1
+    assert client.get(again['result_url']).data == result.data
+
+def test_job_routes_report_unknown_pending_and_failed_jobs(client, monkeypatch):
+    assert client.get('/api/final-form/jobs/missing').status_code == 404
+    assert client.get('/api/final-form/jobs/missing/result').status_code == 404
+    assert client.post('/api/final-form/jobs', json={'artifact_id': 'missing'}).status_code == 404
+
+    app_module.job_queue._executor = StalledPool()
+    pending = client.post('/api/final-form/jobs', json={'form_id': 'FRM900', '1': 'A'}).get_json()
+    assert client.get(pending['result_url']).status_code == 409
+
+    app_module.job_queue._executor = InlinePool()
+    monkeypatch.setattr(jobs, 'render_final_document', lambda document: 1 / 0)
+    failed = client.post('/api/final-form/jobs', json={'form_id': 'FRM900', '1': 'B'}).get_json()
+    response = client.get(failed['result_url'])
+    assert response.status_code == 500
+    assert 'division by zero' in response.get_json()['error']
+
+def test_job_route_answers_503_when_the_queue_is_full(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'job_queue', jobs.JobQueue(limit=0))
+    response = client.post('/api/final-form/jobs', json={'form_id': 'FRM900', '1': 'Jane Doe'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
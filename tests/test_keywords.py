@@ -0,0 +1,51 @@
+import re
+
+import pytest
+
+from model.keywords import KeywordAutomaton
+from model.knowledge_base import knowledge_base
+
+DOCUMENTS = [
+    {'keywords': ['will', 'estate planning']},
+    {'keywords': ['estate', 'real estate', 'lease']},
+    {'keywords': ['will']},
+]
+
+@pytest.fixture
+def automaton():
+    return KeywordAutomaton(DOCUMENTS)
+
+def test_find_reports_whole_words_only(automaton):
+    assert automaton.find('willing to pay') == []
+    assert automaton.find('the estates') == []
+    assert automaton.find('unwilling') == []
+    assert automaton.find('my will') == [(3, 7, 'will')]
+
+def test_find_reports_overlapping_keywords(automaton):
+    assert sorted(automaton.find('real estate planning')) == [
+        (0, 11, 'real estate'), (5, 11, 'estate'), (5, 20, 'estate planning')]
+
+def test_find_treats_underscores_as_word_characters(automaton):
+    assert automaton.find('will_') == []
+    assert automaton.find('lease, will') == [(0, 5, 'lease'), (7, 11, 'will')]
+
+def test_best_match_follows_knowledge_base_order(automaton):
+    assert automaton.best_match('a lease and a will') == 0
+    assert automaton.best_match('a lease') == 1
+    assert automaton.best_match('nothing here') is None
+    assert automaton.matching_documents('a lease and a will') == {0, 1, 2}
+
+@pytest.mark.parametrize('text', [
+    'i need a will and a power of attorney',
+    'llc formation for my startup business',
+    'divorce and child custody',
+    'commercial lease agreement for real estate',
+    'trademarks patents and copyright',
+])
+def test_find_agrees_with_word_boundary_regex(text):
+    automaton = KeywordAutomaton(knowledge_base)
+    expected = {
+        keyword.lower() for item in knowledge_base for keyword in item['keywords']
+        if re.search(r'\b' + re.escape(keyword.lower()) + r'\b', text)
+    }
+    assert {keyword for _, _, keyword in automaton.find(text)} == expected
@@ -0,0 +1,105 @@
+import logging
+import logging.handlers
+import queue
+
+import pytest
+from flask import Flask
+
+import logging_config
+from logging_config import DroppingQueueHandler, Payload, RouteSamplingFilter, parse_sample_rates
+
+def record(level=logging.DEBUG, message='message'):
+    return logging.LogRecord('test', level, __file__, 1, message, None, None)
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+@pytest.mark.parametrize('value, expected', [
+    ('short', 'short'),
+    ('x' * 12, 'xxxxxxxxxx... (12 chars)'),
+    ({'a': 'é'}, '{"a": "é"}'),
+    (['abcdefghijkl'], '["abcdefgh... (16 chars)'),
+])
+def test_payload_truncates_long_values(value, expected):
+    assert str(Payload(value, max_length=10)) == expected
+
+def test_payload_is_only_serialized_when_emitted():
+    class Unformattable:
+        def __repr__(self):
+            raise AssertionError('serialized a payload that was filtered out')
+
+    logger = logging.getLogger('test.payload')
+    logger.setLevel(logging.INFO)
+    logger.debug('%s', Payload(Unformattable()))
+
+def test_parse_sample_rates():
+    assert parse_sample_rates('/api/chat=0.05, *=2,bad,/api/forms=-1') == {
+        '/api/chat': 0.05, '*': 1.0, '/api/forms': 0.0}
+    assert parse_sample_rates(None) == {}
+
+@pytest.fixture
+def flask_app():
+    app = Flask(__name__)
+    app.add_url_rule('/api/forms/<form_id>', 'form', lambda form_id: '')
+    return app
+
+def test_sampling_filter_drops_unsampled_routes(flask_app):
+    sampling = RouteSamplingFilter({'/api/forms/<form_id>': 0.0})
+    with flask_app.test_request_context('/api/forms/FRM001'):
+        debug = record()
+        assert not sampling.filter(debug)
+        assert debug.route == '/api/forms/<form_id>'
+        assert sampling.filter(record(logging.WARNING))
+    with flask_app.test_request_context('/api/other'):
+        assert sampling.filter(record())
+
+def test_sampling_decision_holds_for_the_whole_request(flask_app, monkeypatch):
+    sampling = RouteSamplingFilter({'*': 0.5})
+    draws = iter([0.1, 0.9])
+    monkeypatch.setattr(logging_config.random, 'random', lambda: next(draws))
+    with flask_app.test_request_context('/api/forms/FRM001'):
+        assert all(sampling.filter(record()) for _ in range(3))
+    with flask_app.test_request_context('/api/forms/FRM001'):
+        assert not any(sampling.filter(record()) for _ in range(3))
+
+def test_sampling_filter_passes_records_outside_requests():
+    outside = record()
+    assert RouteSamplingFilter({'*': 0.0}).filter(outside)
+    assert outside.route is None
+
+def test_full_queue_drops_and_counts_records():
+    handler = DroppingQueueHandler(queue.Queue(2))
+    for i in range(5):
+        handler.handle(record(message=str(i)))
+    assert handler.dropped == 3
+    assert [handler.queue.get_nowait().getMessage() for _ in range(2)] == ['0', '1']
+
+def test_listener_restarts_after_fork(monkeypatch):
+    old_queue = queue.Queue(7)
+    output = ListHandler()
+    queue_handler = DroppingQueueHandler(old_queue)
+    listener = logging.handlers.QueueListener(old_queue, output)
+    listener.start()
+    monkeypatch.setattr(logging_config, '_queue_handler', queue_handler)
+    monkeypatch.setattr(logging_config, '_listener', listener)
+    listener.stop()
+
+    logging_config._restart_after_fork()
+    try:
+        assert logging_config._listener is not listener
+        assert queue_handler.queue is not old_queue
+        assert queue_handler.queue.maxsize == 7
+        queue_handler.handle(record(logging.INFO, 'after fork'))
+    finally:
+        logging_config.stop_logging()
+    assert [entry.getMessage() for entry in output.records] == ['after fork']
+
+def test_restart_after_fork_without_logging_configured(monkeypatch):
+    monkeypatch.setattr(logging_config, '_listener', None)
+    logging_config._restart_after_fork()
+    assert logging_config._listener is None
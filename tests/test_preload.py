@@ -0,0 +1,89 @@
+import gc
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+import pytest
+
+import app as app_module
+import jobs
+import logging_config
+import template_store
+
+@pytest.fixture
+def unfreeze():
+    yield
+    gc.unfreeze()
+
+def test_preload_warms_up_once_and_freezes_the_gc(scratch_database, monkeypatch, unfreeze):
+    calls = []
+    warm_up = app_module.warm_up
+    monkeypatch.setattr(app_module, 'warm_up', lambda: calls.append(1) or warm_up())
+    monkeypatch.setattr(app_module, 'APP_WARMUP', True)
+    gc.unfreeze()
+
+    app_module.create_app(preload=True)
+    assert calls == [1]
+    assert gc.get_freeze_count() > 0
+    # Preloading replaces the background warm-up thread
+    assert not [thread for thread in threading.enumerate() if thread.name == 'warm-up']
+
+    from model import similarity
+    assert similarity._index is not None and similarity._keyword_matcher is not None
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_fork_resets_per_process_state(scratch_database, monkeypatch):
+    app = app_module.create_app(warmup=False)
+    log_queue = queue.Queue(5)
+    queue_handler = logging_config.DroppingQueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, logging.NullHandler())
+    listener.start()
+    monkeypatch.setattr(logging_config, '_queue_handler', queue_handler)
+    monkeypatch.setattr(logging_config, '_listener', listener)
+    monkeypatch.setattr(jobs.job_queue, '_executor', object())
+    monkeypatch.setattr(jobs.job_queue, '_jobs', {'parent': object()})
+    monkeypatch.setattr(template_store, '_session', object())
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Child: report what the fork hooks left and exit without running pytest's teardown
+        try:
+            with app.app_context():
+                import db
+                conn = db.get_db_connection()
+                services = conn.execute("SELECT COUNT(*) FROM services").fetchone()[0]
+            try:
+                conn.execute("SELECT 1")
+                closed = False
+            except Exception:
+                closed = True
+            state = {
+                'executor': jobs.job_queue._executor is None,
+                'jobs': jobs.job_queue._jobs == {},
+                'session': template_store._session is None,
+                'log_queue': queue_handler.queue is not log_queue and queue_handler.queue.maxsize == 5,
+                'listener': logging_config._listener is not listener,
+                'services': services,
+                'closed': closed,
+            }
+            logging_config.stop_logging()
+            os.write(write_end, json.dumps(state).encode('utf-8'))
+        finally:
+            os._exit(0)
+
+    os.close(write_end)
+    with os.fdopen(read_end, 'rb') as f:
+        state = json.loads(f.read() or b'{}')
+    os.waitpid(pid, 0)
+    listener.stop()
+    assert state == {
+        'executor': True, 'jobs': True, 'session': True, 'log_queue': True,
+        'listener': True, 'services': 4, 'closed': True,
+    }
+    # The parent keeps its own
+    assert jobs.job_queue._jobs and template_store._session is not None
+    assert queue_handler.queue is log_queue
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from check_query_plans import CHECKS, build_database, full_scans
+
+SCANNED_TABLES = ('forms', 'form_queries', 'input_ques')
+
+@pytest.fixture(scope='module')
+def catalog_database(tmp_path_factory):
+    conn = build_database(str(tmp_path_factory.mktemp('plans') / 'plans.db'), 5000, 12)
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize('name, query, params', CHECKS, ids=[check[0] for check in CHECKS])
+def test_catalog_query_uses_indexes(catalog_database, name, query, params):
+    scans, plan = full_scans(catalog_database, query, params)
+    assert scans == [], [row[3] for row in plan]
+    for row in plan:
+        assert not any(row[3].startswith(f"SCAN {table}") for table in SCANNED_TABLES), row[3]
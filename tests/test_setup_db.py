@@ -0,0 +1,36 @@
+import os
+import shutil
+import sqlite3
+
+import init_db
+import setup_db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_search_index_is_defined_once():
+    with open(os.path.join(ROOT, 'schema.sql')) as f:
+        assert 'CREATE VIRTUAL TABLE' not in f.read()
+    assert 'CREATE VIRTUAL TABLE kb_search' in setup_db.create_search_index_script
+
+def test_init_db_builds_the_search_index(tmp_path, monkeypatch):
+    shutil.copy(os.path.join(ROOT, 'schema.sql'), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    assert init_db.init_database()
+    conn = sqlite3.connect('legal_assistant.db')
+    try:
+        assert conn.execute("SELECT count(*) FROM kb_search WHERE kb_search MATCH 'divorce'").fetchone()[0] > 0
+    finally:
+        conn.close()
+
+def test_init_db_works_without_fts5(tmp_path, monkeypatch):
+    # The same failure SQLite raises when it was built without FTS5
+    monkeypatch.setattr(setup_db, 'create_search_index_script', 'CREATE VIRTUAL TABLE kb_search USING nofts5(title);')
+    shutil.copy(os.path.join(ROOT, 'schema.sql'), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    assert init_db.init_database()
+    conn = sqlite3.connect('legal_assistant.db')
+    try:
+        assert conn.execute('SELECT count(*) FROM kb_documents').fetchone()[0] > 0
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'kb_search'").fetchall() == []
+    finally:
+        conn.close()
@@ -0,0 +1,248 @@
+import os
+import re
+import sqlite3
+
+import numpy as np
+import pytest
+
+import db
+from model import similarity
+from setup_db import fill_search_index_script
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(autouse=True)
+def knowledge_base(database):
+    similarity.get_knowledge_base()
+    similarity.response_cache.clear()
+    yield
+    similarity.response_cache.clear()
+
+def response_for(document_type):
+    for document in similarity.knowledge_base:
+        if document['document_type'] == document_type:
+            return document['response']
+    raise KeyError(document_type)
+
+def searched_types(query):
+    return [document_type for document_type, _ in
+            similarity.search_knowledge_base(similarity.preprocess_text(query))]
+
+@pytest.mark.parametrize('query', ['willing to pay', 'trusting my friend', 'the estates'])
+def test_search_does_not_match_word_stems(query):
+    assert searched_types(query) == []
+
+@pytest.mark.parametrize('query, document_type', [
+    ('I want to file a petition', 'divorce'),
+    ('LLC formation', 'business'),
+    ('durable authorization', 'power_of_attorney'),
+])
+def test_search_matches_whole_terms(query, document_type):
+    assert searched_types(query)[0] == document_type
+    assert similarity.get_document(query) == response_for(document_type)
+
+def test_search_drops_weak_matches():
+    scores = [score for _, score in similarity.search_knowledge_base('petition')]
+    assert scores and min(scores) >= similarity.KB_SEARCH_MIN_SCORE
+
+@pytest.mark.parametrize('query', [
+    'I want to file a petition',
+    'custody',
+    'estate',
+    'real estate lease',
+    'will and trust for my business',
+    'durable authorization',
+])
+def test_rank_documents_leads_with_the_chat_answer(query):
+    results = similarity.rank_documents(query, 5)
+    assert results[0]['response'] == similarity.get_document(query)
+
+def test_rank_documents_orders_stages():
+    results = similarity.rank_documents('estate', 5)
+    assert [(result['document_type'], result['match']) for result in results] == [
+        ('will', 'keyword'), ('real_estate', 'search')]
+    assert similarity.rank_documents('qwerty', 5) == []
+
+@pytest.mark.parametrize('scores, k, expected', [
+    ([1, 2, 2, 2, 0], 2, [1, 2]),
+    ([0, 0, 0, 0, 0, 0, 0, 0], 3, [0, 1, 2]),
+    ([-np.inf, 3, -np.inf, 3, 1], 4, [1, 3, 4, 0]),
+    ([0.5, 0.2], 5, [0, 1]),
+    ([0.5], 0, []),
+])
+def test_top_k_indices_breaks_ties_by_position(scores, k, expected):
+    assert similarity.top_k_indices(np.array(scores, dtype=float), k) == expected
+
+def test_top_k_indices_matches_a_full_sort():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        scores = rng.integers(0, 4, size=int(rng.integers(1, 40))).astype(float)
+        k = int(rng.integers(1, len(scores) + 1))
+        expected = sorted(range(len(scores)), key=lambda i: (-scores[i], i))[:k]
+        assert similarity.top_k_indices(scores, k) == expected
+
+def test_response_cache_uses_normalized_queries():
+    hits = similarity.response_cache.stats()['hits']
+    assert similarity.get_document('Divorce papers!') == similarity.get_document('divorce papers')
+    assert len(similarity.response_cache) == 1
+    assert similarity.response_cache.stats()['hits'] == hits + 1
+
+def reference_document(user_query):
+    """get_document before the prebuilt index: the keyword loop, then TF-IDF refitted per query"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    processed_query = similarity.preprocess_text(user_query)
+    for item in similarity.knowledge_base:
+        for keyword in item['keywords']:
+            # Whole words, as the keyword automaton matches them
+            if re.search(r'\b' + re.escape(keyword) + r'\b', processed_query):
+                return item['response']
+    corpus = [' '.join(item['keywords']) for item in similarity.knowledge_base] + [processed_query]
+    tfidf_matrix = TfidfVectorizer().fit_transform(corpus)
+    similarities = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1]).flatten()
+    best_match_index = similarities.argmax()
+    if similarities[best_match_index] > similarity.SIMILARITY_THRESHOLD:
+        return similarity.knowledge_base[best_match_index]['response']
+    return None
+
+@pytest.mark.parametrize('query', [
+    'I need a divorce',
+    'Who is the EXECUTOR of my estate?',
+    'my landlord wants to evict me',
+    'a healthcare proxy for my mother',
+    'child support payments',
+    'my child',
+    'durable authority',
+    'social benefits',
+    'green light',
+    'brand new creative ideas',
+    'name for my dog',
+    'hello there',
+    'qwerty',
+])
+def test_get_document_matches_the_original_answers(monkeypatch, query):
+    monkeypatch.setattr(similarity, '_search_available', False)
+    expected = reference_document(query)
+    response = similarity.get_document(query)
+    if expected is None:
+        assert response in similarity.default_responses
+    else:
+        assert response == expected
+
+def test_get_document_without_a_query():
+    assert similarity.get_document('') == similarity.get_document(None)
+    assert 'What type of legal matter' in similarity.get_document('')
+
+class FailingConnection:
+    def __init__(self, message):
+        self.message = message
+
+    def execute(self, *args):
+        raise sqlite3.OperationalError(self.message)
+
+def test_transient_search_errors_skip_only_the_query(monkeypatch):
+    monkeypatch.setattr(similarity, '_search_available', True)
+    assert similarity.search_knowledge_base('petition', conn=FailingConnection('database is locked')) is None
+    assert similarity._search_available
+    assert searched_types('petition') == ['divorce']
+
+def test_search_failures_are_logged_at_most_once_per_interval(monkeypatch, caplog):
+    monkeypatch.setattr(similarity, '_search_available', True)
+    monkeypatch.setattr(similarity, '_search_warned_at', float('-inf'))
+    monkeypatch.setattr(similarity, '_search_failures', 0)
+    locked = FailingConnection('database is locked')
+    with caplog.at_level('WARNING', logger='model.similarity'):
+        for _ in range(3):
+            similarity.search_knowledge_base('petition', conn=locked)
+        assert [record.getMessage() for record in caplog.records] == [
+            'Knowledge base search failed for 1 queries, using the in-memory index for them: database is locked']
+
+        # The next warning after the interval counts the failures it held back
+        monkeypatch.setattr(similarity, '_search_warned_at', float('-inf'))
+        similarity.search_knowledge_base('petition', conn=locked)
+        assert 'failed for 3 queries' in caplog.records[-1].getMessage()
+
+@pytest.mark.parametrize('message', ['no such table: kb_search', 'no such module: fts5'])
+def test_missing_search_index_disables_search(monkeypatch, message):
+    monkeypatch.setattr(similarity, '_search_available', True)
+    assert similarity.search_knowledge_base('petition', conn=FailingConnection(message)) is None
+    assert not similarity._search_available
+    assert similarity.search_knowledge_base('petition') is None
+    # The keyword and TF-IDF stages still answer
+    assert similarity.get_document('custody') == response_for('divorce')
+
+def test_search_uses_the_given_connection(monkeypatch):
+    def no_new_connections(*args, **kwargs):
+        raise AssertionError('opened a connection')
+
+    conn = db.connect()
+    monkeypatch.setattr(db, 'connect', no_new_connections)
+    try:
+        assert similarity.get_document('I want to file a petition', lambda: conn) == response_for('divorce')
+        assert similarity.get_documents(['petition', 'custody', 'LLC formation'], lambda: conn) == [
+            response_for('divorce'), response_for('divorce'), response_for('business')]
+    finally:
+        conn.close()
+
+def test_batch_opens_one_connection(monkeypatch):
+    opened = []
+    connect = db.connect
+
+    def counting_connect(*args, **kwargs):
+        opened.append(1)
+        return connect(*args, **kwargs)
+
+    monkeypatch.setattr(db, 'connect', counting_connect)
+    similarity.get_documents(['petition', 'custody', 'durable authorization', 'qwerty'])
+    assert len(opened) == 1
+
+def test_knowledge_base_reloads_when_the_database_changes(scratch_database, monkeypatch):
+    monkeypatch.setattr(similarity, 'KB_CHECK_INTERVAL', 0)
+    try:
+        assert 'bankruptcy' not in [item['document_type'] for item in similarity.get_knowledge_base()]
+        conn = sqlite3.connect(scratch_database)
+        with conn:
+            conn.execute(
+                "INSERT INTO kb_documents (document_type, service_id, position, response) VALUES (?, ?, ?, ?)",
+                ('bankruptcy', None, 100, 'Bankruptcy forms are filed with the U.S. Courts.')
+            )
+            conn.execute("INSERT INTO kb_keywords (document_type, keyword) VALUES ('bankruptcy', 'chapter 7')")
+            conn.executescript(fill_search_index_script)
+        conn.close()
+        assert similarity.get_document('what is chapter 7') == 'Bankruptcy forms are filed with the U.S. Courts.'
+        assert similarity.get_document('bankruptcy') == 'Bankruptcy forms are filed with the U.S. Courts.'
+    finally:
+        monkeypatch.undo()
+        similarity.reload_knowledge_base()
+
+def test_import_does_not_touch_the_database(tmp_path):
+    import subprocess
+    import sys
+
+    path = tmp_path / 'missing.db'
+    env = dict(os.environ, DATABASE_PATH=str(path), PYTHONPATH=ROOT)
+    subprocess.run([sys.executable, '-c', 'import model.similarity'], cwd=str(tmp_path), env=env, check=True)
+    assert not path.exists()
+
+def test_reload_builds_before_installing(monkeypatch):
+    previous = (similarity.knowledge_base, similarity._index, similarity._keyword_matcher)
+    seen = []
+    load_index = similarity._load_index
+
+    def recording_load_index(documents, path):
+        seen.append((similarity.knowledge_base, similarity._index, similarity._keyword_matcher))
+        return load_index(documents, path)
+
+    monkeypatch.setattr(similarity, '_load_index', recording_load_index)
+    similarity.reload_knowledge_base()
+    assert seen == [previous]
+    assert similarity._index.fingerprint == similarity.knowledge_base_fingerprint(similarity.knowledge_base)
+
+def test_answers_cached_before_a_reload_are_not_served():
+    version = similarity._kb_version
+    similarity.reload_knowledge_base()
+    # A query that started before the reload finishes and caches its answer late
+    similarity.response_cache.set((version, similarity.preprocess_text('divorce')), None)
+    assert similarity.get_document('divorce') == response_for('divorce')
+    assert similarity.get_documents(['divorce']) == [response_for('divorce')]
@@ -0,0 +1,107 @@
+import hashlib
+import os
+
+import pytest
+import requests
+
+from template_store import TemplateFetchError, TemplateStore
+
+URL = 'https://www.courts.ca.gov/forms/petition.pdf'
+
+class StubResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+class StubSession:
+    """Answers template downloads from a queue of responses, recording the request headers"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, headers))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+def http_store(tmp_path, *responses, max_age=0):
+    return TemplateStore(cache_dir=str(tmp_path / 'cache'), fixture_dir=None, max_age=max_age,
+                         session=StubSession(*responses))
+
+@pytest.fixture
+def store(tmp_path):
+    fixtures = tmp_path / 'fixtures'
+    for host, content in (('www.courts.ca.gov', b'%PDF-ca'), ('www.uscourts.gov', b'%PDF-us')):
+        (fixtures / host / 'forms').mkdir(parents=True)
+        (fixtures / host / 'forms' / 'petition.pdf').write_bytes(content)
+    return TemplateStore(cache_dir=str(tmp_path / 'cache'), fixture_dir=str(fixtures))
+
+def test_fixtures_are_keyed_by_host_and_path(store):
+    assert store.fetch('https://www.courts.ca.gov/forms/petition.pdf') == b'%PDF-ca'
+    assert store.fetch('https://www.uscourts.gov/forms/petition.pdf') == b'%PDF-us'
+
+def test_fixtures_report_their_content_hash(store):
+    content, content_hash = store.fetch_with_hash('https://www.courts.ca.gov/forms/petition.pdf')
+    assert store.fetch_with_hash('https://www.courts.ca.gov/forms/petition.pdf') == (content, content_hash)
+    assert len(content_hash) == 64
+
+@pytest.mark.parametrize('url', [
+    'https://www.courts.ca.gov/forms/missing.pdf',
+    'https://www.courts.ca.gov/../../etc/passwd',
+])
+def test_missing_or_escaping_fixtures_are_not_found(store, url):
+    with pytest.raises(TemplateFetchError) as error:
+        store.fetch(url)
+    assert error.value.status_code == 404
+
+def test_downloads_are_stored_once_per_content(tmp_path):
+    store = http_store(tmp_path, StubResponse(200, b'%PDF-1'), StubResponse(200, b'%PDF-1'))
+    other_url = 'https://www.uscourts.gov/forms/petition.pdf'
+    content, content_hash = store.fetch_with_hash(URL)
+    assert (content, content_hash) == (b'%PDF-1', hashlib.sha256(b'%PDF-1').hexdigest())
+    assert store.fetch_with_hash(other_url) == (content, content_hash)
+    assert os.listdir(store.blob_dir) == [content_hash]
+    assert store.get_record(URL)['sha256'] == store.get_record(other_url)['sha256'] == content_hash
+
+def test_fresh_copies_are_served_without_the_network(tmp_path):
+    store = http_store(tmp_path, StubResponse(200, b'%PDF-1'), max_age=3600)
+    assert store.fetch(URL) == store.fetch(URL) == b'%PDF-1'
+    assert len(store.session.requests) == 1
+
+def test_stale_copies_are_revalidated(tmp_path):
+    validators = {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    store = http_store(tmp_path, StubResponse(200, b'%PDF-1', validators), StubResponse(304))
+    store.fetch(URL)
+    fetched_at = store.get_record(URL)['fetched_at']
+    assert store.fetch(URL) == b'%PDF-1'
+    assert store.session.requests[0][1] == {}
+    assert store.session.requests[1][1] == {
+        'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    # A 304 keeps the blob and restarts the freshness window
+    assert store.get_record(URL)['fetched_at'] >= fetched_at
+
+def test_changed_templates_replace_the_cached_copy(tmp_path):
+    store = http_store(tmp_path, StubResponse(200, b'%PDF-1', {'ETag': '"v1"'}),
+                       StubResponse(200, b'%PDF-2', {'ETag': '"v2"'}))
+    store.fetch(URL)
+    assert store.fetch(URL) == b'%PDF-2'
+    assert store.get_record(URL)['etag'] == '"v2"'
+
+@pytest.mark.parametrize('failure', [requests.ConnectionError('unreachable'), StubResponse(503)])
+def test_cached_copy_is_served_when_revalidation_fails(tmp_path, failure):
+    store = http_store(tmp_path, StubResponse(200, b'%PDF-1'), failure)
+    store.fetch(URL)
+    assert store.fetch(URL) == b'%PDF-1'
+
+def test_failed_downloads_without_a_cached_copy_raise(tmp_path):
+    store = http_store(tmp_path, StubResponse(404), requests.ConnectionError('unreachable'))
+    with pytest.raises(TemplateFetchError) as error:
+        store.fetch(URL)
+    assert error.value.status_code == 404
+    with pytest.raises(TemplateFetchError) as error:
+        store.fetch(URL)
+    assert error.value.status_code is None
@@ -0,0 +1,5 @@
+from app import create_app
+
+# Production entry point, e.g. `gunicorn -c gunicorn.conf.py wsgi:app`.
+# The shared state is built here, once, in the process that forks the workers.
+app = create_app(preload=True)